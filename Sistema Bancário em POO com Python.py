@@ -1,21 +1,29 @@
+import sys
 from abc import ABC, abstractmethod
-from datetime import datetime, date
-from typing import List
+from datetime import date
+from typing import Dict, List
+
+from sistema_bancario_otimizado import BancoException, MotorBancario
+
+# Nomes das transações do motor bancário no vocabulário deste modelo
+TIPOS_TRANSACAO = {"Depósito": "Deposito"}
+
 
 class Historico:
-    def __init__(self):
-        self._transacoes = []
+    def __init__(self, conta_motor):
+        # O histórico é mantido pelo motor bancário; esta classe apenas o expõe
+        self._conta_motor = conta_motor
     
     @property
     def transacoes(self):
-        return self._transacoes
-    
-    def adicionar_transacao(self, transacao):
-        self._transacoes.append({
-            "tipo": transacao.__class__.__name__,
-            "valor": transacao.valor,
-            "data": datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
-        })
+        return [
+            {
+                "tipo": TIPOS_TRANSACAO.get(transacao.tipo, transacao.tipo),
+                "valor": abs(transacao.valor),
+                "data": transacao.data.strftime("%d-%m-%Y %H:%M:%S"),
+            }
+            for transacao in self._conta_motor.transacoes
+        ]
 
 
 class Transacao(ABC):
@@ -38,10 +46,8 @@ class Saque(Transacao):
         return self._valor
     
     def registrar(self, conta):
-        sucesso_transacao = conta.sacar(self.valor)
-        
-        if sucesso_transacao:
-            conta.historico.adicionar_transacao(self)
+        # O motor bancário registra a transação no histórico ao confirmá-la
+        return conta.sacar(self.valor)
 
 
 class Deposito(Transacao):
@@ -53,10 +59,7 @@ class Deposito(Transacao):
         return self._valor
     
     def registrar(self, conta):
-        sucesso_transacao = conta.depositar(self.valor)
-        
-        if sucesso_transacao:
-            conta.historico.adicionar_transacao(self)
+        return conta.depositar(self.valor)
 
 
 class Cliente:
@@ -80,28 +83,28 @@ class PessoaFisica(Cliente):
 
 
 class Conta:
-    def __init__(self, numero: int, cliente: Cliente):
-        self._saldo = 0.0
-        self._numero = numero
-        self._agencia = "0001"
+    def __init__(self, motor: MotorBancario, cliente: "PessoaFisica", agencia: str = "0001"):
+        # O motor bancário numera a conta dentro da agência e guarda saldo e histórico
+        self._motor = motor
         self._cliente = cliente
-        self._historico = Historico()
+        self._conta_motor = motor.conta_service.criar_conta(agencia, cliente.cpf)
+        self._historico = Historico(self._conta_motor)
     
     @classmethod
-    def nova_conta(cls, cliente: Cliente, numero: int):
-        return cls(numero, cliente)
+    def nova_conta(cls, motor: MotorBancario, cliente: "PessoaFisica", agencia: str = "0001"):
+        return cls(motor, cliente, agencia)
     
     @property
     def saldo(self):
-        return self._saldo
+        return self._conta_motor.saldo
     
     @property
     def numero(self):
-        return self._numero
+        return self._conta_motor.numero
     
     @property
     def agencia(self):
-        return self._agencia
+        return self._conta_motor.agencia
     
     @property
     def cliente(self):
@@ -111,54 +114,43 @@ class Conta:
     def historico(self):
         return self._historico
     
-    def sacar(self, valor: float) -> bool:
-        saldo = self.saldo
-        excedeu_saldo = valor > saldo
-
-        if excedeu_saldo:
-            print("\n@@@ Operação falhou! Saldo insuficiente. @@@")
-        elif valor > 0:
-            self._saldo -= valor
-            print("\n=== Saque realizado com sucesso! ===")
-            return True
-        else:
-            print("\n@@@ Operação falhou! Valor inválido. @@@")
+    @property
+    def numero_saques(self):
+        return self._conta_motor.saques_realizados
+    
+    def _sacar(self, valor: float, limite: float, limite_saques: int) -> bool:
+        try:
+            self._motor.operacao_service.sacar(self.agencia, self.numero, valor, limite, limite_saques)
+        except BancoException as e:
+            print(f"\n@@@ Operação falhou! {e}. @@@")
+            return False
         
-        return False
+        print("\n=== Saque realizado com sucesso! ===")
+        return True
+    
+    def sacar(self, valor: float) -> bool:
+        return self._sacar(valor, float("inf"), sys.maxsize)
     
     def depositar(self, valor: float) -> bool:
-        if valor > 0:
-            self._saldo += valor
-            print("\n=== Depósito realizado com sucesso! ===")
-            return True
-        else:
-            print("\n@@@ Operação falhou! Valor inválido. @@@")
+        try:
+            self._motor.operacao_service.depositar(self.agencia, self.numero, valor)
+        except BancoException as e:
+            print(f"\n@@@ Operação falhou! {e}. @@@")
             return False
+        
+        print("\n=== Depósito realizado com sucesso! ===")
+        return True
 
 
 class ContaCorrente(Conta):
-    def __init__(self, numero: int, cliente: Cliente, limite: float = 500.0, limite_saques: int = 3):
-        super().__init__(numero, cliente)
+    def __init__(self, motor: MotorBancario, cliente: "PessoaFisica", agencia: str = "0001",
+                 limite: float = 500.0, limite_saques: int = 3):
+        super().__init__(motor, cliente, agencia)
         self.limite = limite
         self.limite_saques = limite_saques
     
     def sacar(self, valor: float) -> bool:
-        numero_saques = len(
-            [transacao for transacao in self.historico.transacoes 
-             if transacao["tipo"] == Saque.__name__]
-        )
-
-        excedeu_limite = valor > self.limite
-        excedeu_saques = numero_saques >= self.limite_saques
-
-        if excedeu_limite:
-            print("\n@@@ Operação falhou! Valor do saque excede o limite. @@@")
-        elif excedeu_saques:
-            print("\n@@@ Operação falhou! Número máximo de saques excedido. @@@")
-        else:
-            return super().sacar(valor)
-        
-        return False
+        return self._sacar(valor, self.limite, self.limite_saques)
     
     def __str__(self):
         return f"""\
@@ -183,9 +175,8 @@ def menu():
     return input(menu)
 
 
-def filtrar_cliente(cpf: str, clientes: List[PessoaFisica]) -> PessoaFisica:
-    clientes_filtrados = [cliente for cliente in clientes if cliente.cpf == cpf]
-    return clientes_filtrados[0] if clientes_filtrados else None
+def filtrar_cliente(cpf: str, clientes: Dict[str, PessoaFisica]) -> PessoaFisica:
+    return clientes.get(cpf)
 
 
 def recuperar_conta_cliente(cliente: PessoaFisica) -> Conta:
@@ -197,7 +188,7 @@ def recuperar_conta_cliente(cliente: PessoaFisica) -> Conta:
     return cliente.contas[0]
 
 
-def depositar(clientes: List[PessoaFisica]):
+def depositar(clientes: Dict[str, PessoaFisica]):
     cpf = input("Informe o CPF do cliente: ")
     cliente = filtrar_cliente(cpf, clientes)
 
@@ -215,7 +206,7 @@ def depositar(clientes: List[PessoaFisica]):
     cliente.realizar_transacao(conta, transacao)
 
 
-def sacar(clientes: List[PessoaFisica]):
+def sacar(clientes: Dict[str, PessoaFisica]):
     cpf = input("Informe o CPF do cliente: ")
     cliente = filtrar_cliente(cpf, clientes)
 
@@ -233,7 +224,7 @@ def sacar(clientes: List[PessoaFisica]):
     cliente.realizar_transacao(conta, transacao)
 
 
-def exibir_extrato(clientes: List[PessoaFisica]):
+def exibir_extrato(clientes: Dict[str, PessoaFisica]):
     cpf = input("Informe o CPF do cliente: ")
     cliente = filtrar_cliente(cpf, clientes)
 
@@ -248,19 +239,20 @@ def exibir_extrato(clientes: List[PessoaFisica]):
     print("\n================ EXTRATO ================")
     transacoes = conta.historico.transacoes
 
-    extrato = ""
     if not transacoes:
         extrato = "Não foram realizadas movimentações."
     else:
-        for transacao in transacoes:
-            extrato += f"\n{transacao['tipo']}:\n\tR$ {transacao['valor']:.2f} ({transacao['data']})"
+        extrato = "".join(
+            f"\n{transacao['tipo']}:\n\tR$ {transacao['valor']:.2f} ({transacao['data']})"
+            for transacao in transacoes
+        )
 
     print(extrato)
     print(f"\nSaldo:\n\tR$ {conta.saldo:.2f}")
     print("==========================================")
 
 
-def criar_cliente(clientes: List[PessoaFisica]):
+def criar_cliente(motor: MotorBancario, clientes: Dict[str, PessoaFisica]):
     cpf = input("Informe o CPF (somente número): ")
     cliente = filtrar_cliente(cpf, clientes)
 
@@ -272,22 +264,22 @@ def criar_cliente(clientes: List[PessoaFisica]):
     data_nascimento = input("Informe a data de nascimento (dd-mm-aaaa): ")
     endereco = input("Informe o endereço (logradouro, nro - bairro - cidade/sigla estado): ")
 
-    # Converter a string de data para objeto date
     try:
-        dia, mes, ano = map(int, data_nascimento.split('-'))
-        data_nascimento = date(ano, mes, dia)
-    except ValueError:
-        print("\n@@@ Formato de data inválido! Use dd-mm-aaaa. @@@")
+        motor.usuario_service.cadastrar_usuario(nome, data_nascimento, cpf, endereco)
+    except BancoException as e:
+        print(f"\n@@@ {e} @@@")
         return
 
-    cliente = PessoaFisica(nome=nome, cpf=cpf, data_nascimento=data_nascimento, endereco=endereco)
+    # Converter a string de data (já validada pelo motor) para objeto date
+    dia, mes, ano = map(int, data_nascimento.split('-'))
+    cliente = PessoaFisica(nome=nome, cpf=cpf, data_nascimento=date(ano, mes, dia), endereco=endereco)
 
-    clientes.append(cliente)
+    clientes[cpf] = cliente
 
     print("\n=== Cliente criado com sucesso! ===")
 
 
-def criar_conta(numero_conta: int, clientes: List[PessoaFisica], contas: List[Conta]):
+def criar_conta(motor: MotorBancario, clientes: Dict[str, PessoaFisica], contas: List[Conta]):
     cpf = input("Informe o CPF do cliente: ")
     cliente = filtrar_cliente(cpf, clientes)
 
@@ -295,7 +287,13 @@ def criar_conta(numero_conta: int, clientes: List[PessoaFisica], contas: List[Co
         print("\n@@@ Cliente não encontrado, fluxo de criação de conta encerrado! @@@")
         return
     
-    conta = ContaCorrente.nova_conta(cliente=cliente, numero=numero_conta)
+    agencia = input("Informe a agência (padrão 0001): ").strip() or "0001"
+    if not agencia.isdigit():
+        print("\n@@@ Agência inválida! @@@")
+        return
+    
+    # O motor bancário mantém uma sequência de numeração por agência
+    conta = ContaCorrente.nova_conta(motor=motor, cliente=cliente, agencia=agencia.zfill(4))
     contas.append(conta)
     cliente.contas.append(conta)
 
@@ -309,7 +307,8 @@ def listar_contas(contas: List[Conta]):
 
 
 def main():
-    clientes: List[PessoaFisica] = []
+    motor = MotorBancario()
+    clientes: Dict[str, PessoaFisica] = {}
     contas: List[Conta] = []
 
     while True:
@@ -325,11 +324,10 @@ def main():
             exibir_extrato(clientes)
         
         elif opcao == "nu":
-            criar_cliente(clientes)
+            criar_cliente(motor, clientes)
         
         elif opcao == "nc":
-            numero_conta = len(contas) + 1
-            criar_conta(numero_conta, clientes, contas)
+            criar_conta(motor, clientes, contas)
         
         elif opcao == "lc":
             listar_contas(contas)
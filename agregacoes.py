@@ -0,0 +1,140 @@
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sistema_bancario_otimizado import (
+    FUSO_HORARIO, MOEDA_PADRAO, TIPO_RESUMO, BancoException, Conta, ContaRepositoryMemory, PublicadorEventos, Transacao
+)
+
+GRANULARIDADES = ("hora", "dia", "mes")
+TODAS_AGENCIAS = -1
+
+# Agregado de um bucket: [quantidade, soma, mínimo, máximo]; valores em módulo,
+# pois o sentido do lançamento já é dado pelo tipo da transação
+Agregado = List[float]
+
+def inicio_buckets(data: datetime) -> Tuple[datetime, datetime, datetime]:
+    # localize() recalcula o deslocamento de cada início, que pode diferir em
+    # datas históricas de horário de verão
+    local = data.astimezone(FUSO_HORARIO)
+    return (
+        FUSO_HORARIO.localize(datetime(local.year, local.month, local.day, local.hour)),
+        FUSO_HORARIO.localize(datetime(local.year, local.month, local.day)),
+        FUSO_HORARIO.localize(datetime(local.year, local.month, 1))
+    )
+
+def granularidade_alinhada(*limites: Optional[datetime]) -> str:
+    # Maior granularidade cujos buckets começam exatamente nos limites informados
+    for granularidade, indice in (("mes", 2), ("dia", 1)):
+        if all(limite is None or inicio_buckets(limite)[indice] == limite for limite in limites):
+            return granularidade
+    return "hora"
+
+# Cubos de transações mantidos incrementalmente: cada lançamento atualiza os
+# buckets de hora, dia e mês do seu tipo, da sua agência e do total geral.
+# Os relatórios são em reais; lançamentos em outras moedas não entram nos cubos
+class CuboTransacoes:
+    def __init__(self, eventos: Optional[PublicadorEventos] = None):
+        # granularidade -> (tipo, agência) -> início do bucket -> agregado
+        self._cubos: Dict[str, Dict[Tuple[str, int], Dict[datetime, Agregado]]] = {
+            granularidade: defaultdict(dict) for granularidade in GRANULARIDADES
+        }
+        self._trava = threading.Lock()
+        if eventos is not None:
+            eventos.assinar(self)
+
+    def __call__(self, tipo: str, dados: Dict) -> None:
+        for item in dados.get("lancamentos", ()):
+            if item.get("moeda", MOEDA_PADRAO) != MOEDA_PADRAO:
+                continue
+            self.registrar(item["agencia"], item["tipo"], item["valor"],
+                           datetime.fromtimestamp(item["data"], tz=FUSO_HORARIO))
+
+    def registrar(self, agencia: str, tipo: str, valor: float, data: datetime) -> None:
+        chave_agencia = ContaRepositoryMemory.chave_agencia(agencia)
+        valor = abs(valor)
+        buckets = zip(GRANULARIDADES, inicio_buckets(data))
+        with self._trava:
+            for granularidade, inicio in buckets:
+                cubo = self._cubos[granularidade]
+                for chave in ((tipo, chave_agencia), (tipo, TODAS_AGENCIAS)):
+                    agregado = cubo[chave].get(inicio)
+                    if agregado is None:
+                        cubo[chave][inicio] = [1, valor, valor, valor]
+                    else:
+                        agregado[0] += 1
+                        agregado[1] += valor
+                        if valor < agregado[2]:
+                            agregado[2] = valor
+                        if valor > agregado[3]:
+                            agregado[3] = valor
+
+    def registrar_transacao(self, conta: Conta, transacao: Transacao) -> None:
+        # O saldo anterior de um histórico compactado não é uma movimentação
+        if transacao.moeda != MOEDA_PADRAO or transacao.tipo == TIPO_RESUMO:
+            return
+        self.registrar(conta.agencia, transacao.tipo, transacao.valor, transacao.data)
+
+    def carregar(self, contas: Iterable[Conta]) -> None:
+        # Carga inicial a partir do histórico existente (execução única)
+        for conta in contas:
+            for transacao in conta.transacoes:
+                self.registrar_transacao(conta, transacao)
+
+    # Consultas: custo proporcional ao número de buckets, não de transações
+    def serie(self, tipo: str, granularidade: str = "dia", agencia: Optional[str] = None,
+              inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> List[Dict]:
+        if granularidade not in GRANULARIDADES:
+            raise BancoException(f"Granularidade inválida: {granularidade}")
+        chave_agencia = TODAS_AGENCIAS if agencia is None else ContaRepositoryMemory.chave_agencia(agencia)
+
+        with self._trava:
+            buckets = list(self._cubos[granularidade].get((tipo, chave_agencia), {}).items())
+
+        serie = []
+        for momento, (quantidade, soma, minimo, maximo) in sorted(buckets):
+            if inicio is not None and momento < inicio:
+                continue
+            if fim is not None and momento >= fim:
+                continue
+            serie.append({
+                "inicio": momento,
+                "quantidade": quantidade,
+                "total": soma,
+                "media": soma / quantidade,
+                "minimo": minimo,
+                "maximo": maximo
+            })
+        return serie
+
+    def resumo(self, tipo: str, agencia: Optional[str] = None,
+               inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> Dict:
+        # Totais consolidados a partir dos maiores buckets alinhados ao recorte.
+        # A resolução mínima é a hora: um início no meio de uma hora é
+        # arredondado para baixo e inclui a hora inteira, assim como um fim
+        # no meio de uma hora inclui a hora em que cai
+        granularidade = granularidade_alinhada(inicio, fim)
+        if inicio is not None:
+            inicio = inicio_buckets(inicio)[0]
+        serie = self.serie(tipo, granularidade, agencia, inicio, fim)
+        quantidade = sum(bucket["quantidade"] for bucket in serie)
+        total = sum(bucket["total"] for bucket in serie)
+        return {
+            "tipo": tipo,
+            "quantidade": quantidade,
+            "total": total,
+            "media": total / quantidade if quantidade else 0.0,
+            "minimo": min((bucket["minimo"] for bucket in serie), default=0.0),
+            "maximo": max((bucket["maximo"] for bucket in serie), default=0.0)
+        }
+
+    # Relatórios gerenciais
+    def depositos_por_dia(self, agencia: Optional[str] = None) -> List[Dict]:
+        return self.serie("Depósito", "dia", agencia)
+
+    def saque_medio(self, agencia: Optional[str] = None) -> float:
+        return self.resumo("Saque", agencia)["media"]
+
+    def volume_transferencias_por_hora(self, agencia: Optional[str] = None) -> List[Dict]:
+        return self.serie("Transferência Enviada", "hora", agencia)
@@ -0,0 +1,233 @@
+import json
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sistema_bancario_otimizado import (
+    FUSO_HORARIO, MOEDA_PADRAO, TIPO_RESUMO, BancoException, Conta, ContaRepositoryMemory, Transacao,
+    epoca_us, repositorio_base
+)
+
+# Segmento de arquivo: assinatura seguida de blocos, um por conta e compactação.
+# Cabeçalho do bloco: agência, número, quantidade de transações, épocas da
+# primeira e da última (µs) e tamanho do conteúdo comprimido (JSON + zlib)
+ASSINATURA = b"ARQBNC01"
+CABECALHO_BLOCO = struct.Struct("<iqIqqI")
+EXTENSAO = ".arq"
+
+# Bloco indexado: (caminho do segmento, deslocamento do cabeçalho, primeira época, última época)
+Bloco = Tuple[str, int, int, int]
+ChaveConta = Tuple[int, int]
+
+def _chave(conta: Conta) -> ChaveConta:
+    return (ContaRepositoryMemory.chave_agencia(conta.agencia), conta.numero)
+
+# Segmentos comprimidos em disco; o índice de blocos por conta é reconstruído
+# a partir dos cabeçalhos ao abrir o diretório
+class ArquivoHistorico:
+    def __init__(self, diretorio: str, nivel_compressao: int = 6):
+        self.diretorio = diretorio
+        self.nivel_compressao = nivel_compressao
+        self.blocos: Dict[ChaveConta, List[Bloco]] = {}
+        self.segmentos = 0
+        self._trava = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+        self.reindexar()
+
+    def reindexar(self) -> None:
+        blocos: Dict[ChaveConta, List[Bloco]] = {}
+        nomes = sorted(nome for nome in os.listdir(self.diretorio) if nome.endswith(EXTENSAO))
+        for nome in nomes:
+            caminho = os.path.join(self.diretorio, nome)
+            with open(caminho, "rb") as arquivo:
+                if arquivo.read(len(ASSINATURA)) != ASSINATURA:
+                    raise BancoException(f"Segmento de arquivo inválido: {nome}")
+                while True:
+                    deslocamento = arquivo.tell()
+                    cabecalho = arquivo.read(CABECALHO_BLOCO.size)
+                    if len(cabecalho) < CABECALHO_BLOCO.size:
+                        break
+                    agencia, numero, _, primeira, ultima, tamanho = CABECALHO_BLOCO.unpack(cabecalho)
+                    arquivo.seek(tamanho, os.SEEK_CUR)
+                    blocos.setdefault((agencia, numero), []).append((caminho, deslocamento, primeira, ultima))
+        with self._trava:
+            self.blocos = blocos
+            self.segmentos = len(nomes)
+
+    def novo_segmento(self):
+        with self._trava:
+            self.segmentos += 1
+            caminho = os.path.join(self.diretorio, f"segmento_{self.segmentos:06d}{EXTENSAO}")
+        arquivo = open(caminho, "xb")
+        arquivo.write(ASSINATURA)
+        return arquivo
+
+    def gravar_bloco(self, segmento, chave: ChaveConta, transacoes: List[Transacao]) -> None:
+        # A moeda só é gravada quando não é o real
+        registros = [
+            [t.tipo, t.valor, t.descricao, epoca_us(t.data)] + ([t.moeda] if t.moeda != MOEDA_PADRAO else [])
+            for t in transacoes
+        ]
+        conteudo = zlib.compress(json.dumps(registros, ensure_ascii=False).encode("utf-8"), self.nivel_compressao)
+        primeira, ultima = registros[0][3], registros[-1][3]
+
+        deslocamento = segmento.tell()
+        segmento.write(CABECALHO_BLOCO.pack(chave[0], chave[1], len(registros), primeira, ultima, len(conteudo)))
+        segmento.write(conteudo)
+        # O bloco precisa estar legível antes de sair da memória
+        segmento.flush()
+        with self._trava:
+            self.blocos.setdefault(chave, []).append((segmento.name, deslocamento, primeira, ultima))
+
+    def ler_bloco(self, bloco: Bloco) -> List[Transacao]:
+        caminho, deslocamento, _, _ = bloco
+        with open(caminho, "rb") as arquivo:
+            arquivo.seek(deslocamento)
+            tamanho = CABECALHO_BLOCO.unpack(arquivo.read(CABECALHO_BLOCO.size))[5]
+            registros = json.loads(zlib.decompress(arquivo.read(tamanho)))
+        return [
+            Transacao(tipo, valor, descricao, datetime.fromtimestamp(epoca / 1_000_000, tz=FUSO_HORARIO),
+                      *moeda)
+            for tipo, valor, descricao, epoca, *moeda in registros
+        ]
+
+    def transacoes(self, chave: ChaveConta, inicio: Optional[datetime] = None,
+                   fim: Optional[datetime] = None) -> Iterator[Transacao]:
+        # Descomprime um bloco por vez, apenas os que cruzam o período
+        inicio_us = None if inicio is None else epoca_us(inicio)
+        fim_us = None if fim is None else epoca_us(fim)
+        with self._trava:
+            blocos = list(self.blocos.get(chave, ()))
+        for bloco in blocos:
+            if (inicio_us is not None and bloco[3] < inicio_us) or (fim_us is not None and bloco[2] >= fim_us):
+                continue
+            for transacao in self.ler_bloco(bloco):
+                if (inicio is None or transacao.data >= inicio) and (fim is None or transacao.data < fim):
+                    yield transacao
+
+# Histórico quente de uma conta compactada: o resumo de saldo anterior seguido
+# das transações recentes. Continua sendo uma lista (append, fatias, to_dict),
+# e extratos por período buscam no arquivo os trechos já arquivados
+class HistoricoCompactado(list):
+    def __init__(self, arquivo: ArquivoHistorico, chave: ChaveConta, transacoes: Iterable[Transacao]):
+        super().__init__(transacoes)
+        self.arquivo = arquivo
+        self.chave = chave
+
+    def periodo(self, inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> Iterator[Transacao]:
+        yield from self.arquivo.transacoes(self.chave, inicio, fim)
+        for transacao in islice(self, 1, None):
+            if (inicio is None or transacao.data >= inicio) and (fim is None or transacao.data < fim):
+                yield transacao
+
+def _tem_resumo(transacoes) -> bool:
+    return bool(transacoes) and transacoes[0].tipo == TIPO_RESUMO
+
+# Compactação: move para o arquivo as transações anteriores à janela de
+# retenção e as substitui por uma entrada de saldo anterior, de modo que o
+# saldo em reais continua igual à soma do histórico em memória (os saldos em
+# outras moedas são mantidos em Conta.saldos_moeda)
+class CompactadorHistorico:
+    def __init__(self, conta_repo: ContaRepositoryMemory, arquivo: ArquivoHistorico,
+                 retencao: timedelta = timedelta(days=90), minimo_transacoes: int = 1):
+        self.conta_repo = repositorio_base(conta_repo)
+        if not isinstance(self.conta_repo, ContaRepositoryMemory):
+            raise BancoException("Compactação disponível apenas para o repositório em memória")
+        self.arquivo = arquivo
+        self.retencao = retencao
+        # Contas com menos transações antigas que isso ficam para a próxima execução
+        self.minimo_transacoes = minimo_transacoes
+        self._execucao = threading.Lock()
+        self._parar = threading.Event()
+
+        self.execucoes = 0
+        self.contas_compactadas = 0
+        self.transacoes_arquivadas = 0
+
+    def reanexar(self, contas: Iterable[Conta]) -> None:
+        # Após reiniciar (ex.: carregar um snapshot), religa os históricos ao arquivo
+        for conta in contas:
+            historico = conta.transacoes
+            chave = _chave(conta)
+            if isinstance(historico, list) and _tem_resumo(historico) and chave in self.arquivo.blocos:
+                novo = HistoricoCompactado(self.arquivo, chave, historico)
+                self.conta_repo.substituir_historico(conta, historico, novo, len(novo))
+
+    def executar(self, agora: Optional[datetime] = None) -> int:
+        corte = (agora or datetime.now(FUSO_HORARIO)) - self.retencao
+        arquivadas = 0
+        with self._execucao:
+            segmento = None
+            try:
+                for conta in self.conta_repo.listar_todas():
+                    # Históricos mapeados em disco (historico_mmap) já estão fora da memória
+                    if not isinstance(conta.transacoes, list):
+                        continue
+                    historico = conta.transacoes
+                    inicio = 1 if _tem_resumo(historico) else 0
+                    fim = inicio
+                    # O histórico é somente anexação e cronológico; só esta thread remove itens
+                    while fim < len(historico) and historico[fim].data < corte:
+                        fim += 1
+                    if fim - inicio < self.minimo_transacoes:
+                        continue
+
+                    antigas = historico[inicio:fim]
+                    if segmento is None:
+                        segmento = self.arquivo.novo_segmento()
+                    chave = _chave(conta)
+                    self.arquivo.gravar_bloco(segmento, chave, antigas)
+                    if not self._substituir(conta, historico, inicio, fim, chave):
+                        # Histórico trocado no meio (ex.: migrado para historico_mmap):
+                        # nada foi removido, e o bloco gravado não é religado à conta
+                        continue
+                    arquivadas += len(antigas)
+                    self.contas_compactadas += 1
+            finally:
+                if segmento is not None:
+                    segmento.close()
+            self.execucoes += 1
+            self.transacoes_arquivadas += arquivadas
+        return arquivadas
+
+    def _substituir(self, conta: Conta, historico: List[Transacao], inicio: int, fim: int,
+                    chave: ChaveConta) -> bool:
+        saldo_anterior = sum(transacao.valor for transacao in historico[inicio:fim]
+                             if transacao.moeda == MOEDA_PADRAO)
+        if inicio:
+            saldo_anterior += historico[0].valor
+        resumo = Transacao(TIPO_RESUMO, saldo_anterior,
+                           f"Saldo até {historico[fim - 1].data.strftime('%d/%m/%Y %H:%M:%S')}",
+                           historico[fim - 1].data)
+        # Um novo objeto de lista: snapshots em andamento seguem vendo o anterior
+        copiadas = len(historico)
+        novo = HistoricoCompactado(self.arquivo, chave, [resumo, *historico[fim:copiadas]])
+        return self.conta_repo.substituir_historico(conta, historico, novo, copiadas)
+
+    # Execução periódica em segundo plano
+    def iniciar(self, intervalo: float = 3600.0) -> threading.Thread:
+        self._parar.clear()
+
+        def laco() -> None:
+            while not self._parar.wait(intervalo):
+                self.executar()
+
+        executor = threading.Thread(target=laco, daemon=True)
+        executor.start()
+        return executor
+
+    def parar(self) -> None:
+        self._parar.set()
+
+    def estatisticas(self) -> Dict:
+        return {
+            "execucoes": self.execucoes,
+            "contas_compactadas": self.contas_compactadas,
+            "transacoes_arquivadas": self.transacoes_arquivadas,
+            "segmentos": self.arquivo.segmentos,
+            "contas_arquivadas": len(self.arquivo.blocos)
+        }
@@ -0,0 +1,86 @@
+import argparse
+import random
+import time
+from typing import List, Tuple
+
+from sistema_bancario_otimizado import BancoException, MotorBancario, StatusOperacao
+
+CPF_BENCHMARK = "52998224725"
+
+# Operação da carga: (tipo, número da conta, valor)
+Operacao = Tuple[str, int, float]
+
+def preparar_motor(contas: int) -> MotorBancario:
+    motor = MotorBancario()
+    motor.operacao_service.limite_saques_diarios = 10 ** 9
+    motor.usuario_service.cadastrar_usuario("Benchmark", "01-01-1990", CPF_BENCHMARK, "Rua A, 1 - Centro - São Paulo/SP")
+    for _ in range(contas):
+        motor.conta_service.criar_conta("0001", CPF_BENCHMARK)
+    return motor
+
+def gerar_carga(operacoes: int, contas: int, taxa_recusa: float, semente: int) -> List[Operacao]:
+    # Recusas são saques acima do limite por operação; as demais alternam
+    # depósitos e saques pequenos, sempre cobertos pelo saldo acumulado
+    gerador = random.Random(semente)
+    carga = []
+    for indice in range(operacoes):
+        numero = gerador.randint(1, contas)
+        if gerador.random() < taxa_recusa:
+            carga.append(("sacar", numero, 10_000.0))
+        elif indice % 2 == 0:
+            carga.append(("depositar", numero, 100.0))
+        else:
+            carga.append(("sacar", numero, 1.0))
+    return carga
+
+def executar_excecoes(motor: MotorBancario, carga: List[Operacao]) -> Tuple[float, int]:
+    servico = motor.operacao_service
+    recusas = 0
+    inicio = time.perf_counter()
+    for tipo, numero, valor in carga:
+        try:
+            if tipo == "depositar":
+                servico.depositar("0001", numero, valor)
+            else:
+                servico.sacar("0001", numero, valor)
+        except BancoException:
+            recusas += 1
+    return time.perf_counter() - inicio, recusas
+
+def executar_status(motor: MotorBancario, carga: List[Operacao]) -> Tuple[float, int]:
+    servico = motor.operacao_service
+    recusas = 0
+    inicio = time.perf_counter()
+    for tipo, numero, valor in carga:
+        if tipo == "depositar":
+            status = servico.tentar_depositar("0001", numero, valor)
+        else:
+            status = servico.tentar_sacar("0001", numero, valor)
+        if status is not StatusOperacao.OK:
+            recusas += 1
+    return time.perf_counter() - inicio, recusas
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a API de exceções com a API de códigos de resultado")
+    parser.add_argument("--operacoes", type=int, default=200_000)
+    parser.add_argument("--contas", type=int, default=1_000)
+    parser.add_argument("--taxa-recusa", type=float, default=0.4)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    carga = gerar_carga(args.operacoes, args.contas, args.taxa_recusa, args.semente)
+    resultados = {}
+    for nome, executar in (("exceções", executar_excecoes), ("status", executar_status)):
+        # Melhor de N execuções, cada uma com um motor novo e a mesma carga
+        melhor = None
+        for _ in range(args.repeticoes):
+            tempo, recusas = executar(preparar_motor(args.contas), carga)
+            melhor = tempo if melhor is None else min(melhor, tempo)
+        resultados[nome] = args.operacoes / melhor
+        print(f"{nome:>9}: {resultados[nome]:>12,.0f} ops/s | recusas: {recusas} ({recusas / args.operacoes:.0%})")
+
+    print(f"Ganho da API de status: {resultados['status'] / resultados['exceções']:.2f}x")
+
+if __name__ == "__main__":
+    main()
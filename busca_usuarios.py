@@ -0,0 +1,118 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, List, Optional, Set, Tuple
+
+from sistema_bancario_otimizado import (
+    BancoException, Usuario, UsuarioRepositoryMemory, normalizar_consulta, paginar,
+    relevancia, valor_busca
+)
+
+TAMANHO_NGRAMA = 3
+
+# Índice invertido de trigramas; consultas curtas usam prefixos de palavras
+class IndiceNgramas:
+    def __init__(self):
+        self.textos: List[str] = []
+        # Identificadores são crescentes, portanto cada lista de ocorrências já fica ordenada
+        self.ocorrencias: Dict[str, List[int]] = defaultdict(list)
+        self.prefixos: Dict[str, List[int]] = defaultdict(list)
+
+    @staticmethod
+    def ngramas(texto: str) -> Set[str]:
+        return {texto[i:i + TAMANHO_NGRAMA] for i in range(len(texto) - TAMANHO_NGRAMA + 1)}
+
+    def adicionar(self, identificador: int, texto: str) -> None:
+        self.textos.append(texto)
+        for ngrama in self.ngramas(texto):
+            self.ocorrencias[ngrama].append(identificador)
+        for prefixo in {palavra[:i] for palavra in texto.split() for i in range(1, TAMANHO_NGRAMA)}:
+            self.prefixos[prefixo].append(identificador)
+
+    def candidatos(self, consulta: str, limite: Optional[int] = None) -> List[int]:
+        # Com limite, para nos primeiros `limite` encontrados, em ordem de cadastro
+        if len(consulta) < TAMANHO_NGRAMA:
+            return self.prefixos.get(consulta, [])[:limite]
+
+        listas = []
+        for ngrama in self.ngramas(consulta):
+            lista = self.ocorrencias.get(ngrama)
+            if not lista:
+                return []
+            listas.append(lista)
+
+        # Interseção a partir da lista mais curta; o texto é conferido em seguida
+        listas.sort(key=len)
+        encontrados = listas[0]
+        for lista in listas[1:]:
+            conjunto = set(lista)
+            encontrados = [identificador for identificador in encontrados if identificador in conjunto]
+            if not encontrados:
+                break
+        return list(islice((identificador for identificador in encontrados
+                            if consulta in self.textos[identificador]), limite))
+
+# Índice de prefixos de CPF: lista mantida ordenada a cada inserção. A trava
+# protege a lista contra consultas feitas durante um cadastro
+class IndiceCpf:
+    def __init__(self):
+        self.ordenados: List[Tuple[str, int]] = []
+        self._trava = threading.Lock()
+
+    def adicionar(self, identificador: int, cpf: str) -> None:
+        with self._trava:
+            insort(self.ordenados, (cpf, identificador))
+
+    def pagina(self, prefixo: str, inicio: int, quantidade: int) -> Tuple[int, List[int]]:
+        # (total de CPFs com o prefixo, identificadores da página pedida)
+        with self._trava:
+            primeiro = bisect_left(self.ordenados, (prefixo,))
+            ultimo = bisect_left(self.ordenados, (prefixo + "\uffff",))
+            pagina = self.ordenados[primeiro + inicio:min(primeiro + inicio + quantidade, ultimo)]
+        return ultimo - primeiro, [identificador for _, identificador in pagina]
+
+# Repositório em memória com busca por nome parcial, prefixo de CPF e cidade.
+# Buscas por nome e cidade examinam no máximo `limite_candidatos` ocorrências:
+# acima disso, o total informado é o limite e "total_limitado" fica verdadeiro
+class UsuarioRepositoryIndexado(UsuarioRepositoryMemory):
+    def __init__(self, limite_candidatos: int = 10000):
+        super().__init__()
+        self.limite_candidatos = limite_candidatos
+        self._por_identificador: List[Usuario] = []
+        self.indice_nome = IndiceNgramas()
+        self.indice_cidade = IndiceNgramas()
+        self.indice_cpf = IndiceCpf()
+
+    def adicionar(self, usuario: Usuario) -> None:
+        super().adicionar(usuario)
+        identificador = len(self._por_identificador)
+        self._por_identificador.append(usuario)
+        self.indice_nome.adicionar(identificador, valor_busca(usuario, "nome"))
+        self.indice_cidade.adicionar(identificador, valor_busca(usuario, "cidade"))
+        self.indice_cpf.adicionar(identificador, valor_busca(usuario, "cpf"))
+
+    def buscar(self, termo: str, campo: str = "nome", pagina: int = 1, tamanho_pagina: int = 10) -> Dict:
+        if pagina < 1 or tamanho_pagina < 1:
+            raise BancoException("Paginação inválida")
+        consulta = normalizar_consulta(termo, campo)
+        inicio = (pagina - 1) * tamanho_pagina
+
+        if campo == "cpf":
+            total, identificadores = self.indice_cpf.pagina(consulta, inicio, tamanho_pagina)
+            return paginar([self._por_identificador[identificador] for identificador in identificadores],
+                           total, pagina, tamanho_pagina)
+
+        indice = self.indice_nome if campo == "nome" else self.indice_cidade
+        candidatos = indice.candidatos(consulta, self.limite_candidatos)
+        # Apenas os primeiros da ordenação são materializados (top-k)
+        melhores = heapq.nsmallest(
+            inicio + tamanho_pagina, candidatos,
+            key=lambda identificador: (relevancia(indice.textos[identificador], consulta),
+                                       indice.textos[identificador], identificador)
+        )
+        resultado = paginar([self._por_identificador[identificador] for identificador in melhores[inicio:]],
+                            len(candidatos), pagina, tamanho_pagina)
+        resultado["total_limitado"] = len(candidatos) >= self.limite_candidatos
+        return resultado
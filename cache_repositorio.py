@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+
+from sistema_bancario_otimizado import (
+    Alteracao, BancoException, ConflitoVersaoException, Conta, ContaRepository, ContaRepositoryMemory,
+    Usuario, UsuarioRepository
+)
+
+# Cache LRU com expiração por tempo (TTL)
+class CacheLRU:
+    def __init__(self, capacidade: int = 10000, ttl: float = 60.0,
+                 relogio: Callable[[], float] = time.monotonic):
+        if capacidade <= 0:
+            raise ValueError("Capacidade do cache deve ser positiva")
+        if ttl <= 0:
+            raise ValueError("TTL do cache deve ser positivo")
+        
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self.relogio = relogio
+        # Chave -> (instante de expiração, valor); a ordem indica o uso mais recente
+        self._itens: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Os repositórios envolvidos atendem serviços em várias threads
+        self._trava = threading.Lock()
+        
+        self.acertos = 0
+        self.falhas = 0
+        self.expiracoes = 0
+        self.despejos = 0
+    
+    def obter(self, chave: Hashable):
+        agora = self.relogio()
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return None
+            
+            expira_em, valor = item
+            if expira_em <= agora:
+                del self._itens[chave]
+                self.expiracoes += 1
+                self.falhas += 1
+                return None
+            
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+    
+    def guardar(self, chave: Hashable, valor) -> None:
+        expira_em = self.relogio() + self.ttl
+        with self._trava:
+            self._itens[chave] = (expira_em, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+                self.despejos += 1
+    
+    def invalidar(self, chave: Hashable) -> None:
+        with self._trava:
+            self._itens.pop(chave, None)
+    
+    def limpar(self) -> None:
+        with self._trava:
+            self._itens.clear()
+    
+    def __len__(self) -> int:
+        return len(self._itens)
+    
+    def estatisticas(self) -> Dict:
+        consultas = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+            "expiracoes": self.expiracoes,
+            "despejos": self.despejos,
+            "tamanho": len(self._itens),
+            "capacidade": self.capacidade
+        }
+
+# Decoradores de repositório com leitura através do cache (read-through)
+class UsuarioRepositoryCache(UsuarioRepository):
+    def __init__(self, repositorio: UsuarioRepository, capacidade: int = 10000, ttl: float = 60.0):
+        self.repositorio = repositorio
+        self.cache = CacheLRU(capacidade, ttl)
+    
+    def adicionar(self, usuario: Usuario) -> None:
+        self.repositorio.adicionar(usuario)
+        self.cache.invalidar(usuario.cpf)
+    
+    def buscar_por_cpf(self, cpf: str) -> Optional[Usuario]:
+        usuario = self.cache.obter(cpf)
+        if usuario is None:
+            usuario = self.repositorio.buscar_por_cpf(cpf)
+            if usuario is not None:
+                self.cache.guardar(cpf, usuario)
+        return usuario
+    
+    def listar_todos(self) -> List[Usuario]:
+        return self.repositorio.listar_todos()
+    
+    def buscar(self, termo: str, campo: str = "nome", pagina: int = 1, tamanho_pagina: int = 10) -> Dict:
+        return self.repositorio.buscar(termo, campo, pagina, tamanho_pagina)
+
+class ContaRepositoryCache(ContaRepository):
+    def __init__(self, repositorio: ContaRepository, capacidade: int = 10000, ttl: float = 60.0):
+        self.repositorio = repositorio
+        self.cache = CacheLRU(capacidade, ttl)
+    
+    @staticmethod
+    def _chave(agencia: str, numero: int) -> tuple:
+        return (ContaRepositoryMemory.chave_agencia(agencia), numero)
+    
+    def adicionar(self, conta: Conta) -> None:
+        self.repositorio.adicionar(conta)
+        self.cache.invalidar(self._chave(conta.agencia, conta.numero))
+    
+    def confirmar(self, alteracoes: List[Alteracao]) -> None:
+        try:
+            self.repositorio.confirmar(alteracoes)
+        except ConflitoVersaoException:
+            # A cópia em cache pode estar defasada: a próxima leitura vai ao repositório
+            for conta, _, _ in alteracoes:
+                self.cache.invalidar(self._chave(conta.agencia, conta.numero))
+            raise
+        for conta, _, _ in alteracoes:
+            self.cache.guardar(self._chave(conta.agencia, conta.numero), conta)
+    
+    def buscar_por_numero(self, numero: int) -> Optional[Conta]:
+        return self.repositorio.buscar_por_numero(numero)
+    
+    def buscar_por_agencia_numero(self, agencia: str, numero: int) -> Optional[Conta]:
+        try:
+            chave = self._chave(agencia, numero)
+        except BancoException:
+            return None
+        conta = self.cache.obter(chave)
+        if conta is None:
+            conta = self.repositorio.buscar_por_agencia_numero(agencia, numero)
+            if conta is not None:
+                self.cache.guardar(chave, conta)
+        return conta
+    
+    def listar_por_usuario(self, cpf: str) -> List[Conta]:
+        return self.repositorio.listar_por_usuario(cpf)
+    
+    def listar_todas(self) -> List[Conta]:
+        return self.repositorio.listar_todas()
+    
+    def listar_por_agencia(self, agencia: str) -> List[Conta]:
+        return self.repositorio.listar_por_agencia(agencia)
+    
+    def estatisticas_agencia(self, agencia: str) -> Dict:
+        return self.repositorio.estatisticas_agencia(agencia)
+    
+    def proximo_numero(self, agencia: str) -> int:
+        return self.repositorio.proximo_numero(agencia)
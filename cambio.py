@@ -0,0 +1,211 @@
+import threading
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Dict, List, Optional, Tuple, Union
+
+from historico_mmap import registrar_moeda
+from sistema_bancario_otimizado import (
+    MOEDA_PADRAO, Conta, ContaRepository, MoedaNaoSuportadaException,
+    OperacaoBancariaService, PublicadorEventos, ResultadoPreparacao, StatusOperacao, Transacao,
+    casas_decimais, erro_operacao, lancamentos, unidades_menores, valor_valido
+)
+
+Taxa = Union[str, int, Decimal]
+
+# Tabela local de cotações (reais por unidade de cada moeda). Os fatores de
+# conversão entre pares são memorizados e descartados a cada atualização
+class TabelaCambio:
+    def __init__(self, taxas: Optional[Dict[str, Taxa]] = None):
+        self._taxas: Dict[str, Decimal] = {MOEDA_PADRAO: Decimal(1)}
+        # (origem, destino) -> fator que converte unidades menores da origem nas do destino
+        self._fatores: Dict[Tuple[str, str], Decimal] = {}
+        self._trava = threading.Lock()
+        self.versao = 0
+        self.acertos = 0
+        self.faltas = 0
+        if taxas:
+            self.atualizar_varias(taxas)
+
+    @staticmethod
+    def _decimal(taxa: Taxa) -> Decimal:
+        # Floats passam por str para não herdar o erro de representação binária
+        valor = taxa if isinstance(taxa, Decimal) else Decimal(str(taxa))
+        if not valor.is_finite() or valor <= 0:
+            raise ValueError("Cotação deve ser positiva")
+        return valor
+
+    def atualizar(self, moeda: str, taxa: Taxa) -> None:
+        self.atualizar_varias({moeda: taxa})
+
+    def atualizar_varias(self, taxas: Dict[str, Taxa]) -> None:
+        novas = {moeda: self._decimal(taxa) for moeda, taxa in taxas.items() if moeda != MOEDA_PADRAO}
+        # Só moedas com código ISO válido: o histórico mapeado grava o código delas
+        for moeda in novas:
+            registrar_moeda(moeda)
+        with self._trava:
+            self._taxas.update(novas)
+            # Fatores cruzados dependem das duas pontas: a cache inteira é invalidada
+            self._fatores = {}
+            self.versao += 1
+
+    def suporta(self, moeda: str) -> bool:
+        return isinstance(moeda, str) and moeda in self._taxas
+
+    def moedas(self) -> List[str]:
+        return list(self._taxas)
+
+    def taxa(self, moeda: str) -> Decimal:
+        taxa = self._taxas.get(moeda)
+        if taxa is None:
+            raise MoedaNaoSuportadaException(f"Moeda sem cotação: {moeda}")
+        return taxa
+
+    def fator(self, origem: str, destino: str) -> Decimal:
+        chave = (origem, destino)
+        fator = self._fatores.get(chave)
+        if fator is not None:
+            self.acertos += 1
+            return fator
+        with self._trava:
+            self.faltas += 1
+            fator = self.taxa(origem) / self.taxa(destino)
+            fator = fator.scaleb(casas_decimais(destino) - casas_decimais(origem))
+            self._fatores[chave] = fator
+        return fator
+
+    def fator_escalado(self, origem: str, destino: str, escala: int) -> int:
+        # Fator inteiro (fator * escala) para conversões vetorizadas
+        return int((self.fator(origem, destino) * escala).to_integral_value(ROUND_HALF_EVEN))
+
+    def converter(self, unidades: int, origem: str, destino: str) -> int:
+        # Unidades menores inteiras -> unidades menores inteiras, arredondamento bancário
+        if origem == destino:
+            return unidades
+        return int((Decimal(unidades) * self.fator(origem, destino)).to_integral_value(ROUND_HALF_EVEN))
+
+    def cotar(self, valor: float, origem: str, destino: str) -> float:
+        convertido = self.converter(unidades_menores(valor, origem), origem, destino)
+        return convertido / 10 ** casas_decimais(destino)
+
+    def estatisticas(self) -> Dict:
+        return {
+            "versao": self.versao,
+            "moedas": len(self._taxas),
+            "fatores_em_cache": len(self._fatores),
+            "acertos": self.acertos,
+            "faltas": self.faltas
+        }
+
+def saldo_disponivel(conta: Conta, moeda: str) -> int:
+    # Saldo da conta na moeda, em unidades menores
+    if moeda == MOEDA_PADRAO:
+        return unidades_menores(conta.saldo, MOEDA_PADRAO)
+    return conta.saldos_moeda.get(moeda, 0)
+
+# Operações em várias moedas, com o mesmo controle otimista do serviço base;
+# o saldo em reais continua em Conta.saldo e os demais em Conta.saldos_moeda
+class OperacaoCambioService(OperacaoBancariaService):
+    def __init__(self, conta_repo: ContaRepository, tabela: TabelaCambio,
+                 eventos: Optional[PublicadorEventos] = None):
+        super().__init__(conta_repo, eventos)
+        self.tabela = tabela
+
+    def tentar_depositar_moeda(self, agencia: str, numero: int, valor: float, moeda: str) -> StatusOperacao:
+        if not self.tabela.suporta(moeda):
+            return StatusOperacao.MOEDA_NAO_SUPORTADA
+        if not valor_valido(valor):
+            return StatusOperacao.VALOR_INVALIDO
+
+        def preparar() -> ResultadoPreparacao:
+            conta = self.conta_repo.buscar_por_agencia_numero(agencia, numero)
+            if not conta:
+                return StatusOperacao.CONTA_NAO_ENCONTRADA
+            unidades = unidades_menores(valor, moeda)
+            if unidades <= 0:
+                return StatusOperacao.VALOR_INVALIDO
+            return [(conta, conta.versao,
+                     Transacao("Depósito", unidades / 10 ** casas_decimais(moeda), moeda=moeda))]
+
+        alteracoes = self._confirmar(preparar)
+        if isinstance(alteracoes, StatusOperacao):
+            return alteracoes
+        if self.eventos and self.eventos.ativo():
+            self.eventos.publicar("deposito", {
+                "agencia": agencia,
+                "numero": numero,
+                "valor": valor,
+                "moeda": moeda,
+                "lancamentos": lancamentos(alteracoes)
+            })
+        return StatusOperacao.OK
+
+    def tentar_transferir_moeda(self, agencia_origem: str, numero_origem: int,
+                                agencia_destino: str, numero_destino: int, valor: float,
+                                moeda_origem: str, moeda_destino: str) -> StatusOperacao:
+        # `valor` na moeda de origem; origem e destino podem ser a mesma conta (câmbio)
+        if not self.tabela.suporta(moeda_origem) or not self.tabela.suporta(moeda_destino):
+            return StatusOperacao.MOEDA_NAO_SUPORTADA
+        if not valor_valido(valor):
+            return StatusOperacao.VALOR_INVALIDO
+        unidades = unidades_menores(valor, moeda_origem)
+
+        def preparar() -> ResultadoPreparacao:
+            conta_origem = self.conta_repo.buscar_por_agencia_numero(agencia_origem, numero_origem)
+            if not conta_origem:
+                return StatusOperacao.CONTA_NAO_ENCONTRADA
+            conta_destino = self.conta_repo.buscar_por_agencia_numero(agencia_destino, numero_destino)
+            if not conta_destino:
+                return StatusOperacao.CONTA_DESTINO_NAO_ENCONTRADA
+            versao_origem, versao_destino = conta_origem.versao, conta_destino.versao
+            # A cotação é lida a cada tentativa: uma atualização da tabela vale na próxima
+            convertidas = self.tabela.converter(unidades, moeda_origem, moeda_destino)
+            if unidades <= 0 or convertidas <= 0:
+                return StatusOperacao.VALOR_INVALIDO
+            if unidades > saldo_disponivel(conta_origem, moeda_origem):
+                return StatusOperacao.SALDO_INSUFICIENTE
+
+            valor_origem = unidades / 10 ** casas_decimais(moeda_origem)
+            valor_destino = convertidas / 10 ** casas_decimais(moeda_destino)
+            cambio = (f"{moeda_origem} {valor_origem:.{casas_decimais(moeda_origem)}f} -> "
+                      f"{moeda_destino} {valor_destino:.{casas_decimais(moeda_destino)}f}")
+            return [
+                (conta_origem, versao_origem,
+                 Transacao("Transferência Enviada", -valor_origem, f"Para: {conta_destino} ({cambio})", moeda=moeda_origem)),
+                (conta_destino, versao_destino,
+                 Transacao("Transferência Recebida", valor_destino, f"De: {conta_origem} ({cambio})",
+                           moeda=moeda_destino))
+            ]
+
+        alteracoes = self._confirmar(preparar)
+        if isinstance(alteracoes, StatusOperacao):
+            return alteracoes
+        if self.eventos and self.eventos.ativo():
+            self.eventos.publicar("transferencia", {
+                "agencia_origem": agencia_origem,
+                "numero_origem": numero_origem,
+                "agencia_destino": agencia_destino,
+                "numero_destino": numero_destino,
+                "valor": valor,
+                "moeda_origem": moeda_origem,
+                "moeda_destino": moeda_destino,
+                "lancamentos": lancamentos(alteracoes)
+            })
+        return StatusOperacao.OK
+
+    def depositar_moeda(self, agencia: str, numero: int, valor: float, moeda: str):
+        status = self.tentar_depositar_moeda(agencia, numero, valor, moeda)
+        if status is not StatusOperacao.OK:
+            raise erro_operacao(status, "depósito")
+
+    def transferir_moeda(self, agencia_origem: str, numero_origem: int, agencia_destino: str,
+                         numero_destino: int, valor: float, moeda_origem: str, moeda_destino: str):
+        status = self.tentar_transferir_moeda(agencia_origem, numero_origem, agencia_destino,
+                                              numero_destino, valor, moeda_origem, moeda_destino)
+        if status is not StatusOperacao.OK:
+            raise erro_operacao(status, "transferência")
+
+    def saldos(self, agencia: str, numero: int) -> Dict[str, float]:
+        conta = self._buscar(agencia, numero)
+        saldos = {MOEDA_PADRAO: conta.saldo}
+        for moeda, unidades in conta.saldos_moeda.items():
+            saldos[moeda] = unidades / 10 ** casas_decimais(moeda)
+        return saldos
@@ -0,0 +1,183 @@
+import argparse
+import json
+import sys
+from typing import Callable, Dict, IO, Iterable, List, Optional
+
+from sistema_bancario_otimizado import (
+    BancoException, ContaService, MotorBancario, OperacaoBancariaService,
+    PublicadorEventos, UsuarioService
+)
+
+# Executor de comandos sem interface interativa: cada linha do script é um
+# objeto JSON com o campo "comando" e seus parâmetros, por exemplo
+#   {"comando": "depositar", "agencia": "0001", "numero": 1, "valor": 100}
+class ExecutorComandos:
+    def __init__(self, usuario_service: UsuarioService, conta_service: ContaService,
+                 operacao_service: OperacaoBancariaService):
+        self.usuario_service = usuario_service
+        self.conta_service = conta_service
+        self.operacao_service = operacao_service
+
+        self.comandos: Dict[str, Callable[[Dict], Dict]] = {
+            "cadastrar_usuario": self.cadastrar_usuario,
+            "criar_conta": self.criar_conta,
+            "depositar": self.depositar,
+            "sacar": self.sacar,
+            "transferir": self.transferir,
+            "extrato": self.extrato,
+            "listar_contas": self.listar_contas,
+            "listar_usuarios": self.listar_usuarios,
+            "pesquisar_usuarios": self.pesquisar_usuarios,
+            "estatisticas_agencia": self.estatisticas_agencia,
+        }
+        self.executados = 0
+        self.falhas = 0
+
+    @classmethod
+    def do_motor(cls, motor: MotorBancario) -> 'ExecutorComandos':
+        return cls(motor.usuario_service, motor.conta_service, motor.operacao_service)
+
+    @classmethod
+    def em_memoria(cls, eventos: Optional[PublicadorEventos] = None) -> 'ExecutorComandos':
+        return cls.do_motor(MotorBancario(eventos=eventos))
+
+    def cadastrar_usuario(self, parametros: Dict) -> Dict:
+        usuario = self.usuario_service.cadastrar_usuario(
+            parametros["nome"], parametros["data_nascimento"], parametros["cpf"], parametros["endereco"]
+        )
+        return {"cpf": usuario.cpf}
+
+    def criar_conta(self, parametros: Dict) -> Dict:
+        conta = self.conta_service.criar_conta(parametros.get("agencia", "0001"), parametros["cpf"])
+        return {"agencia": conta.agencia, "numero": conta.numero}
+
+    def depositar(self, parametros: Dict) -> Dict:
+        self.operacao_service.depositar(parametros["agencia"], parametros["numero"], parametros["valor"])
+        return {}
+
+    def sacar(self, parametros: Dict) -> Dict:
+        self.operacao_service.sacar(parametros["agencia"], parametros["numero"], parametros["valor"])
+        return {}
+
+    def transferir(self, parametros: Dict) -> Dict:
+        self.operacao_service.transferir(
+            parametros["agencia_origem"], parametros["numero_origem"],
+            parametros["agencia_destino"], parametros["numero_destino"], parametros["valor"]
+        )
+        return {}
+
+    def extrato(self, parametros: Dict) -> Dict:
+        return {"transacoes": self.operacao_service.obter_extrato(parametros["agencia"], parametros["numero"])}
+
+    def listar_contas(self, parametros: Dict) -> Dict:
+        if "agencia" in parametros:
+            contas = self.conta_service.listar_contas_por_agencia(parametros["agencia"])
+        else:
+            contas = self.conta_service.listar_contas()
+        return {"contas": [
+            {"agencia": conta.agencia, "numero": conta.numero, "cpf": conta.usuario.cpf, "saldo": conta.saldo}
+            for conta in contas
+        ]}
+
+    def listar_usuarios(self, parametros: Dict) -> Dict:
+        return {"usuarios": [usuario.to_dict() for usuario in self.usuario_service.listar_usuarios()]}
+
+    def pesquisar_usuarios(self, parametros: Dict) -> Dict:
+        resultado = self.usuario_service.pesquisar_usuarios(
+            parametros["termo"], parametros.get("campo", "nome"),
+            parametros.get("pagina", 1), parametros.get("tamanho_pagina", 10)
+        )
+        resultado["resultados"] = [usuario.to_dict() for usuario in resultado["resultados"]]
+        return resultado
+
+    def estatisticas_agencia(self, parametros: Dict) -> Dict:
+        return self.conta_service.estatisticas_agencia(parametros["agencia"])
+
+    def executar_comando(self, parametros: Dict) -> Dict:
+        self.executados += 1
+        if not isinstance(parametros, dict):
+            # JSON válido, mas não um objeto (lista, número, texto)
+            self.falhas += 1
+            return {"ok": False, "comando": None, "erro": "Comando deve ser um objeto JSON"}
+        comando = parametros.get("comando")
+        if not isinstance(comando, str):
+            # Ausente ou de outro tipo (lista, número): nem pode ser procurado
+            self.falhas += 1
+            return {"ok": False, "comando": None, "erro": "Campo \"comando\" deve ser um texto"}
+        funcao = self.comandos.get(comando)
+        if funcao is None:
+            self.falhas += 1
+            return {"ok": False, "comando": comando, "erro": "Comando desconhecido"}
+
+        try:
+            resultado = funcao(parametros)
+        except KeyError as e:
+            self.falhas += 1
+            return {"ok": False, "comando": comando, "erro": f"Parâmetro ausente: {e.args[0]}"}
+        except BancoException as e:
+            # Recusa pelas regras do banco (saldo, limites, conta inexistente),
+            # distinta de um comando malformado
+            self.falhas += 1
+            return {"ok": False, "comando": comando, "erro": str(e) or e.__class__.__name__, "recusa": True}
+        except (TypeError, ValueError) as e:
+            self.falhas += 1
+            return {"ok": False, "comando": comando, "erro": str(e) or e.__class__.__name__}
+
+        resultado["ok"] = True
+        resultado["comando"] = comando
+        return resultado
+
+    def executar(self, linhas: Iterable[str], saida: Optional[IO[str]] = None,
+                 tamanho_buffer: int = 1000) -> None:
+        # Resultados são acumulados e gravados em blocos para não pagar uma
+        # escrita por comando
+        buffer: List[str] = []
+        for linha in linhas:
+            linha = linha.strip()
+            if not linha or linha.startswith("#"):
+                continue
+
+            try:
+                parametros = json.loads(linha)
+            except json.JSONDecodeError as e:
+                self.executados += 1
+                self.falhas += 1
+                resultado = {"ok": False, "erro": f"JSON inválido: {e}"}
+            else:
+                resultado = self.executar_comando(parametros)
+
+            if saida is not None:
+                buffer.append(json.dumps(resultado, ensure_ascii=False))
+                if len(buffer) >= tamanho_buffer:
+                    saida.write("\n".join(buffer) + "\n")
+                    buffer.clear()
+
+        if saida is not None and buffer:
+            saida.write("\n".join(buffer) + "\n")
+
+def main(argumentos: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Executa um script JSONL de comandos bancários")
+    parser.add_argument("script", nargs="?", help="arquivo JSONL de comandos (padrão: entrada padrão)")
+    parser.add_argument("-o", "--saida", help="arquivo para os resultados (padrão: saída padrão)")
+    parser.add_argument("-q", "--silencioso", action="store_true", help="não grava os resultados")
+    args = parser.parse_args(argumentos)
+
+    executor = ExecutorComandos.em_memoria()
+    entrada = open(args.script, encoding="utf-8") if args.script else sys.stdin
+    saida = None
+    if not args.silencioso:
+        saida = open(args.saida, "w", encoding="utf-8") if args.saida else sys.stdout
+
+    try:
+        executor.executar(entrada, saida)
+    finally:
+        if args.script:
+            entrada.close()
+        if args.saida and saida is not None:
+            saida.close()
+
+    print(f"Comandos executados: {executor.executados} | Falhas: {executor.falhas}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from cambio import TabelaCambio
+from historico_mmap import MOEDAS_POR_CODIGO, HistoricoMmap, registrar_moeda, registrar_tipo
+from sistema_bancario_otimizado import MOEDA_PADRAO, TIPO_RESUMO, Conta, ContaRepositoryMemory, epoca_us, unidades_menores
+
+DTYPE_CONTA = np.dtype([
+    ("agencia", "<i4"),
+    ("numero", "<i8"),
+    ("saldo", "<f8"),
+    ("saques_realizados", "<i4"),
+    ("total_transacoes", "<i8"),
+    ("versao", "<i8"),
+])
+
+DTYPE_TRANSACAO = np.dtype([
+    ("conta", "<i8"),          # posição da conta no array de contas
+    ("unidades", "<i8"),       # unidades menores da moeda
+    ("epoca_us", "<i8"),
+    ("tipo", "<u2"),
+    ("moeda", "<u2"),          # código de historico_mmap.CODIGOS_MOEDA
+])
+
+# Saldos em moeda estrangeira: uma linha por (conta, moeda)
+DTYPE_SALDO_MOEDA = np.dtype([
+    ("conta", "<i8"),          # posição da conta no array de contas
+    ("moeda", "<u2"),
+    ("unidades", "<i8"),       # unidades menores da moeda
+])
+
+# Mesmo layout do registro de largura fixa de historico_mmap (32 bytes)
+DTYPE_REGISTRO_MMAP = np.dtype([
+    ("unidades", "<i8"),
+    ("epoca_us", "<i8"),
+    ("tipo", "<u2"),
+    ("moeda", "<u2"),
+    ("tamanho_descricao", "<u4"),
+    ("offset_descricao", "<u8"),
+])
+
+# São Paulo não adota horário de verão desde 2019
+DESLOCAMENTO_SAO_PAULO_US = -3 * 3600 * 1_000_000
+MICROSSEGUNDOS_DIA = 86400 * 1_000_000
+
+# Escala dos fatores de câmbio inteiros da reavaliação vetorizada
+ESCALA_FATOR = 10 ** 9
+MAXIMO_INT64 = np.iinfo(np.int64).max
+
+def _inicio_movimentacoes(conta: Conta) -> int:
+    # Históricos compactados começam pela entrada de saldo anterior, que não é
+    # uma movimentação e ficaria contada em dobro nos fluxos
+    transacoes = conta.transacoes
+    return 1 if len(transacoes) and transacoes[0].tipo == TIPO_RESUMO else 0
+
+def exportar_contas(contas: Sequence[Conta]) -> np.ndarray:
+    # Uma coluna por vez, direto dos atributos, sem montar um dicionário por conta
+    quantidade = len(contas)
+    resultado = np.empty(quantidade, dtype=DTYPE_CONTA)
+    resultado["agencia"] = np.fromiter(
+        (ContaRepositoryMemory.chave_agencia(conta.agencia) for conta in contas), np.int32, quantidade)
+    resultado["numero"] = np.fromiter((conta.numero for conta in contas), np.int64, quantidade)
+    resultado["saldo"] = np.fromiter((conta.saldo for conta in contas), np.float64, quantidade)
+    resultado["saques_realizados"] = np.fromiter(
+        (conta.saques_realizados for conta in contas), np.int32, quantidade)
+    resultado["total_transacoes"] = np.fromiter(
+        (len(conta.transacoes) - _inicio_movimentacoes(conta) for conta in contas), np.int64, quantidade)
+    resultado["versao"] = np.fromiter((conta.versao for conta in contas), np.int64, quantidade)
+    return resultado
+
+def _transacoes_mmap(historico: HistoricoMmap) -> np.ndarray:
+    # Visão direta sobre o arquivo mapeado; não copia os registros
+    return np.frombuffer(historico[:].buffer(), dtype=DTYPE_REGISTRO_MMAP)
+
+def exportar_transacoes(contas: Sequence[Conta], contas_exportadas: np.ndarray) -> np.ndarray:
+    total = int(contas_exportadas["total_transacoes"].sum())
+    resultado = np.empty(total, dtype=DTYPE_TRANSACAO)
+
+    posicao = 0
+    for indice, conta in enumerate(contas):
+        inicio = _inicio_movimentacoes(conta)
+        quantidade = len(conta.transacoes) - inicio
+        if quantidade <= 0:
+            continue
+        fatia = resultado[posicao:posicao + quantidade]
+        fatia["conta"] = indice
+
+        if isinstance(conta.transacoes, HistoricoMmap):
+            registros = _transacoes_mmap(conta.transacoes)[inicio:]
+            fatia["unidades"] = registros["unidades"]
+            fatia["epoca_us"] = registros["epoca_us"]
+            fatia["tipo"] = registros["tipo"]
+            fatia["moeda"] = registros["moeda"]
+        else:
+            transacoes = conta.transacoes[inicio:] if inicio else conta.transacoes
+            fatia["unidades"] = np.fromiter(
+                (unidades_menores(transacao.valor, transacao.moeda) for transacao in transacoes), np.int64, quantidade)
+            fatia["epoca_us"] = np.fromiter(
+                (epoca_us(transacao.data) for transacao in transacoes), np.int64, quantidade)
+            fatia["tipo"] = np.fromiter(
+                (registrar_tipo(transacao.tipo) for transacao in transacoes), np.uint16, quantidade)
+            fatia["moeda"] = np.fromiter(
+                (registrar_moeda(transacao.moeda) for transacao in transacoes), np.uint16, quantidade)
+        posicao += quantidade
+
+    return resultado
+
+def exportar(contas: Sequence[Conta]) -> Tuple[np.ndarray, np.ndarray]:
+    contas = list(contas)
+    contas_exportadas = exportar_contas(contas)
+    return contas_exportadas, exportar_transacoes(contas, contas_exportadas)
+
+def colunas(dados: np.ndarray) -> Dict[str, np.ndarray]:
+    # Colunas contíguas, aceitas sem cópia por pyarrow.array / pandas
+    return {nome: np.ascontiguousarray(dados[nome]) for nome in dados.dtype.names}
+
+# Análises vetorizadas
+def distribuicao_saldos(contas_exportadas: np.ndarray, faixas=20) -> Tuple[np.ndarray, np.ndarray]:
+    return np.histogram(contas_exportadas["saldo"], bins=faixas)
+
+def fluxo_liquido_diario(transacoes_exportadas: np.ndarray,
+                         deslocamento_us: int = DESLOCAMENTO_SAO_PAULO_US,
+                         moeda: str = MOEDA_PADRAO) -> Tuple[np.ndarray, np.ndarray]:
+    # Retorna (dias desde 1970-01-01 no horário local, fluxo líquido em unidades menores da moeda)
+    transacoes_exportadas = transacoes_exportadas[transacoes_exportadas["moeda"] == registrar_moeda(moeda)]
+    dias = (transacoes_exportadas["epoca_us"] + deslocamento_us) // MICROSSEGUNDOS_DIA
+    dias_unicos, posicoes = np.unique(dias, return_inverse=True)
+    fluxo = np.bincount(posicoes, weights=transacoes_exportadas["unidades"], minlength=len(dias_unicos))
+    return dias_unicos, fluxo.astype(np.int64)
+
+# Saldos em moeda estrangeira e reavaliação em lote
+def exportar_saldos_moeda(contas: Sequence[Conta]) -> np.ndarray:
+    linhas = [(indice, registrar_moeda(moeda), unidades)
+              for indice, conta in enumerate(contas)
+              for moeda, unidades in conta.saldos_moeda.items()]
+    return np.array(linhas, dtype=DTYPE_SALDO_MOEDA)
+
+def reavaliar_saldos(saldos: np.ndarray, tabela: TabelaCambio,
+                     moeda_destino: str = MOEDA_PADRAO) -> np.ndarray:
+    # Converte todos os saldos de uma vez com fatores inteiros (fator * 10^9) e
+    # arredondamento bancário; coincide com TabelaCambio.converter para cotações
+    # com até 9 casas decimais
+    fatores = np.zeros(max(MOEDAS_POR_CODIGO) + 1, dtype=np.int64)
+    for codigo in np.unique(saldos["moeda"]):
+        fatores[codigo] = tabela.fator_escalado(MOEDAS_POR_CODIGO[int(codigo)], moeda_destino, ESCALA_FATOR)
+    fator = fatores[saldos["moeda"]]
+    unidades = saldos["unidades"]
+
+    # Produtos que estourariam 64 bits são refeitos com inteiros do Python
+    seguro = np.abs(unidades) <= MAXIMO_INT64 // np.maximum(fator, 1)
+    quociente, resto = np.divmod(np.where(seguro, unidades, 0) * fator, ESCALA_FATOR)
+    arredondar = (2 * resto > ESCALA_FATOR) | ((2 * resto == ESCALA_FATOR) & (quociente % 2 == 1))
+    resultado = quociente + arredondar
+
+    for posicao in np.flatnonzero(~seguro):
+        quociente_exato, resto_exato = divmod(int(unidades[posicao]) * int(fator[posicao]), ESCALA_FATOR)
+        if 2 * resto_exato > ESCALA_FATOR or (2 * resto_exato == ESCALA_FATOR and quociente_exato % 2):
+            quociente_exato += 1
+        resultado[posicao] = quociente_exato
+    return resultado
+
+def reavaliar_contas(contas: Sequence[Conta], tabela: TabelaCambio,
+                     moeda_destino: str = MOEDA_PADRAO) -> np.ndarray:
+    # Total por conta dos saldos estrangeiros, em unidades menores da moeda de destino
+    contas = list(contas)
+    saldos = exportar_saldos_moeda(contas)
+    totais = np.zeros(len(contas), dtype=np.int64)
+    np.add.at(totais, saldos["conta"], reavaliar_saldos(saldos, tabela, moeda_destino))
+    return totais
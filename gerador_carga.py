@@ -0,0 +1,317 @@
+import argparse
+import json
+import math
+import sys
+import time
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from executor_lote import ExecutorComandos
+from sistema_bancario_otimizado import MotorBancario
+
+# Destino dos comandos: recebe um comando no formato do executor_lote e
+# devolve o resultado ({"ok": ...}); pode ser o executor em processo ou o
+# cliente de qualquer front-end de rede
+Destino = Callable[[Dict], Dict]
+
+MISTURA_PADRAO = {"depositar": 0.4, "sacar": 0.3, "transferir": 0.2, "extrato": 0.1}
+
+NOMES = ("Ana", "Bruno", "Carla", "Diego", "Elisa", "Felipe", "Gabriela", "Heitor",
+         "Isabela", "João", "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael")
+SOBRENOMES = ("Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira",
+              "Costa", "Rodrigues", "Almeida", "Nascimento", "Carvalho")
+CIDADES = (("São Paulo", "SP"), ("Rio de Janeiro", "RJ"), ("Belo Horizonte", "MG"),
+           ("Salvador", "BA"), ("Curitiba", "PR"), ("Recife", "PE"), ("Porto Alegre", "RS"))
+
+# Gerador pseudoaleatório próprio (xorshift64*): a mesma semente produz a
+# mesma carga em qualquer versão do Python, o que não é garantido para
+# random.choices/randint
+class Sorteio:
+    def __init__(self, semente: int):
+        self.estado = (semente * 0x9E3779B97F4A7C15 + 1) & 0xFFFFFFFFFFFFFFFF or 1
+
+    def proximo(self) -> int:
+        x = self.estado
+        x ^= x >> 12
+        x ^= (x << 25) & 0xFFFFFFFFFFFFFFFF
+        x ^= x >> 27
+        self.estado = x
+        return (x * 0x2545F4914F6CDD1D) & 0xFFFFFFFFFFFFFFFF
+
+    def uniforme(self) -> float:
+        return (self.proximo() >> 11) / float(1 << 53)
+
+    def inteiro(self, limite: int) -> int:
+        # Inteiro em [0, limite)
+        return int(self.uniforme() * limite)
+
+    def escolher(self, itens):
+        return itens[self.inteiro(len(itens))]
+
+    def embaralhar(self, itens: List) -> None:
+        for i in range(len(itens) - 1, 0, -1):
+            j = self.inteiro(i + 1)
+            itens[i], itens[j] = itens[j], itens[i]
+
+# Distribuição discreta por pesos acumulados (busca binária por sorteio)
+class Distribuicao:
+    def __init__(self, pesos: Iterable[float]):
+        self.acumulados = list(accumulate(pesos))
+        if not self.acumulados or self.acumulados[-1] <= 0:
+            raise ValueError("A distribuição precisa de ao menos um peso positivo")
+
+    def sortear(self, sorteio: Sorteio) -> int:
+        indice = bisect_right(self.acumulados, sorteio.uniforme() * self.acumulados[-1])
+        return min(indice, len(self.acumulados) - 1)
+
+def digitos_verificadores(base: str) -> str:
+    # Inverso de UsuarioService.validar_cpf: calcula os dois dígitos finais
+    for peso_inicial in (10, 11):
+        soma = sum(int(digito) * (peso_inicial - i) for i, digito in enumerate(base))
+        resto = soma % 11
+        base += str(0 if resto < 2 else 11 - resto)
+    return base[-2:]
+
+def gerar_cpf(sorteio: Sorteio) -> str:
+    while True:
+        base = "".join(str(sorteio.inteiro(10)) for _ in range(9))
+        if base != base[0] * 9:
+            return base + digitos_verificadores(base)
+
+# Carga sintética determinística: cadastros seguidos de uma mistura de
+# operações com popularidade de contas Zipf (poucas contas recebem a maior
+# parte do tráfego). Os números das contas supõem um destino vazio, no qual a
+# numeração de cada agência começa em 1
+class GeradorCarga:
+    def __init__(self, semente: int = 42, usuarios: int = 1000, contas_por_usuario: int = 1,
+                 agencias: Tuple[str, ...] = ("0001",), operacoes: int = 100000,
+                 mistura: Optional[Dict[str, float]] = None, expoente_zipf: float = 1.1,
+                 valor_medio: float = 150.0, limite_saque: float = 500.0):
+        self.semente = semente
+        self.usuarios = usuarios
+        self.contas_por_usuario = contas_por_usuario
+        self.agencias = agencias
+        self.operacoes = operacoes
+        self.mistura = dict(mistura or MISTURA_PADRAO)
+        self.expoente_zipf = expoente_zipf
+        self.valor_medio = valor_medio
+        # Saques acima do limite por operação do serviço seriam sempre recusados
+        self.limite_saque = limite_saque
+
+    def _valor(self, sorteio: Sorteio) -> float:
+        # Distribuição exponencial: muitos valores pequenos, alguns grandes
+        return max(0.01, round(-self.valor_medio * math.log(1.0 - sorteio.uniforme()), 2))
+
+    def cadastros(self) -> Iterator[Dict]:
+        sorteio = Sorteio(self.semente)
+        cpfs = set()
+        proximos: Dict[str, int] = {}
+        for _ in range(self.usuarios):
+            cpf = gerar_cpf(sorteio)
+            while cpf in cpfs:
+                cpf = gerar_cpf(sorteio)
+            cpfs.add(cpf)
+            cidade, estado = sorteio.escolher(CIDADES)
+            yield {
+                "comando": "cadastrar_usuario",
+                "nome": f"{sorteio.escolher(NOMES)} {sorteio.escolher(SOBRENOMES)}",
+                "data_nascimento": f"{1 + sorteio.inteiro(28):02d}-{1 + sorteio.inteiro(12):02d}-{1940 + sorteio.inteiro(65)}",
+                "cpf": cpf,
+                "endereco": f"Rua {sorteio.escolher(SOBRENOMES)}, {1 + sorteio.inteiro(2000)} - Centro - {cidade}/{estado}"
+            }
+            for _ in range(self.contas_por_usuario):
+                agencia = sorteio.escolher(self.agencias)
+                proximos[agencia] = proximos.get(agencia, 0) + 1
+                yield {"comando": "criar_conta", "agencia": agencia, "cpf": cpf, "numero_esperado": proximos[agencia]}
+
+    def contas(self) -> List[Tuple[str, int]]:
+        return [(comando["agencia"], comando["numero_esperado"])
+                for comando in self.cadastros() if comando["comando"] == "criar_conta"]
+
+    def movimentacoes(self, contas: Optional[List[Tuple[str, int]]] = None) -> Iterator[Dict]:
+        contas = list(contas if contas is not None else self.contas())
+        if not contas:
+            return
+        # Semente distinta da dos cadastros, mas derivada da mesma
+        sorteio = Sorteio(self.semente ^ 0x5DEECE66D)
+        # A ordem de popularidade também é sorteada: as contas quentes não são
+        # sempre as primeiras criadas
+        sorteio.embaralhar(contas)
+        popularidade = Distribuicao(1.0 / (posicao ** self.expoente_zipf) for posicao in range(1, len(contas) + 1))
+        tipos = list(self.mistura)
+        mistura = Distribuicao(self.mistura[tipo] for tipo in tipos)
+
+        for _ in range(self.operacoes):
+            tipo = tipos[mistura.sortear(sorteio)]
+            agencia, numero = contas[popularidade.sortear(sorteio)]
+            if tipo == "transferir":
+                agencia_destino, numero_destino = contas[popularidade.sortear(sorteio)]
+                yield {"comando": "transferir", "agencia_origem": agencia, "numero_origem": numero,
+                       "agencia_destino": agencia_destino, "numero_destino": numero_destino,
+                       "valor": self._valor(sorteio)}
+            elif tipo == "extrato":
+                yield {"comando": "extrato", "agencia": agencia, "numero": numero}
+            elif tipo == "sacar":
+                yield {"comando": tipo, "agencia": agencia, "numero": numero,
+                       "valor": min(self._valor(sorteio), self.limite_saque)}
+            else:
+                yield {"comando": tipo, "agencia": agencia, "numero": numero, "valor": self._valor(sorteio)}
+
+    def comandos(self) -> Iterator[Dict]:
+        yield from self.cadastros()
+        yield from self.movimentacoes()
+
+    def gravar(self, saida: IO[str]) -> int:
+        # Script JSONL reproduzível com o executor_lote ou qualquer front-end
+        quantidade = 0
+        for comando in self.comandos():
+            saida.write(json.dumps(comando, ensure_ascii=False) + "\n")
+            quantidade += 1
+        return quantidade
+
+# Execução e medição: latência por comando e vazão total. Com `taxa`, a carga
+# é aberta (envios em horários fixos); sem ela, o próximo envio espera o anterior.
+# Recusas pelas regras do banco (saldo insuficiente, limites) são contadas à
+# parte das falhas (comandos malformados ou erros do destino). Linhas que nem
+# chegam a ser um comando (JSON inválido, lista, sem "comando") não são
+# enviadas ao destino e entram nas falhas como inválidas
+class ExecucaoCarga:
+    def __init__(self, destino: Destino, taxa: Optional[float] = None,
+                 relogio: Callable[[], float] = time.perf_counter):
+        self.destino = destino
+        self.taxa = taxa
+        self.relogio = relogio
+        self.latencias: Dict[str, List[float]] = {}
+        self.falhas: Dict[str, int] = {}
+        self.recusas: Dict[str, int] = {}
+        self.invalidos = 0
+        # Contas criadas com número diferente do previsto (destino não estava vazio)
+        self.divergencias = 0
+        self.duracao = 0.0
+
+    def executar(self, comandos: Iterable) -> Dict:
+        inicio = self.relogio()
+        for indice, comando in enumerate(comandos):
+            if not isinstance(comando, dict) or not isinstance(comando.get("comando"), str):
+                self.invalidos += 1
+                continue
+            if self.taxa:
+                atraso = inicio + indice / self.taxa - self.relogio()
+                if atraso > 0:
+                    time.sleep(atraso)
+            antes = self.relogio()
+            resultado = self.destino(comando)
+            nome = comando["comando"]
+            self.latencias.setdefault(nome, []).append(self.relogio() - antes)
+            if resultado.get("recusa", False):
+                self.recusas[nome] = self.recusas.get(nome, 0) + 1
+            elif not resultado.get("ok", False):
+                self.falhas[nome] = self.falhas.get(nome, 0) + 1
+            elif "numero_esperado" in comando and resultado.get("numero", comando["numero_esperado"]) != comando["numero_esperado"]:
+                self.divergencias += 1
+        self.duracao = self.relogio() - inicio
+        return self.relatorio()
+
+    @staticmethod
+    def _percentil(ordenadas: List[float], fracao: float) -> float:
+        return ordenadas[min(len(ordenadas) - 1, int(fracao * len(ordenadas)))]
+
+    def relatorio(self) -> Dict:
+        total = sum(len(latencias) for latencias in self.latencias.values())
+        comandos = {}
+        for nome, latencias in sorted(self.latencias.items()):
+            ordenadas = sorted(latencias)
+            recusas = self.recusas.get(nome, 0)
+            comandos[nome] = {
+                "quantidade": len(ordenadas),
+                "recusas": recusas,
+                "taxa_recusa": recusas / len(ordenadas),
+                "falhas": self.falhas.get(nome, 0),
+                "p50_ms": self._percentil(ordenadas, 0.5) * 1000,
+                "p99_ms": self._percentil(ordenadas, 0.99) * 1000,
+                "max_ms": ordenadas[-1] * 1000
+            }
+        return {
+            "comandos": total,
+            "duracao": self.duracao,
+            "vazao": total / self.duracao if self.duracao else 0.0,
+            "divergencias": self.divergencias,
+            "recusas": sum(self.recusas.values()),
+            "falhas": sum(self.falhas.values()) + self.invalidos,
+            "invalidos": self.invalidos,
+            "por_comando": comandos
+        }
+
+# O limite de quantidade de saques do serviço vale por toda a vida da conta
+# (não é reiniciado a cada dia); em uma carga longa ele recusaria quase todos
+# os saques das contas populares, então o destino em processo usa um limite alto
+LIMITE_SAQUES_CARGA = 1_000_000_000
+
+def destino_em_processo(motor: Optional[MotorBancario] = None,
+                        limite_saques: Optional[int] = None) -> Destino:
+    # Um motor criado aqui recebe LIMITE_SAQUES_CARGA; o de quem chama só tem
+    # o limite alterado quando `limite_saques` é informado
+    if motor is None:
+        motor = MotorBancario()
+        if limite_saques is None:
+            limite_saques = LIMITE_SAQUES_CARGA
+    if limite_saques is not None:
+        motor.operacao_service.limite_saques_diarios = limite_saques
+    return ExecutorComandos.do_motor(motor).executar_comando
+
+def ler_comandos(linhas: Iterable[str]) -> Iterator:
+    # Linhas que não são JSON seguem como texto, contadas como inválidas na execução
+    for linha in linhas:
+        if not linha.strip() or linha.lstrip().startswith("#"):
+            continue
+        try:
+            yield json.loads(linha)
+        except json.JSONDecodeError:
+            yield linha
+
+def reproduzir(linhas: Iterable[str], destino: Destino, taxa: Optional[float] = None) -> Dict:
+    # Reproduz um script JSONL gravado (gerado ou capturado) contra um destino
+    return ExecucaoCarga(destino, taxa).executar(ler_comandos(linhas))
+
+def main(argumentos: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Gera carga sintética determinística ou reproduz um script JSONL")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--contas-por-usuario", type=int, default=1)
+    parser.add_argument("--agencias", default="0001", help="agências separadas por vírgula")
+    parser.add_argument("--operacoes", type=int, default=100000)
+    parser.add_argument("--mistura", help='pesos em JSON, ex.: {"depositar": 0.5, "extrato": 0.5}')
+    parser.add_argument("--zipf", type=float, default=1.1, help="expoente da popularidade das contas")
+    parser.add_argument("--taxa", type=float, help="comandos por segundo (padrão: sem limite)")
+    parser.add_argument("--limite-saques", type=int, default=LIMITE_SAQUES_CARGA,
+                        help="saques permitidos por conta no destino em processo")
+    parser.add_argument("-o", "--saida", help="grava a carga em JSONL em vez de executá-la")
+    parser.add_argument("--reproduzir", help="executa um script JSONL existente")
+    args = parser.parse_args(argumentos)
+
+    if args.reproduzir:
+        with open(args.reproduzir, encoding="utf-8") as entrada:
+            relatorio = reproduzir(entrada, destino_em_processo(limite_saques=args.limite_saques), args.taxa)
+        print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+        return 0
+
+    gerador = GeradorCarga(
+        semente=args.semente, usuarios=args.usuarios, contas_por_usuario=args.contas_por_usuario,
+        agencias=tuple(agencia.strip() for agencia in args.agencias.split(",")),
+        operacoes=args.operacoes, mistura=json.loads(args.mistura) if args.mistura else None,
+        expoente_zipf=args.zipf
+    )
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as saida:
+            quantidade = gerador.gravar(saida)
+        print(f"Comandos gravados: {quantidade}", file=sys.stderr)
+        return 0
+
+    relatorio = ExecucaoCarga(destino_em_processo(limite_saques=args.limite_saques),
+                              args.taxa).executar(gerador.comandos())
+    print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+import mmap
+import os
+import struct
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from sistema_bancario_otimizado import (
+    FUSO_HORARIO, MOEDA_PADRAO, TIPO_RESUMO, BancoException, Conta, ContaRepositoryMemory, Transacao,
+    casas_decimais, epoca_us, repositorio_base, unidades_menores
+)
+
+# Cabeçalho: assinatura do formato e quantidade de registros gravados.
+# Na versão 1 os valores eram sempre gravados com duas casas decimais
+CABECALHO = struct.Struct("<8sQ")
+ASSINATURA = b"HISTBNC2"
+
+# Registro de largura fixa: valor em unidades menores da moeda, época em microssegundos, código do tipo,
+# código da moeda, tamanho e deslocamento da descrição no arquivo de descrições
+REGISTRO = struct.Struct("<qqHHIQ")
+EPOCA = struct.Struct("<q")
+OFFSET_EPOCA = 8
+
+CAPACIDADE_INICIAL = 1024
+
+# Códigos persistidos no arquivo; módulos que criam novos tipos de transação
+# devem registrá-los na importação, sempre na mesma ordem
+CODIGOS_TIPO: Dict[str, int] = {
+    "Depósito": 1,
+    "Saque": 2,
+    "Transferência Enviada": 3,
+    "Transferência Recebida": 4,
+    TIPO_RESUMO: 5,
+}
+TIPOS_POR_CODIGO: Dict[int, str] = {codigo: tipo for tipo, codigo in CODIGOS_TIPO.items()}
+
+# Códigos de moeda persistidos; o real é 0, que também é o valor dos
+# registros gravados antes do suporte a várias moedas
+CODIGOS_MOEDA: Dict[str, int] = {MOEDA_PADRAO: 0, "USD": 1, "EUR": 2, "GBP": 3, "JPY": 4, "ARS": 5}
+MOEDAS_POR_CODIGO: Dict[int, str] = {codigo: moeda for moeda, codigo in CODIGOS_MOEDA.items()}
+# Demais moedas ISO 4217: código derivado das três letras (base 26), igual em
+# qualquer processo, independentemente da ordem em que aparecem
+BASE_CODIGO_MOEDA = 1000
+
+def registrar_moeda(moeda: str) -> int:
+    codigo = CODIGOS_MOEDA.get(moeda)
+    if codigo is None:
+        if not (isinstance(moeda, str) and len(moeda) == 3 and moeda.isascii() and moeda.isupper()
+                and moeda.isalpha()):
+            raise BancoException(f"Código de moeda inválido: {moeda}")
+        valor = 0
+        for letra in moeda:
+            valor = valor * 26 + ord(letra) - ord("A")
+        codigo = BASE_CODIGO_MOEDA + valor
+        CODIGOS_MOEDA[moeda] = codigo
+        MOEDAS_POR_CODIGO[codigo] = moeda
+    return codigo
+
+def registrar_tipo(tipo: str) -> int:
+    codigo = CODIGOS_TIPO.get(tipo)
+    if codigo is None:
+        codigo = max(TIPOS_POR_CODIGO, default=0) + 1
+        CODIGOS_TIPO[tipo] = codigo
+        TIPOS_POR_CODIGO[codigo] = tipo
+    return codigo
+
+# Visão somente leitura sobre um intervalo de registros, sem cópia dos dados
+class FatiaHistorico:
+    def __init__(self, historico: 'HistoricoMmap', inicio: int, fim: int):
+        self.historico = historico
+        self.inicio = inicio
+        self.fim = max(inicio, fim)
+
+    def __len__(self) -> int:
+        return self.fim - self.inicio
+
+    def __iter__(self) -> Iterator[Transacao]:
+        for indice in range(self.inicio, self.fim):
+            yield self.historico._ler(indice)
+
+    def __getitem__(self, indice: int) -> Transacao:
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError("Índice fora do intervalo do histórico")
+        return self.historico._ler(self.inicio + indice)
+
+    def buffer(self) -> memoryview:
+        # Bytes crus dos registros, diretamente sobre o arquivo mapeado
+        return self.historico._visao_registros(self.inicio, self.fim)
+
+    def obter_extrato(self) -> List[Dict]:
+        return [transacao.to_dict() for transacao in self]
+
+# Histórico de transações em arquivo mapeado em memória, compatível com a
+# lista usada em Conta.transacoes (append, len, indexação, fatias e iteração)
+class HistoricoMmap:
+    def __init__(self, caminho: str, capacidade_inicial: int = CAPACIDADE_INICIAL):
+        self.caminho = caminho
+        self.caminho_descricoes = caminho + ".desc"
+
+        novo = not os.path.exists(caminho) or os.path.getsize(caminho) == 0
+        self._arquivo = open(caminho, "a+b")
+        self._descricoes = open(self.caminho_descricoes, "a+b")
+
+        if novo:
+            self._capacidade = max(1, capacidade_inicial)
+            self._arquivo.truncate(CABECALHO.size + self._capacidade * REGISTRO.size)
+            self._mapa = mmap.mmap(self._arquivo.fileno(), 0)
+            self._tamanho = 0
+            self._gravar_cabecalho()
+        else:
+            tamanho_arquivo = os.path.getsize(caminho)
+            self._capacidade = (tamanho_arquivo - CABECALHO.size) // REGISTRO.size
+            self._mapa = mmap.mmap(self._arquivo.fileno(), 0)
+            assinatura, self._tamanho = CABECALHO.unpack_from(self._mapa, 0)
+            if assinatura != ASSINATURA:
+                raise BancoException("Arquivo de histórico inválido")
+
+        self._descricoes.seek(0, os.SEEK_END)
+        self._fim_descricoes = self._descricoes.tell()
+        self._descricoes_pendentes = False
+
+    def _gravar_cabecalho(self) -> None:
+        CABECALHO.pack_into(self._mapa, 0, ASSINATURA, self._tamanho)
+
+    def _crescer(self) -> None:
+        # O mapa anterior não é fechado: fatias ainda abertas continuam válidas
+        self._mapa.flush()
+        self._capacidade *= 2
+        self._arquivo.truncate(CABECALHO.size + self._capacidade * REGISTRO.size)
+        self._mapa = mmap.mmap(self._arquivo.fileno(), 0)
+
+    def _deslocamento(self, indice: int) -> int:
+        return CABECALHO.size + indice * REGISTRO.size
+
+    def _visao_registros(self, inicio: int, fim: int) -> memoryview:
+        return memoryview(self._mapa)[self._deslocamento(inicio):self._deslocamento(fim)]
+
+    def _ler_registro(self, indice: int) -> Tuple[int, int, int, int, int, int]:
+        return REGISTRO.unpack_from(self._mapa, self._deslocamento(indice))
+
+    def _ler(self, indice: int) -> Transacao:
+        unidades, epoca, codigo, codigo_moeda, tamanho_descricao, offset_descricao = self._ler_registro(indice)
+        descricao = ""
+        if tamanho_descricao:
+            if self._descricoes_pendentes:
+                self._descricoes.flush()
+                self._descricoes_pendentes = False
+            descricao = os.pread(self._descricoes.fileno(), tamanho_descricao,
+                                 offset_descricao).decode("utf-8")
+        data = datetime.fromtimestamp(epoca / 1_000_000, tz=FUSO_HORARIO)
+        moeda = MOEDAS_POR_CODIGO[codigo_moeda]
+        return Transacao(TIPOS_POR_CODIGO[codigo], unidades / 10 ** casas_decimais(moeda), descricao, data, moeda)
+
+    def validar(self, transacao: Transacao) -> None:
+        # Chamado pelo repositório antes de aplicar qualquer alteração de uma
+        # confirmação: uma transação que não pode ser gravada não deixa nenhuma
+        # conta alterada pela metade
+        if transacao.tipo not in CODIGOS_TIPO:
+            raise BancoException(f"Tipo de transação não registrado: {transacao.tipo}")
+        registrar_moeda(transacao.moeda)
+
+    def append(self, transacao: Transacao) -> None:
+        self.validar(transacao)
+        codigo = CODIGOS_TIPO[transacao.tipo]
+        codigo_moeda = CODIGOS_MOEDA[transacao.moeda]
+        if self._tamanho >= self._capacidade:
+            self._crescer()
+
+        tamanho_descricao = offset_descricao = 0
+        if transacao.descricao:
+            dados = transacao.descricao.encode("utf-8")
+            offset_descricao = self._fim_descricoes
+            self._descricoes.write(dados)
+            self._fim_descricoes += len(dados)
+            self._descricoes_pendentes = True
+            tamanho_descricao = len(dados)
+
+        epoca = epoca_us(transacao.data)
+        REGISTRO.pack_into(
+            self._mapa, self._deslocamento(self._tamanho),
+            unidades_menores(transacao.valor, transacao.moeda), epoca, codigo, codigo_moeda,
+            tamanho_descricao, offset_descricao
+        )
+        self._tamanho += 1
+        self._gravar_cabecalho()
+
+    def truncar(self) -> None:
+        # Descarta todos os registros; a capacidade já alocada é mantida
+        self._tamanho = 0
+        self._gravar_cabecalho()
+        self._descricoes.truncate(0)
+        self._fim_descricoes = 0
+        self._descricoes_pendentes = False
+
+    def extend(self, transacoes) -> None:
+        for transacao in transacoes:
+            self.append(transacao)
+
+    def __len__(self) -> int:
+        return self._tamanho
+
+    def __bool__(self) -> bool:
+        return self._tamanho > 0
+
+    def __iter__(self) -> Iterator[Transacao]:
+        for indice in range(self._tamanho):
+            yield self._ler(indice)
+
+    def __getitem__(self, indice: Union[int, slice]) -> Union[Transacao, FatiaHistorico]:
+        if isinstance(indice, slice):
+            inicio, fim, passo = indice.indices(self._tamanho)
+            if passo != 1:
+                raise ValueError("Fatias do histórico não suportam passo")
+            return FatiaHistorico(self, inicio, fim)
+
+        if indice < 0:
+            indice += self._tamanho
+        if not 0 <= indice < self._tamanho:
+            raise IndexError("Índice fora do intervalo do histórico")
+        return self._ler(indice)
+
+    def intervalo(self, inicio: datetime, fim: datetime) -> FatiaHistorico:
+        return FatiaHistorico(self, self._primeiro_a_partir(epoca_us(inicio)),
+                              self._primeiro_a_partir(epoca_us(fim)))
+
+    def periodo(self, inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> FatiaHistorico:
+        # Usado por Conta.transacoes_periodo; limites ausentes abrangem todo o histórico
+        return FatiaHistorico(self, 0 if inicio is None else self._primeiro_a_partir(epoca_us(inicio)),
+                              self._tamanho if fim is None else self._primeiro_a_partir(epoca_us(fim)))
+
+    def _primeiro_a_partir(self, epoca: int) -> int:
+        # Busca binária direto no arquivo; as transações são gravadas em ordem cronológica
+        baixo, alto = 0, self._tamanho
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if EPOCA.unpack_from(self._mapa, self._deslocamento(meio) + OFFSET_EPOCA)[0] < epoca:
+                baixo = meio + 1
+            else:
+                alto = meio
+        return baixo
+
+    def flush(self) -> None:
+        self._descricoes.flush()
+        self._mapa.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._descricoes.close()
+        self._arquivo.close()
+
+    def __enter__(self) -> 'HistoricoMmap':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+def _mesmo_registro(gravada: Transacao, transacao: Transacao) -> bool:
+    # Compara pelo que o arquivo guarda: unidades menores e microssegundos
+    return (gravada.tipo == transacao.tipo and gravada.moeda == transacao.moeda
+            and gravada.descricao == transacao.descricao
+            and unidades_menores(gravada.valor, gravada.moeda) == unidades_menores(transacao.valor, transacao.moeda)
+            and epoca_us(gravada.data) == epoca_us(transacao.data))
+
+def anexar_historico_mmap(conta: Conta, diretorio: str, conta_repo: ContaRepositoryMemory) -> HistoricoMmap:
+    # Migra o histórico atual da conta para um arquivo próprio e o substitui
+    conta_repo = repositorio_base(conta_repo)
+    if not isinstance(conta_repo, ContaRepositoryMemory):
+        raise BancoException("Histórico mapeado disponível apenas para o repositório em memória")
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"{conta.agencia}_{conta.numero}.hist")
+    try:
+        historico = HistoricoMmap(caminho)
+    except BancoException:
+        # Arquivo de outro formato: é recriado a partir do histórico da conta
+        os.remove(caminho)
+        historico = HistoricoMmap(caminho)
+    # A cópia do que já existe fica fora da trava: o histórico é somente anexação
+    origem = conta.transacoes
+    copiadas = len(origem)
+    # Um arquivo existente só é aproveitado se já contém exatamente o histórico
+    # atual; caso contrário (outra conta, outro ponto no tempo) é reescrito
+    if not (len(historico) == copiadas and (copiadas == 0 or _mesmo_registro(historico[-1], origem[copiadas - 1]))):
+        historico.truncar()
+        historico.extend(islice(origem, copiadas))
+    if not conta_repo.substituir_historico(conta, origem, historico, copiadas):
+        historico.close()
+        raise BancoException("Histórico substituído durante a migração")
+    return historico
@@ -0,0 +1,253 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from sistema_bancario_otimizado import (
+    BancoException, ContaRepository, OperacaoBancariaService, StatusOperacao, erro_operacao
+)
+
+PRIORIDADE_MOVIMENTACAO = 0
+PRIORIDADE_CONSULTA = 1
+
+# Balde de tokens: até `capacidade` requisições em rajada, reabastecido a `taxa` por segundo
+class BaldeTokens:
+    __slots__ = ("taxa", "capacidade", "tokens", "atualizado_em")
+
+    def __init__(self, taxa: float, capacidade: float, agora: float):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tokens = capacidade
+        self.atualizado_em = agora
+
+    def consumir(self, agora: float, quantidade: float = 1.0) -> bool:
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado_em) * self.taxa)
+        self.atualizado_em = agora
+        if self.tokens >= quantidade:
+            self.tokens -= quantidade
+            return True
+        return False
+
+# Um balde por chave (CPF, cliente); chaves inativas são descartadas em ordem LRU
+class LimitadorTaxa:
+    def __init__(self, taxa: float, capacidade: float, max_chaves: int = 100000,
+                 relogio: Callable[[], float] = time.monotonic):
+        if taxa <= 0 or capacidade <= 0:
+            raise ValueError("Taxa e capacidade do limitador devem ser positivas")
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.max_chaves = max_chaves
+        self.relogio = relogio
+        self._baldes: "OrderedDict[Hashable, BaldeTokens]" = OrderedDict()
+        self._trava = threading.Lock()
+
+        self.permitidas = 0
+        self.rejeitadas = 0
+
+    def permitir(self, chave: Hashable) -> bool:
+        agora = self.relogio()
+        with self._trava:
+            balde = self._baldes.get(chave)
+            if balde is None:
+                balde = self._baldes[chave] = BaldeTokens(self.taxa, self.capacidade, agora)
+                if len(self._baldes) > self.max_chaves:
+                    self._baldes.popitem(last=False)
+            else:
+                self._baldes.move_to_end(chave)
+
+            if balde.consumir(agora):
+                self.permitidas += 1
+                return True
+            self.rejeitadas += 1
+            return False
+
+    def devolver(self, chave: Hashable) -> None:
+        # Estorna o token de uma requisição permitida que foi barrada adiante
+        with self._trava:
+            balde = self._baldes.get(chave)
+            if balde is not None:
+                balde.tokens = min(balde.capacidade, balde.tokens + 1.0)
+                self.permitidas -= 1
+
+    def estatisticas(self) -> Dict:
+        return {"permitidas": self.permitidas, "rejeitadas": self.rejeitadas, "chaves": len(self._baldes)}
+
+# Controle de admissão global: rejeita de imediato quando a quantidade de
+# operações em andamento (ou a fila do front-end) ou a latência média passam
+# dos alvos; consultas são descartadas antes das movimentações de dinheiro.
+# Com a latência acima do alvo, uma operação de sondagem é admitida a cada
+# `intervalo_sondagem` segundos para medir se a latência já voltou ao normal
+class ControleAdmissao:
+    def __init__(self, max_em_andamento: int = 256, latencia_alvo: float = 0.05,
+                 fracao_consultas: float = 0.5, medir_fila: Optional[Callable[[], int]] = None,
+                 max_fila: int = 1000, suavizacao: float = 0.1, intervalo_sondagem: float = 0.1,
+                 relogio: Callable[[], float] = time.perf_counter):
+        self.max_em_andamento = max_em_andamento
+        self.latencia_alvo = latencia_alvo
+        # Consultas só são admitidas abaixo desta fração dos limites
+        self.fracao_consultas = fracao_consultas
+        self.medir_fila = medir_fila
+        self.max_fila = max_fila
+        self.suavizacao = suavizacao
+        self.intervalo_sondagem = intervalo_sondagem
+        self.relogio = relogio
+        self._trava = threading.Lock()
+        self._proxima_sondagem = 0.0
+
+        self.sondagens = 0
+        self.em_andamento = 0
+        self.latencia_media = 0.0
+        self.admitidas = [0, 0]
+        self.rejeitadas = [0, 0]
+
+    def admitir(self, prioridade: int = PRIORIDADE_MOVIMENTACAO) -> bool:
+        fator = 1.0 if prioridade == PRIORIDADE_MOVIMENTACAO else self.fracao_consultas
+        fila = self.medir_fila() if self.medir_fila is not None else 0
+        with self._trava:
+            if self.em_andamento >= self.max_em_andamento * fator or fila >= self.max_fila * fator:
+                self.rejeitadas[prioridade] += 1
+                return False
+            if self.latencia_media > self.latencia_alvo * fator:
+                # Sem operações admitidas a média não seria atualizada: a
+                # sondagem, limitada no tempo, é quem a mantém medida
+                agora = self.relogio()
+                if agora < self._proxima_sondagem:
+                    self.rejeitadas[prioridade] += 1
+                    return False
+                self._proxima_sondagem = agora + self.intervalo_sondagem
+                self.sondagens += 1
+            self.em_andamento += 1
+            self.admitidas[prioridade] += 1
+            return True
+
+    def concluir(self, duracao: float) -> None:
+        with self._trava:
+            self.em_andamento -= 1
+            # Média móvel exponencial: recupera-se sozinha quando a carga diminui
+            self.latencia_media += self.suavizacao * (duracao - self.latencia_media)
+
+    def estatisticas(self) -> Dict:
+        return {
+            "em_andamento": self.em_andamento,
+            "latencia_media": self.latencia_media,
+            "sondagens": self.sondagens,
+            "admitidas_movimentacao": self.admitidas[PRIORIDADE_MOVIMENTACAO],
+            "admitidas_consulta": self.admitidas[PRIORIDADE_CONSULTA],
+            "rejeitadas_movimentacao": self.rejeitadas[PRIORIDADE_MOVIMENTACAO],
+            "rejeitadas_consulta": self.rejeitadas[PRIORIDADE_CONSULTA]
+        }
+
+# Fachada do OperacaoBancariaService para front-ends de rede: aplica limites
+# por CPF e por cliente e o controle de admissão antes de chegar ao serviço
+class OperacaoBancariaProtegida:
+    def __init__(self, servico: OperacaoBancariaService, conta_repo: ContaRepository,
+                 limite_cpf: Optional[LimitadorTaxa] = None,
+                 limite_cliente: Optional[LimitadorTaxa] = None,
+                 admissao: Optional[ControleAdmissao] = None):
+        self.servico = servico
+        self.conta_repo = conta_repo
+        self.limite_cpf = limite_cpf
+        self.limite_cliente = limite_cliente
+        self.admissao = admissao
+
+    def _cpf_titular(self, agencia: str, numero: int) -> Optional[str]:
+        # Conta inexistente ou identificação inválida: o serviço responde com o status
+        try:
+            conta = self.conta_repo.buscar_por_agencia_numero(agencia, numero)
+        except BancoException:
+            return None
+        return conta.usuario.cpf if conta else None
+
+    def _verificar(self, agencia: str, numero: int, cliente: Optional[Hashable],
+                   prioridade: int) -> StatusOperacao:
+        # Uma operação barrada em qualquer etapa não consome a cota das demais:
+        # os tokens já retirados são devolvidos
+        consumidos: List[Tuple[LimitadorTaxa, Hashable]] = []
+        status = StatusOperacao.OK
+        if self.limite_cliente is not None and cliente is not None:
+            if self.limite_cliente.permitir(cliente):
+                consumidos.append((self.limite_cliente, cliente))
+            else:
+                status = StatusOperacao.LIMITE_TAXA
+        if status is StatusOperacao.OK and self.limite_cpf is not None:
+            cpf = self._cpf_titular(agencia, numero)
+            if cpf is not None:
+                if self.limite_cpf.permitir(cpf):
+                    consumidos.append((self.limite_cpf, cpf))
+                else:
+                    status = StatusOperacao.LIMITE_TAXA
+        if status is StatusOperacao.OK and self.admissao is not None and not self.admissao.admitir(prioridade):
+            status = StatusOperacao.SOBRECARGA
+        if status is not StatusOperacao.OK:
+            for limitador, chave in consumidos:
+                limitador.devolver(chave)
+        return status
+
+    def _executar(self, agencia: str, numero: int, cliente: Optional[Hashable], prioridade: int,
+                  operacao: Callable[[], StatusOperacao]) -> StatusOperacao:
+        status = self._verificar(agencia, numero, cliente, prioridade)
+        if status is not StatusOperacao.OK:
+            return status
+        if self.admissao is None:
+            return operacao()
+
+        inicio = self.admissao.relogio()
+        try:
+            return operacao()
+        finally:
+            self.admissao.concluir(self.admissao.relogio() - inicio)
+
+    # API por código de resultado
+    def tentar_depositar(self, agencia: str, numero: int, valor: float,
+                         cliente: Optional[Hashable] = None) -> StatusOperacao:
+        return self._executar(agencia, numero, cliente, PRIORIDADE_MOVIMENTACAO,
+                              lambda: self.servico.tentar_depositar(agencia, numero, valor))
+
+    def tentar_sacar(self, agencia: str, numero: int, valor: float,
+                     cliente: Optional[Hashable] = None) -> StatusOperacao:
+        return self._executar(agencia, numero, cliente, PRIORIDADE_MOVIMENTACAO,
+                              lambda: self.servico.tentar_sacar(agencia, numero, valor))
+
+    def tentar_transferir(self, agencia_origem: str, numero_origem: int, agencia_destino: str,
+                          numero_destino: int, valor: float,
+                          cliente: Optional[Hashable] = None) -> StatusOperacao:
+        return self._executar(agencia_origem, numero_origem, cliente, PRIORIDADE_MOVIMENTACAO,
+                              lambda: self.servico.tentar_transferir(
+                                  agencia_origem, numero_origem, agencia_destino, numero_destino, valor))
+
+    # API tradicional
+    def depositar(self, agencia: str, numero: int, valor: float, cliente: Optional[Hashable] = None):
+        status = self.tentar_depositar(agencia, numero, valor, cliente)
+        if status is not StatusOperacao.OK:
+            raise erro_operacao(status, "depósito")
+
+    def sacar(self, agencia: str, numero: int, valor: float, cliente: Optional[Hashable] = None):
+        status = self.tentar_sacar(agencia, numero, valor, cliente)
+        if status is not StatusOperacao.OK:
+            raise erro_operacao(status, "saque", self.servico.limite_saque, self.servico.limite_saques_diarios)
+
+    def transferir(self, agencia_origem: str, numero_origem: int, agencia_destino: str,
+                   numero_destino: int, valor: float, cliente: Optional[Hashable] = None):
+        status = self.tentar_transferir(agencia_origem, numero_origem, agencia_destino,
+                                        numero_destino, valor, cliente)
+        if status is not StatusOperacao.OK:
+            raise erro_operacao(status, "transferência")
+
+    def obter_extrato(self, agencia: str, numero: int, cliente: Optional[Hashable] = None) -> List[Dict]:
+        resultado: List[List[Dict]] = []
+
+        def consultar() -> StatusOperacao:
+            resultado.append(self.servico.obter_extrato(agencia, numero))
+            return StatusOperacao.OK
+
+        status = self._executar(agencia, numero, cliente, PRIORIDADE_CONSULTA, consultar)
+        if status is not StatusOperacao.OK:
+            raise erro_operacao(status, "extrato")
+        return resultado[0]
+
+    def estatisticas(self) -> Dict:
+        return {
+            "limite_cpf": self.limite_cpf.estatisticas() if self.limite_cpf else None,
+            "limite_cliente": self.limite_cliente.estatisticas() if self.limite_cliente else None,
+            "admissao": self.admissao.estatisticas() if self.admissao else None
+        }
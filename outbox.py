@@ -0,0 +1,325 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import suppress
+from itertools import islice
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from sistema_bancario_otimizado import PublicadorEventos
+
+# Mensagem do outbox: (identificador, tipo, dados, instante de registro)
+Mensagem = Tuple[int, str, Dict, float]
+
+TIPOS_OPERACAO = ("deposito", "saque", "transferencia")
+
+# Outbox transacional: recebe as operações confirmadas pelos serviços e as
+# mantém em uma fila limitada até que todos os consumidores confirmem a entrega.
+# Com a fila cheia, as mensagens seguintes continuam numeradas em sequência e vão
+# para o transbordo, entregue aos consumidores na mesma ordem depois da fila.
+# O transbordo volta a ficar vazio quando todos os consumidores o confirmam.
+# Sem consumidores registrados, nada é retido
+class Outbox:
+    def __init__(self, eventos: PublicadorEventos, capacidade: int = 100000,
+                 arquivo_transbordo: Optional[str] = None, espera_falha: float = 1.0,
+                 capacidade_transbordo: int = 100000):
+        if capacidade <= 0 or capacidade_transbordo <= 0:
+            raise ValueError("Capacidade do outbox deve ser positiva")
+
+        self.capacidade = capacidade
+        # Sem arquivo, o transbordo fica todo em memória; com arquivo, apenas o
+        # que a gravadora ainda não gravou. Acima do limite, as mensagens são
+        # rejeitadas (e contadas): a operação já foi confirmada e não espera
+        self.capacidade_transbordo = capacidade_transbordo
+        self.arquivo_transbordo = arquivo_transbordo
+        self.espera_falha = espera_falha
+        self._mensagens: Deque[Mensagem] = deque()
+        self._proximo_id = 1
+        # Cursor de cada consumidor: último identificador confirmado
+        self._cursores: Dict[str, int] = {}
+        self._trava = threading.Lock()
+        self._novas = threading.Event()
+
+        # Transbordo: identificadores contíguos a partir de _inicio_transbordo,
+        # nesta ordem: gravados no arquivo (deslocamento de cada linha), em
+        # gravação pela thread gravadora e aguardando gravação
+        self._inicio_transbordo: Optional[int] = None
+        self._momento_transbordo = 0.0
+        self._deslocamentos: List[int] = []
+        self._em_gravacao: List[Mensagem] = []
+        self._a_gravar: List[Mensagem] = []
+        self._truncar = False
+        self._gravar = threading.Event()
+        self._gravadora: Optional[threading.Thread] = None
+
+        self.registradas = 0
+        self.transbordadas = 0
+        self.rejeitadas = 0
+        self.gravadas = 0
+        self.falhas_gravacao = 0
+        self.profundidade_maxima = 0
+        eventos.assinar(self)
+
+    def __call__(self, tipo: str, dados: Dict) -> None:
+        if tipo not in TIPOS_OPERACAO:
+            return
+
+        with self._trava:
+            if not self._cursores:
+                return
+            # Uma vez transbordando, tudo segue para o transbordo até ele esvaziar
+            transbordar = self._inicio_transbordo is not None or len(self._mensagens) >= self.capacidade
+            if transbordar and len(self._em_gravacao) + len(self._a_gravar) >= self.capacidade_transbordo:
+                self.rejeitadas += 1
+                return
+            mensagem = (self._proximo_id, tipo, dados, time.time())
+            self._proximo_id += 1
+            self.registradas += 1
+            if transbordar:
+                self._transbordar(mensagem)
+            else:
+                self._mensagens.append(mensagem)
+            profundidade = self._profundidade()
+            if profundidade > self.profundidade_maxima:
+                self.profundidade_maxima = profundidade
+        self._novas.set()
+
+    def _transbordar(self, mensagem: Mensagem) -> None:
+        # Sob a trava: a operação já foi confirmada e não pode esperar pelo disco,
+        # então apenas entrega a mensagem à thread gravadora
+        if self._inicio_transbordo is None:
+            self._inicio_transbordo = mensagem[0]
+            self._momento_transbordo = mensagem[3]
+        self._a_gravar.append(mensagem)
+        self.transbordadas += 1
+        if self.arquivo_transbordo is not None:
+            if self._gravadora is None:
+                self._gravadora = threading.Thread(target=self._gravar_transbordo, daemon=True)
+                self._gravadora.start()
+            self._gravar.set()
+
+    def _quantidade_transbordo(self) -> int:
+        return len(self._deslocamentos) + len(self._em_gravacao) + len(self._a_gravar)
+
+    def _profundidade(self) -> int:
+        return len(self._mensagens) + self._quantidade_transbordo()
+
+    def _gravar_transbordo(self) -> None:
+        # Thread gravadora: toda a E/S de arquivo acontece fora da trava
+        with open(self.arquivo_transbordo, "w+b") as arquivo:
+            while True:
+                self._gravar.wait()
+                self._gravar.clear()
+                with self._trava:
+                    truncar, self._truncar = self._truncar, False
+                    self._em_gravacao, self._a_gravar = self._a_gravar, []
+                    lote = self._em_gravacao
+                if truncar:
+                    arquivo.seek(0)
+                    arquivo.truncate()
+                if not lote:
+                    continue
+                deslocamentos = []
+                try:
+                    arquivo.seek(0, os.SEEK_END)
+                    for identificador, tipo, dados, momento in lote:
+                        deslocamentos.append(arquivo.tell())
+                        arquivo.write((json.dumps({"id": identificador, "tipo": tipo, "dados": dados,
+                                                   "momento": momento}) + "\n").encode("utf-8"))
+                    arquivo.flush()
+                except OSError:
+                    # Mantém o lote em memória, à frente do que chegou depois, e tenta de novo
+                    with suppress(OSError):
+                        arquivo.truncate(deslocamentos[0] if deslocamentos else arquivo.tell())
+                    with self._trava:
+                        self.falhas_gravacao += 1
+                        self._a_gravar[:0] = lote
+                        self._em_gravacao = []
+                    time.sleep(self.espera_falha)
+                    self._gravar.set()
+                    continue
+                with self._trava:
+                    self._deslocamentos.extend(deslocamentos)
+                    self._em_gravacao = []
+                    self.gravadas += len(lote)
+                    self._compactar()
+
+    def _ler_gravadas(self, inicio: int, quantidade: int) -> List[Mensagem]:
+        # Linhas contíguas a partir do deslocamento da primeira
+        mensagens = []
+        with open(self.arquivo_transbordo, "rb") as arquivo:
+            arquivo.seek(inicio)
+            for linha in islice(arquivo, quantidade):
+                registro = json.loads(linha)
+                mensagens.append((registro["id"], registro["tipo"], registro["dados"], registro["momento"]))
+        return mensagens
+
+    def ler_transbordo(self) -> Iterator[Dict]:
+        # Registros do transbordo já gravados em disco; uma última linha sem
+        # quebra (gravação interrompida) não é considerada
+        if self.arquivo_transbordo is None:
+            return
+        try:
+            with open(self.arquivo_transbordo, "rb") as arquivo:
+                for linha in arquivo:
+                    if not linha.endswith(b"\n"):
+                        return
+                    yield json.loads(linha)
+        except FileNotFoundError:
+            return
+
+    def registrar_consumidor(self, nome: str) -> None:
+        with self._trava:
+            if nome in self._cursores:
+                raise ValueError(f"Consumidor já registrado: {nome}")
+            # Novos consumidores recebem a partir das mensagens ainda retidas
+            if self._mensagens:
+                primeiro = self._mensagens[0][0]
+            elif self._inicio_transbordo is not None:
+                primeiro = self._inicio_transbordo
+            else:
+                primeiro = self._proximo_id
+            self._cursores[nome] = primeiro - 1
+
+    def remover_consumidor(self, nome: str) -> None:
+        with self._trava:
+            del self._cursores[nome]
+            self._compactar()
+
+    def lote(self, nome: str, tamanho: int) -> List[Mensagem]:
+        with self._trava:
+            proximo = self._cursores[nome] + 1
+            if self._mensagens and proximo <= self._mensagens[-1][0]:
+                inicio = max(proximo - self._mensagens[0][0], 0)
+                return list(islice(self._mensagens, inicio, inicio + tamanho))
+            if self._inicio_transbordo is None:
+                return []
+
+            indice = max(proximo - self._inicio_transbordo, 0)
+            gravadas = len(self._deslocamentos)
+            if indice >= gravadas:
+                # Ainda em memória: em gravação ou aguardando a gravadora
+                pendentes = self._em_gravacao + self._a_gravar
+                return pendentes[indice - gravadas:indice - gravadas + tamanho]
+            quantidade = min(tamanho, gravadas - indice)
+            deslocamento = self._deslocamentos[indice]
+        # Linhas já gravadas não mudam até todos confirmarem: leitura fora da trava
+        return self._ler_gravadas(deslocamento, quantidade)
+
+    def confirmar(self, nome: str, ultimo_id: int) -> None:
+        with self._trava:
+            if ultimo_id > self._cursores[nome]:
+                self._cursores[nome] = ultimo_id
+                self._compactar()
+
+    def _compactar(self) -> None:
+        # Remove mensagens já confirmadas por todos os consumidores; sem
+        # consumidores, todas são descartadas
+        minimo = min(self._cursores.values(), default=self._proximo_id - 1)
+        while self._mensagens and self._mensagens[0][0] <= minimo:
+            self._mensagens.popleft()
+        # O transbordo é descartado de uma vez, quando todo ele foi confirmado e
+        # não há lote em gravação; o arquivo é truncado pela gravadora
+        if (self._inicio_transbordo is not None and minimo >= self._proximo_id - 1
+                and not self._em_gravacao):
+            if self._deslocamentos:
+                self._truncar = True
+                self._gravar.set()
+            self._inicio_transbordo = None
+            self._deslocamentos = []
+            self._a_gravar = []
+
+    def aguardar(self, tempo: float) -> None:
+        self._novas.wait(tempo)
+        self._novas.clear()
+
+    def estatisticas(self) -> Dict:
+        with self._trava:
+            ultimo_id = self._proximo_id - 1
+            if self._mensagens:
+                mais_antiga = self._mensagens[0][3]
+            elif self._inicio_transbordo is not None:
+                mais_antiga = self._momento_transbordo
+            else:
+                mais_antiga = None
+            return {
+                "profundidade": self._profundidade(),
+                "profundidade_maxima": self.profundidade_maxima,
+                "capacidade": self.capacidade,
+                "ocupacao": len(self._mensagens) / self.capacidade,
+                "idade_mais_antiga": time.time() - mais_antiga if mais_antiga is not None else 0.0,
+                "registradas": self.registradas,
+                "transbordadas": self.transbordadas,
+                "rejeitadas": self.rejeitadas,
+                "em_transbordo": self._quantidade_transbordo(),
+                "gravadas_em_disco": self.gravadas,
+                "falhas_gravacao": self.falhas_gravacao,
+                "atraso_consumidores": {
+                    nome: ultimo_id - cursor for nome, cursor in self._cursores.items()
+                }
+            }
+
+# Consumidor em segundo plano: entrega lotes e só confirma após processamento
+# bem-sucedido, portanto uma falha causa reentrega (pelo menos uma vez)
+class ConsumidorOutbox:
+    def __init__(self, outbox: Outbox, nome: str, processar: Callable[[List[Mensagem]], None],
+                 tamanho_lote: int = 500, intervalo: float = 0.05, espera_falha: float = 1.0):
+        self.outbox = outbox
+        self.nome = nome
+        self.processar = processar
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.espera_falha = espera_falha
+        self._executando = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.entregues = 0
+        self.lotes = 0
+        self.falhas = 0
+        self.reentregas = 0
+        outbox.registrar_consumidor(nome)
+
+    def drenar(self) -> int:
+        # Processa um lote; retorna quantas mensagens foram confirmadas
+        mensagens = self.outbox.lote(self.nome, self.tamanho_lote)
+        if not mensagens:
+            return 0
+        try:
+            self.processar(mensagens)
+        except Exception:
+            self.falhas += 1
+            self.reentregas += len(mensagens)
+            raise
+
+        self.outbox.confirmar(self.nome, mensagens[-1][0])
+        self.entregues += len(mensagens)
+        self.lotes += 1
+        return len(mensagens)
+
+    def _executar(self) -> None:
+        while self._executando.is_set():
+            try:
+                if self.drenar() == 0:
+                    self.outbox.aguardar(self.intervalo)
+            except Exception:
+                time.sleep(self.espera_falha)
+
+    def iniciar(self) -> threading.Thread:
+        self._executando.set()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def parar(self, tempo: Optional[float] = None) -> None:
+        self._executando.clear()
+        if self._thread is not None:
+            self._thread.join(tempo)
+
+    def estatisticas(self) -> Dict:
+        return {
+            "entregues": self.entregues,
+            "lotes": self.lotes,
+            "falhas": self.falhas,
+            "reentregas": self.reentregas
+        }
@@ -0,0 +1,261 @@
+import cProfile
+import functools
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from sistema_bancario_otimizado import (
+    BancoException, Conta, ContaRepositoryMemory, OperacaoBancariaService, Transacao,
+    UsuarioRepositoryMemory
+)
+
+# Pontos instrumentados: (classe, métodos, categoria, inicia rastro). Somente
+# as operações do serviço iniciam rastros; os demais viram spans filhos quando
+# chamados dentro de um rastro amostrado
+ALVOS = (
+    (OperacaoBancariaService, ("tentar_depositar", "tentar_sacar", "tentar_transferir", "obter_extrato"),
+     "servico", True),
+    (OperacaoBancariaService, ("_confirmar",), "servico", False),
+    (Conta, ("verificar_deposito", "verificar_saque", "verificar_transferencia", "aplicar", "obter_extrato"),
+     "conta", False),
+    (ContaRepositoryMemory, ("buscar_por_agencia_numero", "listar_por_usuario", "confirmar"), "repositorio", False),
+    (UsuarioRepositoryMemory, ("buscar_por_cpf",), "repositorio", False),
+    # A construção da transação inclui a obtenção do horário (datetime.now com fuso)
+    (Transacao, ("__init__",), "transacao", False),
+)
+
+# Span concluído: (rastro, span, span pai, nome, categoria, início ns, fim ns, thread, erro)
+Span = Tuple[int, int, int, str, str, int, int, int, str]
+
+_instrumentado: Optional["Rastreador"] = None
+
+# Rastreamento por spans com amostragem. Ativado em tempo de execução: os
+# métodos dos alvos são envolvidos em ativar() e restaurados em desativar(),
+# de modo que, desativado, não há custo algum no caminho das operações
+class Rastreador:
+    def __init__(self, taxa_amostragem: float = 0.01, limiar_lento: Optional[float] = None,
+                 capacidade: int = 100000, sorteio: Callable[[], float] = random.random):
+        self.taxa_amostragem = taxa_amostragem
+        # Com limiar (segundos), todo rastro é gravado e mantido se for
+        # sorteado ou mais lento que o limiar (amostragem pela cauda)
+        self.limiar_lento = limiar_lento
+        self.sorteio = sorteio
+        self.spans: Deque[Span] = deque(maxlen=capacidade)
+        self._local = threading.local()
+        self._trava = threading.Lock()
+        self._ids = itertools.count(1)
+        self._originais: List[Tuple[type, str, Callable]] = []
+        # Converte perf_counter_ns (monotônico) em época Unix
+        self._base_ns = time.time_ns() - time.perf_counter_ns()
+
+        self.rastros = 0
+        self.rastros_descartados = 0
+
+        self._perfil: Optional[cProfile.Profile] = None
+        self._amostrador: Optional[threading.Thread] = None
+        self._parar_amostrador = threading.Event()
+        self.pilhas: Counter = Counter()
+
+    # Instrumentação
+    def ativar(self) -> "Rastreador":
+        global _instrumentado
+        if _instrumentado is self:
+            return self
+        if _instrumentado is not None:
+            raise BancoException("Já existe um rastreador ativo")
+        for classe, metodos, categoria, raiz in ALVOS:
+            for metodo in metodos:
+                original = vars(classe)[metodo]
+                self._originais.append((classe, metodo, original))
+                setattr(classe, metodo, self._envolver(original, f"{classe.__name__}.{metodo}", categoria, raiz))
+        _instrumentado = self
+        return self
+
+    def desativar(self) -> None:
+        global _instrumentado
+        if _instrumentado is not self:
+            return
+        for classe, metodo, original in reversed(self._originais):
+            setattr(classe, metodo, original)
+        self._originais.clear()
+        _instrumentado = None
+
+    def _envolver(self, funcao: Callable, nome: str, categoria: str, raiz: bool) -> Callable:
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if getattr(self._local, "pilha", None):
+                with self.span(nome, categoria):
+                    return funcao(*args, **kwargs)
+            if not raiz:
+                return funcao(*args, **kwargs)
+            sorteado = self.sorteio() < self.taxa_amostragem
+            if not sorteado and self.limiar_lento is None:
+                return funcao(*args, **kwargs)
+            with self._rastro(sorteado), self.span(nome, categoria):
+                return funcao(*args, **kwargs)
+        return envolvida
+
+    @contextmanager
+    def _rastro(self, sorteado: bool) -> Iterator[None]:
+        local = self._local
+        local.rastro = random.getrandbits(64) or 1
+        local.pilha = [0]
+        local.gravados = []
+        try:
+            yield
+        finally:
+            gravados = local.gravados
+            local.pilha = None
+            local.gravados = None
+            # O span raiz é o último a terminar
+            duracao = (gravados[-1][6] - gravados[-1][5]) / 1e9 if gravados else 0.0
+            manter = sorteado or (self.limiar_lento is not None and duracao >= self.limiar_lento)
+            with self._trava:
+                self.rastros += 1
+                if manter:
+                    self.spans.extend(gravados)
+                else:
+                    self.rastros_descartados += 1
+
+    @contextmanager
+    def span(self, nome: str, categoria: str = "aplicacao") -> Iterator[None]:
+        # Também serve para spans manuais (ex.: em torno de um comando da
+        # interface); fora de um rastro amostrado não grava nada
+        local = self._local
+        pilha = getattr(local, "pilha", None)
+        if not pilha:
+            yield
+            return
+        span = next(self._ids)
+        pai = pilha[-1]
+        pilha.append(span)
+        erro = ""
+        inicio = time.perf_counter_ns()
+        try:
+            yield
+        except BaseException as e:
+            erro = type(e).__name__
+            raise
+        finally:
+            fim = time.perf_counter_ns()
+            pilha.pop()
+            local.gravados.append((local.rastro, span, pai, nome, categoria, inicio, fim,
+                                   threading.get_ident(), erro))
+
+    def coletar(self) -> List[Span]:
+        with self._trava:
+            spans = list(self.spans)
+            self.spans.clear()
+        return spans
+
+    # Exportação
+    def exportar_chrome(self, caminho: str, spans: Optional[List[Span]] = None) -> int:
+        # Formato Trace Event (chrome://tracing, Perfetto): eventos completos "X" em µs
+        spans = self.coletar() if spans is None else spans
+        pid = os.getpid()
+        eventos = [{
+            "name": nome,
+            "cat": categoria,
+            "ph": "X",
+            "ts": (self._base_ns + inicio) / 1000,
+            "dur": (fim - inicio) / 1000,
+            "pid": pid,
+            "tid": thread,
+            "args": {"rastro": f"{rastro:016x}", "span": span, "pai": pai, **({"erro": erro} if erro else {})}
+        } for rastro, span, pai, nome, categoria, inicio, fim, thread, erro in spans]
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, arquivo)
+        return len(eventos)
+
+    def exportar_otel(self, caminho: str, spans: Optional[List[Span]] = None,
+                      servico: str = "sistema_bancario") -> int:
+        # OTLP/JSON (ResourceSpans), aceito pelo OpenTelemetry Collector
+        spans = self.coletar() if spans is None else spans
+        registros = []
+        for rastro, span, pai, nome, categoria, inicio, fim, thread, erro in spans:
+            registro = {
+                "traceId": f"{rastro:032x}",
+                "spanId": f"{span:016x}",
+                "name": nome,
+                "kind": 1,
+                "startTimeUnixNano": str(self._base_ns + inicio),
+                "endTimeUnixNano": str(self._base_ns + fim),
+                "attributes": [
+                    {"key": "categoria", "value": {"stringValue": categoria}},
+                    {"key": "thread.id", "value": {"intValue": str(thread)}}
+                ],
+                "status": {"code": 2, "message": erro} if erro else {}
+            }
+            if pai:
+                registro["parentSpanId"] = f"{pai:016x}"
+            registros.append(registro)
+        documento = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": servico}}]},
+            "scopeSpans": [{"scope": {"name": "rastreamento"}, "spans": registros}]
+        }]}
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(documento, arquivo)
+        return len(registros)
+
+    # Perfilamento opcional, ligado e desligado em tempo de execução
+    def iniciar_perfil(self, modo: str = "amostragem", intervalo: float = 0.005) -> None:
+        if self._perfil is not None or self._amostrador is not None:
+            raise BancoException("Perfilamento já em andamento")
+        if modo == "cprofile":
+            # cProfile mede apenas a thread que o iniciou
+            self._perfil = cProfile.Profile()
+            self._perfil.enable()
+        elif modo == "amostragem":
+            self._parar_amostrador.clear()
+            self._amostrador = threading.Thread(target=self._amostrar, args=(intervalo,), daemon=True)
+            self._amostrador.start()
+        else:
+            raise BancoException(f"Modo de perfilamento inválido: {modo}")
+
+    def _amostrar(self, intervalo: float) -> None:
+        # Amostrador estatístico: registra as pilhas de todas as threads a cada intervalo
+        proprio = threading.get_ident()
+        while not self._parar_amostrador.wait(intervalo):
+            for thread, quadro in sys._current_frames().items():
+                if thread == proprio:
+                    continue
+                pilha = []
+                while quadro is not None:
+                    codigo = quadro.f_code
+                    pilha.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                    quadro = quadro.f_back
+                self.pilhas[";".join(reversed(pilha))] += 1
+
+    def parar_perfil(self, caminho: Optional[str] = None) -> None:
+        # cProfile grava estatísticas do pstats; a amostragem grava pilhas no
+        # formato "collapsed" (uma pilha e sua contagem por linha, para flamegraph)
+        if self._perfil is not None:
+            self._perfil.disable()
+            if caminho:
+                self._perfil.dump_stats(caminho)
+            self._perfil = None
+        elif self._amostrador is not None:
+            self._parar_amostrador.set()
+            self._amostrador.join()
+            self._amostrador = None
+            if caminho:
+                with open(caminho, "w", encoding="utf-8") as arquivo:
+                    for pilha, contagem in self.pilhas.most_common():
+                        arquivo.write(f"{pilha} {contagem}\n")
+
+    def estatisticas(self) -> Dict:
+        with self._trava:
+            return {
+                "ativo": _instrumentado is self,
+                "rastros": self.rastros,
+                "rastros_descartados": self.rastros_descartados,
+                "spans": len(self.spans),
+                "pilhas_amostradas": sum(self.pilhas.values())
+            }
@@ -0,0 +1,312 @@
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener, answer_challenge, deliver_challenge
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sistema_bancario_otimizado import (
+    FUSO_HORARIO, MOEDA_PADRAO, BancoException, Conta, ContaNaoEncontradaException, ContaRepositoryMemory,
+    MotorBancario, PublicadorEventos, Transacao, Usuario, UsuarioRepositoryMemory
+)
+from snapshots import Snapshot, repositorios_memoria, restaurar_registro
+
+# Evento replicado: (sequência, tipo, dados). A carga inicial de uma réplica
+# chega como eventos "imagem" (um registro de Snapshot.registros cada) seguidos
+# de "imagem_concluida", todos com a sequência do ponto da imagem
+Evento = Tuple[int, str, Dict]
+
+class ReplicaDefasadaException(BancoException):
+    pass
+
+# Feed de alterações: assina o publicador de eventos dos serviços e repassa
+# cada escrita confirmada às réplicas conectadas, sem bloquear quem escreve.
+# Com o motor informado, réplicas novas ou defasadas além do backlog recebem
+# antes uma imagem consistente dos repositórios
+class FeedAlteracoes:
+    def __init__(self, eventos: PublicadorEventos, capacidade_backlog: int = 100000,
+                 capacidade_fila_replica: int = 100000, tempo_apresentacao: float = 5.0,
+                 motor: Optional[MotorBancario] = None):
+        self.sequencia = 0
+        # Eventos recentes, usados para atualizar réplicas que se reconectam
+        self.backlog: Deque[Evento] = deque(maxlen=capacidade_backlog)
+        self.capacidade_fila_replica = capacidade_fila_replica
+        self._filas: List["queue.Queue[Optional[Evento]]"] = []
+        self._trava = threading.Lock()
+        self._ouvinte: Optional[Listener] = None
+        self._chave: bytes = b""
+        # Prazo para a réplica informar a última sequência após a autenticação
+        self.tempo_apresentacao = tempo_apresentacao
+        self.repositorios = repositorios_memoria(motor) if motor is not None else None
+
+        self.replicas_desconectadas = 0
+        self.conexoes_recusadas = 0
+        self.cargas_iniciais = 0
+        eventos.assinar(self)
+
+    def __call__(self, tipo: str, dados: Dict) -> None:
+        with self._trava:
+            self.sequencia += 1
+            evento = (self.sequencia, tipo, dados)
+            self.backlog.append(evento)
+            for fila in list(self._filas):
+                try:
+                    fila.put_nowait(evento)
+                except queue.Full:
+                    # Réplica lenta demais: é desconectada e deve se ressincronizar
+                    self._descartar_fila(fila)
+
+    def _descartar_fila(self, fila: "queue.Queue[Optional[Evento]]") -> None:
+        # Chamado sob a trava, a única por onde a fila recebe eventos: depois de
+        # esvaziada, o aviso de encerramento sempre cabe e o enviador termina
+        self._filas.remove(fila)
+        self.replicas_desconectadas += 1
+        while True:
+            try:
+                fila.get_nowait()
+            except queue.Empty:
+                break
+        fila.put_nowait(None)
+
+    def conectar(self, conexao: Connection, ultima_sequencia: int = 0) -> threading.Thread:
+        fila: "queue.Queue[Optional[Evento]]" = queue.Queue(self.capacidade_fila_replica)
+        with self._trava:
+            primeira_disponivel = self.backlog[0][0] if self.backlog else self.sequencia + 1
+            # Réplica nova, à frente do feed (primário reiniciado) ou além do backlog
+            if ((ultima_sequencia == 0 and self.repositorios is not None) or ultima_sequencia > self.sequencia
+                    or ultima_sequencia + 1 < primeira_disponivel):
+                if self.repositorios is None:
+                    conexao.close()
+                    raise ReplicaDefasadaException("Réplica defasada além do backlog do feed")
+                sequencia_imagem: Optional[int] = self.sequencia
+                pendentes: List[Evento] = []
+                self.cargas_iniciais += 1
+            else:
+                sequencia_imagem = None
+                pendentes = [evento for evento in self.backlog if evento[0] > ultima_sequencia]
+            self._filas.append(fila)
+
+        enviador = threading.Thread(target=self._enviar, args=(conexao, fila, pendentes, sequencia_imagem),
+                                    daemon=True)
+        enviador.start()
+        return enviador
+
+    def _enviar_imagem(self, conexao: Connection, sequencia: int) -> None:
+        # O ponto da imagem é posterior à leitura da sequência: tudo até ela está
+        # na imagem, e os eventos seguintes que também estiverem são descartados
+        # pela réplica pela versão das contas
+        snapshot = Snapshot(*self.repositorios).iniciar()
+        try:
+            for registro in snapshot.registros():
+                conexao.send((sequencia, "imagem", registro))
+        finally:
+            snapshot.encerrar()
+        conexao.send((sequencia, "imagem_concluida", {}))
+
+    def _enviar(self, conexao: Connection, fila: "queue.Queue[Optional[Evento]]",
+                pendentes: List[Evento], sequencia_imagem: Optional[int]) -> None:
+        try:
+            if sequencia_imagem is not None:
+                self._enviar_imagem(conexao, sequencia_imagem)
+            for evento in pendentes:
+                conexao.send(evento)
+            while True:
+                evento = fila.get()
+                if evento is None:
+                    break
+                conexao.send(evento)
+        except (OSError, EOFError):
+            with self._trava:
+                if fila in self._filas:
+                    self._filas.remove(fila)
+                    self.replicas_desconectadas += 1
+        finally:
+            conexao.close()
+
+    def escutar(self, endereco, chave: bytes) -> threading.Thread:
+        # Endereço pode ser um caminho de socket local ou uma tupla (host, porta).
+        # As mensagens são objetos serializados com pickle: somente pares que
+        # conhecem a chave compartilhada são aceitos
+        if not chave:
+            raise BancoException("Chave de autenticação obrigatória para o feed")
+        self._chave = chave
+        # A autenticação não é feita no accept, para que um cliente parado não
+        # bloqueie os demais: cada conexão se apresenta na própria thread
+        self._ouvinte = Listener(endereco)
+        aceitador = threading.Thread(target=self._aceitar, daemon=True)
+        aceitador.start()
+        return aceitador
+
+    def _aceitar(self) -> None:
+        while self._ouvinte is not None:
+            try:
+                conexao = self._ouvinte.accept()
+            except (OSError, EOFError):
+                break
+            threading.Thread(target=self._apresentar, args=(conexao,), daemon=True).start()
+
+    def _apresentar(self, conexao: Connection) -> None:
+        try:
+            deliver_challenge(conexao, self._chave)
+            answer_challenge(conexao, self._chave)
+            if not conexao.poll(self.tempo_apresentacao):
+                raise AuthenticationError("Réplica não informou a última sequência")
+            ultima_sequencia = conexao.recv()
+            if not isinstance(ultima_sequencia, int) or ultima_sequencia < 0:
+                raise AuthenticationError("Sequência inválida")
+            self.conectar(conexao, ultima_sequencia)
+        except ReplicaDefasadaException:
+            pass
+        except (AuthenticationError, OSError, EOFError):
+            with self._trava:
+                self.conexoes_recusadas += 1
+            conexao.close()
+
+    def encerrar(self) -> None:
+        if self._ouvinte is not None:
+            ouvinte, self._ouvinte = self._ouvinte, None
+            ouvinte.close()
+        with self._trava:
+            for fila in list(self._filas):
+                self._descartar_fila(fila)
+
+    def estatisticas(self) -> Dict:
+        with self._trava:
+            return {
+                "sequencia": self.sequencia,
+                "backlog": len(self.backlog),
+                "replicas": len(self._filas),
+                "replicas_desconectadas": self.replicas_desconectadas,
+                "conexoes_recusadas": self.conexoes_recusadas,
+                "cargas_iniciais": self.cargas_iniciais,
+                "maior_fila": max((fila.qsize() for fila in self._filas), default=0)
+            }
+
+# Réplica de leitura: mantém cópias indexadas próprias para extratos e listagens
+class ReplicaLeitura:
+    def __init__(self):
+        self.usuario_repo = UsuarioRepositoryMemory()
+        self.conta_repo = ContaRepositoryMemory()
+        self.ultima_sequencia = 0
+        self._trava = threading.RLock()
+        self._consumidor: Optional[threading.Thread] = None
+        # Carga inicial em andamento, montada à parte e trocada de uma vez
+        self._imagem: Optional[Tuple[UsuarioRepositoryMemory, ContaRepositoryMemory]] = None
+        # Lançamentos publicados fora da ordem das versões: conta -> {versão: lançamento}
+        self._adiantados: Dict[Conta, Dict[int, Dict]] = {}
+        # Motivo da desconexão; enquanto definido, as consultas são recusadas
+        self.erro: Optional[BaseException] = None
+
+    def aplicar(self, evento: Evento) -> None:
+        sequencia, tipo, dados = evento
+        if tipo == "imagem":
+            if "snapshot" in dados:
+                self._imagem = (UsuarioRepositoryMemory(), ContaRepositoryMemory())
+            elif self._imagem is None:
+                raise BancoException("Registro de imagem sem cabeçalho")
+            else:
+                restaurar_registro(dados, *self._imagem)
+            return
+
+        with self._trava:
+            if tipo == "imagem_concluida":
+                if self._imagem is None:
+                    raise BancoException("Imagem concluída sem cabeçalho")
+                self.usuario_repo, self.conta_repo = self._imagem
+                self._imagem = None
+                self._adiantados.clear()
+                self.ultima_sequencia = sequencia
+                return
+
+            if sequencia <= self.ultima_sequencia:
+                return
+
+            # Eventos posteriores ao ponto de uma imagem podem já estar nela
+            if tipo == "usuario_cadastrado":
+                if self.usuario_repo.buscar_por_cpf(dados["cpf"]) is None:
+                    self.usuario_repo.adicionar(Usuario.from_dict(dados))
+            elif tipo == "conta_criada":
+                if self.conta_repo.buscar_por_agencia_numero(dados["agencia"], dados["numero"]) is None:
+                    usuario = self.usuario_repo.buscar_por_cpf(dados["cpf"])
+                    self.conta_repo.adicionar(Conta(dados["agencia"], dados["numero"], usuario))
+            elif "lancamentos" in dados:
+                for item in dados["lancamentos"]:
+                    self._aplicar_lancamento(item)
+
+            self.ultima_sequencia = sequencia
+
+    def _aplicar_lancamento(self, item: Dict) -> None:
+        conta = self.conta_repo.buscar_por_agencia_numero(item["agencia"], item["numero"])
+        if not conta:
+            raise ContaNaoEncontradaException("Conta não encontrada na réplica")
+        if item["versao"] <= conta.versao:
+            return
+
+        adiantados = self._adiantados.setdefault(conta, {})
+        adiantados[item["versao"]] = item
+        while conta.versao + 1 in adiantados:
+            proximo = adiantados.pop(conta.versao + 1)
+            data = datetime.fromtimestamp(proximo["data"], tz=FUSO_HORARIO)
+            conta.aplicar(Transacao(proximo["tipo"], proximo["valor"], proximo["descricao"], data,
+                                    proximo.get("moeda", MOEDA_PADRAO)))
+        if not adiantados:
+            del self._adiantados[conta]
+
+    def consumir(self, conexao: Connection) -> None:
+        try:
+            while True:
+                self.aplicar(conexao.recv())
+        except (OSError, EOFError):
+            self.erro = ReplicaDefasadaException("Conexão com o feed encerrada")
+        except Exception as e:
+            # Um evento que não pode ser aplicado deixaria a réplica divergente
+            # em silêncio: a conexão é encerrada e o feed deixa de contá-la
+            self.erro = e
+        finally:
+            conexao.close()
+
+    def _verificar(self) -> None:
+        if self.erro is not None:
+            raise ReplicaDefasadaException(f"Réplica desconectada do feed: {self.erro}") from self.erro
+
+    def conectar(self, endereco, chave: bytes) -> threading.Thread:
+        # A autenticação é mútua: a réplica também só aceita um feed com a mesma chave
+        conexao = Client(endereco, authkey=chave)
+        self.erro = None
+        self._imagem = None
+        conexao.send(self.ultima_sequencia)
+        self._consumidor = threading.Thread(target=self.consumir, args=(conexao,), daemon=True)
+        self._consumidor.start()
+        return self._consumidor
+
+    # Consultas servidas pela réplica
+    def listar_usuarios(self) -> List[Usuario]:
+        with self._trava:
+            self._verificar()
+            return self.usuario_repo.listar_todos()
+
+    def listar_contas(self, agencia: Optional[str] = None) -> List[Conta]:
+        with self._trava:
+            self._verificar()
+            if agencia is None:
+                return self.conta_repo.listar_todas()
+            return self.conta_repo.listar_por_agencia(agencia)
+
+    def listar_contas_por_usuario(self, cpf: str) -> List[Conta]:
+        with self._trava:
+            self._verificar()
+            return self.conta_repo.listar_por_usuario(cpf)
+
+    def obter_extrato(self, agencia: str, numero: int) -> List[Dict]:
+        with self._trava:
+            self._verificar()
+            conta = self.conta_repo.buscar_por_agencia_numero(agencia, numero)
+            if not conta:
+                raise ContaNaoEncontradaException("Conta não encontrada")
+            return conta.obter_extrato()
+
+    def estatisticas_agencia(self, agencia: str) -> Dict:
+        with self._trava:
+            self._verificar()
+            return self.conta_repo.estatisticas_agencia(agencia)
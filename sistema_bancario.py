@@ -1,18 +1,20 @@
 import textwrap
-from datetime import datetime
-import pytz
+
+from sistema_bancario_otimizado import BancoException, MotorBancario
 
 class SistemaBancario:
-    def __init__(self):
-        self.saldo = 0
-        self.limite = 500
-        self.extrato = ""
-        self.numero_saques = 0
-        self.LIMITE_SAQUES = 3
-        self.usuarios = []
-        self.contas = []
+    def __init__(self, motor=None):
+        # Usuários, contas e operações ficam no motor bancário compartilhado
+        self.motor = motor if motor is not None else MotorBancario()
         self.agencia = "0001"
-        self.transacoes = []
+
+    @property
+    def limite(self):
+        return self.motor.operacao_service.limite_saque
+
+    @property
+    def LIMITE_SAQUES(self):
+        return self.motor.operacao_service.limite_saques_diarios
 
     def menu(self):
         menu = """\n
@@ -28,56 +30,48 @@ class SistemaBancario:
         => """
         return input(textwrap.dedent(menu))
 
-    def depositar(self, valor):
-        if valor > 0:
-            self.saldo += valor
-            transacao = {
-                "tipo": "Depósito",
-                "valor": valor,
-                "data": datetime.now(pytz.timezone('America/Sao_Paulo')).strftime("%d/%m/%Y %H:%M:%S")
-            }
-            self.transacoes.append(transacao)
-            self.extrato += f"Depósito:\tR$ {valor:.2f}\n"
-            print("\n=== Depósito realizado com sucesso! ===")
-            print(f"Novo saldo: R$ {self.saldo:.2f}")
-        else:
-            print("\n@@@ Operação falhou! O valor informado é inválido. @@@")
-
-    def sacar(self, valor):
-        excedeu_saldo = valor > self.saldo
-        excedeu_limite = valor > self.limite
-        excedeu_saques = self.numero_saques >= self.LIMITE_SAQUES
-
-        if excedeu_saldo:
-            print("\n@@@ Operação falhou! Você não tem saldo suficiente. @@@")
-        elif excedeu_limite:
-            print("\n@@@ Operação falhou! O valor do saque excede o limite. @@@")
-        elif excedeu_saques:
-            print("\n@@@ Operação falhou! Número máximo de saques excedido. @@@")
-        elif valor > 0:
-            self.saldo -= valor
-            transacao = {
-                "tipo": "Saque",
-                "valor": -valor,
-                "data": datetime.now(pytz.timezone('America/Sao_Paulo')).strftime("%d/%m/%Y %H:%M:%S")
-            }
-            self.transacoes.append(transacao)
-            self.extrato += f"Saque:\t\tR$ {valor:.2f}\n"
-            self.numero_saques += 1
-            print("\n=== Saque realizado com sucesso! ===")
-            print(f"Novo saldo: R$ {self.saldo:.2f}")
-        else:
-            print("\n@@@ Operação falhou! O valor informado é inválido. @@@")
+    def selecionar_conta(self):
+        try:
+            numero = int(input("Informe o número da conta: "))
+        except ValueError:
+            print("\n@@@ Número de conta inválido! @@@")
+            return None
+
+        conta = self.motor.conta_service.buscar_conta(self.agencia, numero)
+        if not conta:
+            print("\n@@@ Conta não encontrada! @@@")
+        return conta
+
+    def depositar(self, conta, valor):
+        try:
+            self.motor.operacao_service.depositar(conta.agencia, conta.numero, valor)
+        except BancoException as e:
+            print(f"\n@@@ Operação falhou! {e}. @@@")
+            return
+        print("\n=== Depósito realizado com sucesso! ===")
+        print(f"Novo saldo: R$ {conta.saldo:.2f}")
+
+    def sacar(self, conta, valor):
+        try:
+            self.motor.operacao_service.sacar(conta.agencia, conta.numero, valor)
+        except BancoException as e:
+            print(f"\n@@@ Operação falhou! {e}. @@@")
+            return
+        print("\n=== Saque realizado com sucesso! ===")
+        print(f"Novo saldo: R$ {conta.saldo:.2f}")
 
-    def exibir_extrato(self):
-        print("\n================ EXTRATO ================")
-        if not self.transacoes:
-            print("Não foram realizadas movimentações.")
+    def exibir_extrato(self, conta):
+        transacoes = self.motor.operacao_service.obter_extrato(conta.agencia, conta.numero)
+
+        linhas = ["\n================ EXTRATO ================"]
+        if not transacoes:
+            linhas.append("Não foram realizadas movimentações.")
         else:
-            for transacao in self.transacoes:
-                print(f"{transacao['tipo']} de R$ {abs(transacao['valor']):.2f} em {transacao['data']}")
-        print(f"\nSaldo atual:\tR$ {self.saldo:.2f}")
-        print("==========================================")
+            for transacao in transacoes:
+                linhas.append(f"{transacao['tipo']} de R$ {abs(transacao['valor']):.2f} em {transacao['data']}")
+        linhas.append(f"\nSaldo atual:\tR$ {conta.saldo:.2f}")
+        linhas.append("==========================================")
+        print("\n".join(linhas))
 
     def criar_usuario(self):
         cpf = input("Informe o CPF (somente número): ")
@@ -91,97 +85,87 @@ class SistemaBancario:
         data_nascimento = input("Informe a data de nascimento (dd-mm-aaaa): ")
         endereco = input("Informe o endereço (logradouro, nro - bairro - cidade/sigla estado): ")
 
-        self.usuarios.append({
-            "nome": nome, 
-            "data_nascimento": data_nascimento, 
-            "cpf": cpf, 
-            "endereco": endereco
-        })
+        try:
+            self.motor.usuario_service.cadastrar_usuario(nome, data_nascimento, cpf, endereco)
+        except BancoException as e:
+            print(f"\n@@@ {e} @@@")
+            return
 
         print("=== Usuário criado com sucesso! ===")
 
     def filtrar_usuario(self, cpf):
-        for usuario in self.usuarios:
-            if usuario["cpf"] == cpf:
-                return usuario
-        return None
+        return self.motor.usuario_service.buscar_usuario(cpf)
 
     def criar_conta(self):
         cpf = input("Informe o CPF do usuário: ")
         usuario = self.filtrar_usuario(cpf)
 
         if usuario:
-            numero_conta = len(self.contas) + 1
-            self.contas.append({
-                "agencia": self.agencia,
-                "numero_conta": numero_conta,
-                "usuario": usuario
-            })
+            conta = self.motor.conta_service.criar_conta(self.agencia, cpf)
             print("\n=== Conta criada com sucesso! ===")
-            print(f"Agência: {self.agencia} | Conta: {numero_conta}")
+            print(f"Agência: {conta.agencia} | Conta: {conta.numero}")
             return
 
         print("\n@@@ Usuário não encontrado, fluxo de criação de conta encerrado! @@@")
 
     def listar_contas(self):
-        if not self.contas:
+        contas = self.motor.conta_service.listar_contas()
+        if not contas:
             print("\n@@@ Nenhuma conta cadastrada! @@@")
             return
-            
-        for conta in self.contas:
+
+        for conta in contas:
             linha = f"""\
-                Agência:\t{conta['agencia']}
-                C/C:\t\t{conta['numero_conta']}
-                Titular:\t{conta['usuario']['nome']}
+                Agência:\t{conta.agencia}
+                C/C:\t\t{conta.numero}
+                Titular:\t{conta.usuario.nome}
             """
             print(textwrap.dedent(linha))
             print("=" * 50)
 
-    def transferencia(self):
+    def transferencia(self, conta):
         print("\n=== TRANSFERÊNCIA ===")
-        valor = float(input("Informe o valor para transferência: "))
-        
-        if valor <= 0:
+        try:
+            valor = float(input("Informe o valor para transferência: "))
+            destino_agencia = input("Informe a agência de destino: ")
+            destino_conta = int(input("Informe a conta de destino: "))
+        except ValueError:
             print("\n@@@ Valor inválido para transferência! @@@")
             return
-            
-        if valor > self.saldo:
-            print("\n@@@ Saldo insuficiente para transferência! @@@")
+
+        try:
+            self.motor.operacao_service.transferir(
+                conta.agencia, conta.numero, destino_agencia, destino_conta, valor
+            )
+        except BancoException as e:
+            print(f"\n@@@ Operação falhou! {e}. @@@")
             return
-            
-        destino_agencia = input("Informe a agência de destino: ")
-        destino_conta = input("Informe a conta de destino: ")
-        
-        # Simulação de transferência
-        self.saldo -= valor
-        transacao = {
-            "tipo": "Transferência",
-            "valor": -valor,
-            "data": datetime.now(pytz.timezone('America/Sao_Paulo')).strftime("%d/%m/%Y %H:%M:%S"),
-            "destino": f"Ag: {destino_agencia} C/C: {destino_conta}"
-        }
-        self.transacoes.append(transacao)
-        self.extrato += f"Transferência:\tR$ {valor:.2f} para Ag: {destino_agencia} C/C: {destino_conta}\n"
-        
+
         print("\n=== Transferência realizada com sucesso! ===")
         print(f"Valor transferido: R$ {valor:.2f}")
         print(f"Para: Agência {destino_agencia}, Conta {destino_conta}")
-        print(f"Novo saldo: R$ {self.saldo:.2f}")
+        print(f"Novo saldo: R$ {conta.saldo:.2f}")
 
     def executar(self):
         while True:
             opcao = self.menu()
 
             if opcao == "d":
-                valor = float(input("Informe o valor do depósito: "))
-                self.depositar(valor)
+                conta = self.selecionar_conta()
+                if conta:
+                    valor = float(input("Informe o valor do depósito: "))
+                    self.depositar(conta, valor)
 
             elif opcao == "s":
-                valor = float(input("Informe o valor do saque: "))
-                self.sacar(valor)
+                conta = self.selecionar_conta()
+                if conta:
+                    valor = float(input("Informe o valor do saque: "))
+                    self.sacar(conta, valor)
 
             elif opcao == "e":
-                self.exibir_extrato()
+                conta = self.selecionar_conta()
+                if conta:
+                    self.exibir_extrato(conta)
 
             elif opcao == "nu":
                 self.criar_usuario()
@@ -191,9 +175,11 @@ class SistemaBancario:
 
             elif opcao == "lc":
                 self.listar_contas()
-                
+
             elif opcao == "t":
-                self.transferencia()
+                conta = self.selecionar_conta()
+                if conta:
+                    self.transferencia(conta)
 
             elif opcao == "q":
                 print("\n=== Obrigado por usar nosso sistema bancário! ===")
@@ -1,9 +1,32 @@
+import math
 import textwrap
 from datetime import datetime
 import pytz
 import re
+import threading
+import unicodedata
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from enum import Enum
+from itertools import islice
+from typing import Callable, Iterable, List, Dict, Optional, Tuple, Union
+
+FUSO_HORARIO = pytz.timezone('America/Sao_Paulo')
+
+# Moeda de Conta.saldo; saldos em outras moedas ficam em Conta.saldos_moeda,
+# em unidades menores (centavos, ou a própria unidade em moedas sem decimais)
+MOEDA_PADRAO = "BRL"
+CASAS_DECIMAIS: Dict[str, int] = {"JPY": 0, "CLP": 0, "KRW": 0}
+
+def casas_decimais(moeda: str) -> int:
+    return CASAS_DECIMAIS.get(moeda, 2)
+
+def unidades_menores(valor: float, moeda: str) -> int:
+    return int(round(valor * 10 ** casas_decimais(moeda)))
+
+def valor_valido(valor) -> bool:
+    # Valores de entrada externa (lotes, interface) podem não ser numéricos
+    return (isinstance(valor, (int, float)) and not isinstance(valor, bool)
+            and math.isfinite(valor) and valor > 0)
 
 # Exceções personalizadas
 class BancoException(Exception):
@@ -21,6 +44,59 @@ class ValorInvalidoException(BancoException):
 class ContaNaoEncontradaException(BancoException):
     pass
 
+class ConflitoVersaoException(BancoException):
+    pass
+
+class LimiteTaxaException(BancoException):
+    pass
+
+class SobrecargaException(BancoException):
+    pass
+
+class MoedaNaoSuportadaException(BancoException):
+    pass
+
+# Códigos de resultado: alternativa às exceções para rejeições frequentes
+class StatusOperacao(Enum):
+    OK = 0
+    VALOR_INVALIDO = 1
+    SALDO_INSUFICIENTE = 2
+    LIMITE_VALOR_SAQUE = 3
+    LIMITE_QUANTIDADE_SAQUES = 4
+    CONTA_NAO_ENCONTRADA = 5
+    CONTA_DESTINO_NAO_ENCONTRADA = 6
+    CONFLITO = 7
+    LIMITE_TAXA = 8
+    SOBRECARGA = 9
+    MOEDA_NAO_SUPORTADA = 10
+
+def erro_operacao(status: StatusOperacao, operacao: str = "saque",
+                  limite: float = 0.0, limite_saques: int = 0) -> BancoException:
+    # Converte um código de rejeição na exceção equivalente da API tradicional
+    if status is StatusOperacao.VALOR_INVALIDO:
+        return ValorInvalidoException(f"Valor de {operacao} deve ser positivo")
+    if status is StatusOperacao.SALDO_INSUFICIENTE:
+        return SaldoInsuficienteException("Saldo insuficiente")
+    if status is StatusOperacao.LIMITE_VALOR_SAQUE:
+        return LimiteSaqueException(f"Valor excede o limite de R$ {limite:.2f} por saque")
+    if status is StatusOperacao.LIMITE_QUANTIDADE_SAQUES:
+        return LimiteSaqueException(f"Número máximo de {limite_saques} saques excedido")
+    if status is StatusOperacao.CONTA_NAO_ENCONTRADA:
+        if operacao == "transferência":
+            return ContaNaoEncontradaException("Conta de origem não encontrada")
+        return ContaNaoEncontradaException("Conta não encontrada")
+    if status is StatusOperacao.CONTA_DESTINO_NAO_ENCONTRADA:
+        return ContaNaoEncontradaException("Conta de destino não encontrada")
+    if status is StatusOperacao.CONFLITO:
+        return ConflitoVersaoException("Operação não confirmada por concorrência; tente novamente")
+    if status is StatusOperacao.LIMITE_TAXA:
+        return LimiteTaxaException("Limite de requisições excedido; tente novamente em instantes")
+    if status is StatusOperacao.SOBRECARGA:
+        return SobrecargaException("Sistema sobrecarregado; tente novamente em instantes")
+    if status is StatusOperacao.MOEDA_NAO_SUPORTADA:
+        return MoedaNaoSuportadaException("Moeda sem cotação na tabela de câmbio")
+    return BancoException(f"Operação rejeitada: {status.name}")
+
 # Entidades do domínio
 class Usuario:
     def __init__(self, nome: str, data_nascimento: str, cpf: str, endereco: str):
@@ -45,21 +121,93 @@ class Usuario:
             cpf=data["cpf"],
             endereco=data["endereco"]
         )
+    
+    @property
+    def cidade(self) -> str:
+        # Endereço no formato "logradouro, nro - bairro - cidade/sigla estado"
+        return self.endereco.rsplit(" - ", 1)[-1].split("/", 1)[0].strip()
+
+# Apoio à busca de clientes
+CAMPOS_BUSCA = ("nome", "cpf", "cidade")
+
+def normalizar_texto(texto: str) -> str:
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return " ".join("".join(c for c in decomposto if not unicodedata.combining(c)).lower().split())
+
+def valor_busca(usuario: Usuario, campo: str) -> str:
+    if campo == "cpf":
+        return re.sub(r'[^0-9]', '', usuario.cpf)
+    if campo == "cidade":
+        return normalizar_texto(usuario.cidade)
+    if campo == "nome":
+        return normalizar_texto(usuario.nome)
+    raise BancoException(f"Campo de busca inválido: {campo}")
+
+def normalizar_consulta(termo: str, campo: str) -> str:
+    if campo == "cpf":
+        consulta = re.sub(r'[^0-9]', '', termo)
+    elif campo not in CAMPOS_BUSCA:
+        raise BancoException(f"Campo de busca inválido: {campo}")
+    else:
+        consulta = normalizar_texto(termo)
+    # Sem nada a procurar (vazio, só espaços ou CPF sem dígitos) a consulta
+    # corresponderia a todos os usuários
+    if not consulta:
+        raise BancoException("Termo de busca vazio")
+    return consulta
+
+def relevancia(texto: str, consulta: str) -> int:
+    # 0: começa com a consulta; 1: alguma palavra começa com ela; 2: contém
+    if texto.startswith(consulta):
+        return 0
+    if (" " + consulta) in texto:
+        return 1
+    return 2
+
+def corresponde(texto: str, consulta: str, campo: str) -> bool:
+    # CPF é buscado por prefixo; consultas curtas, por início de palavra
+    if campo == "cpf":
+        return texto.startswith(consulta)
+    if len(consulta) < 3:
+        return relevancia(texto, consulta) < 2
+    return consulta in texto
+
+def paginar(itens: List, total: int, pagina: int, tamanho_pagina: int) -> Dict:
+    return {
+        "total": total,
+        "pagina": pagina,
+        "tamanho_pagina": tamanho_pagina,
+        "resultados": itens
+    }
+
+def epoca_us(data: datetime) -> int:
+    # Instante em microssegundos desde a época, como gravado em disco
+    return int(round(data.timestamp() * 1_000_000))
+
+# Entrada que resume o histórico arquivado (arquivamento.py): carrega o saldo
+# anterior, mas não é uma movimentação e fica fora das análises e agregações
+TIPO_RESUMO = "Saldo Anterior"
 
 class Transacao:
-    def __init__(self, tipo: str, valor: float, descricao: str = ""):
+    def __init__(self, tipo: str, valor: float, descricao: str = "", data: Optional[datetime] = None,
+                 moeda: str = MOEDA_PADRAO):
         self.tipo = tipo
         self.valor = valor
-        self.data = datetime.now(pytz.timezone('America/Sao_Paulo'))
+        self.data = data or datetime.now(FUSO_HORARIO)
         self.descricao = descricao
+        self.moeda = moeda
         
     def to_dict(self) -> Dict:
-        return {
+        dados = {
             "tipo": self.tipo,
             "valor": self.valor,
             "data": self.data.strftime("%d/%m/%Y %H:%M:%S"),
             "descricao": self.descricao
         }
+        # Extratos em reais mantêm o formato original
+        if self.moeda != MOEDA_PADRAO:
+            dados["moeda"] = self.moeda
+        return dados
 
 class Conta:
     def __init__(self, agencia: str, numero: int, usuario: Usuario):
@@ -67,49 +215,119 @@ class Conta:
         self.numero = numero
         self.usuario = usuario
         self.saldo = 0.0
+        # Moeda -> saldo em unidades menores (inteiro), somente moedas estrangeiras
+        self.saldos_moeda: Dict[str, int] = {}
         self.transacoes: List[Transacao] = []
         self.saques_realizados = 0
-        
-    def depositar(self, valor: float):
-        if valor <= 0:
-            raise ValorInvalidoException("Valor de depósito deve ser positivo")
-        
-        self.saldo += valor
-        transacao = Transacao("Depósito", valor)
-        self.transacoes.append(transacao)
-        
-    def sacar(self, valor: float, limite: float, limite_saques: int):
-        if valor <= 0:
-            raise ValorInvalidoException("Valor de saque deve ser positivo")
+        # Incrementada a cada alteração confirmada (controle de concorrência otimista)
+        self.versao = 0
+    
+    # Verificações sem efeitos colaterais e sem exceções
+    def verificar_deposito(self, valor: float) -> StatusOperacao:
+        if not valor_valido(valor):
+            return StatusOperacao.VALOR_INVALIDO
+        return StatusOperacao.OK
+    
+    def verificar_saque(self, valor: float, limite: float, limite_saques: int) -> StatusOperacao:
+        if not valor_valido(valor):
+            return StatusOperacao.VALOR_INVALIDO
         if valor > self.saldo:
-            raise SaldoInsuficienteException("Saldo insuficiente")
+            return StatusOperacao.SALDO_INSUFICIENTE
         if valor > limite:
-            raise LimiteSaqueException(f"Valor excede o limite de R$ {limite:.2f} por saque")
+            return StatusOperacao.LIMITE_VALOR_SAQUE
         if self.saques_realizados >= limite_saques:
-            raise LimiteSaqueException(f"Número máximo de {limite_saques} saques excedido")
-        
-        self.saldo -= valor
-        self.saques_realizados += 1
-        transacao = Transacao("Saque", -valor)
-        self.transacoes.append(transacao)
-        
-    def transferir(self, valor: float, conta_destino: 'Conta', descricao: str = ""):
-        if valor <= 0:
-            raise ValorInvalidoException("Valor de transferência deve ser positivo")
+            return StatusOperacao.LIMITE_QUANTIDADE_SAQUES
+        return StatusOperacao.OK
+    
+    def verificar_transferencia(self, valor: float) -> StatusOperacao:
+        if not valor_valido(valor):
+            return StatusOperacao.VALOR_INVALIDO
         if valor > self.saldo:
-            raise SaldoInsuficienteException("Saldo insuficiente")
+            return StatusOperacao.SALDO_INSUFICIENTE
+        return StatusOperacao.OK
+    
+    # As operações são divididas em validação (preparar_*), que não altera a
+    # conta, e aplicação, feita pelo repositório ao confirmar a versão lida
+    def preparar_deposito(self, valor: float) -> Transacao:
+        status = self.verificar_deposito(valor)
+        if status is not StatusOperacao.OK:
+            raise erro_operacao(status, "depósito")
         
-        self.saldo -= valor
-        conta_destino.saldo += valor
+        return Transacao("Depósito", valor)
+    
+    def preparar_saque(self, valor: float, limite: float, limite_saques: int) -> Transacao:
+        status = self.verificar_saque(valor, limite, limite_saques)
+        if status is not StatusOperacao.OK:
+            raise erro_operacao(status, "saque", limite, limite_saques)
+        
+        return Transacao("Saque", -valor)
+    
+    def preparar_transferencia(self, valor: float, conta_destino: 'Conta',
+                               descricao: str = "") -> Tuple[Transacao, Transacao]:
+        status = self.verificar_transferencia(valor)
+        if status is not StatusOperacao.OK:
+            raise erro_operacao(status, "transferência")
         
         transacao_origem = Transacao("Transferência Enviada", -valor, f"Para: {conta_destino}")
         transacao_destino = Transacao("Transferência Recebida", valor, f"De: {self}")
+        return transacao_origem, transacao_destino
+    
+    def aplicar(self, transacao: Transacao) -> None:
+        # O histórico primeiro: se a gravação falhar, o saldo não muda
+        self.transacoes.append(transacao)
+        if transacao.moeda == MOEDA_PADRAO:
+            self.saldo += transacao.valor
+        else:
+            self.saldos_moeda[transacao.moeda] = (self.saldos_moeda.get(transacao.moeda, 0)
+                                                  + unidades_menores(transacao.valor, transacao.moeda))
+        if transacao.tipo == "Saque":
+            self.saques_realizados += 1
+        self.versao += 1
+        
+    def depositar(self, valor: float):
+        self.aplicar(self.preparar_deposito(valor))
+        
+    def sacar(self, valor: float, limite: float, limite_saques: int):
+        self.aplicar(self.preparar_saque(valor, limite, limite_saques))
         
-        self.transacoes.append(transacao_origem)
-        conta_destino.transacoes.append(transacao_destino)
+    def transferir(self, valor: float, conta_destino: 'Conta', descricao: str = ""):
+        transacao_origem, transacao_destino = self.preparar_transferencia(valor, conta_destino, descricao)
+        self.aplicar(transacao_origem)
+        conta_destino.aplicar(transacao_destino)
+    
+    # API por código de resultado: rejeições não constroem exceções
+    def tentar_depositar(self, valor: float) -> StatusOperacao:
+        status = self.verificar_deposito(valor)
+        if status is StatusOperacao.OK:
+            self.aplicar(Transacao("Depósito", valor))
+        return status
+    
+    def tentar_sacar(self, valor: float, limite: float, limite_saques: int) -> StatusOperacao:
+        status = self.verificar_saque(valor, limite, limite_saques)
+        if status is StatusOperacao.OK:
+            self.aplicar(Transacao("Saque", -valor))
+        return status
+    
+    def tentar_transferir(self, valor: float, conta_destino: 'Conta') -> StatusOperacao:
+        status = self.verificar_transferencia(valor)
+        if status is StatusOperacao.OK:
+            self.aplicar(Transacao("Transferência Enviada", -valor, f"Para: {conta_destino}"))
+            conta_destino.aplicar(Transacao("Transferência Recebida", valor, f"De: {self}"))
+        return status
         
-    def obter_extrato(self) -> List[Dict]:
-        return [transacao.to_dict() for transacao in self.transacoes]
+    def transacoes_periodo(self, inicio: Optional[datetime] = None,
+                           fim: Optional[datetime] = None) -> Iterable[Transacao]:
+        # Históricos especializados (arquivados, mapeados em disco) filtram por conta própria
+        periodo = getattr(self.transacoes, "periodo", None)
+        if periodo is not None:
+            return periodo(inicio, fim)
+        return (transacao for transacao in self.transacoes
+                if (inicio is None or transacao.data >= inicio) and (fim is None or transacao.data < fim))
+    
+    def obter_extrato(self, inicio: Optional[datetime] = None, fim: Optional[datetime] = None) -> List[Dict]:
+        if inicio is None and fim is None:
+            return [transacao.to_dict() for transacao in self.transacoes]
+        return [transacao.to_dict() for transacao in self.transacoes_periodo(inicio, fim)]
     
     def __str__(self):
         return f"Ag: {self.agencia} C/C: {self.numero} - {self.usuario.nome}"
@@ -120,7 +338,9 @@ class Conta:
             "numero": self.numero,
             "usuario": self.usuario.to_dict(),
             "saldo": self.saldo,
+            "saldos_moeda": dict(self.saldos_moeda),
             "saques_realizados": self.saques_realizados,
+            "versao": self.versao,
             "transacoes": [t.to_dict() for t in self.transacoes]
         }
     
@@ -132,10 +352,22 @@ class Conta:
             usuario=usuario
         )
         conta.saldo = data["saldo"]
+        conta.saldos_moeda = dict(data.get("saldos_moeda", {}))
         conta.saques_realizados = data["saques_realizados"]
-        conta.transacoes = [Transacao(t["tipo"], t["valor"], t.get("descricao", "")) for t in data["transacoes"]]
+        conta.versao = data.get("versao", 0)
+        conta.transacoes = [
+            Transacao(t["tipo"], t["valor"], t.get("descricao", ""),
+                      FUSO_HORARIO.localize(datetime.strptime(t["data"], "%d/%m/%Y %H:%M:%S")) if "data" in t else None,
+                      t.get("moeda", MOEDA_PADRAO))
+            for t in data["transacoes"]
+        ]
         return conta
 
+# Alteração a confirmar: (conta, versão lida antes da validação, transação)
+Alteracao = Tuple[Conta, int, Transacao]
+# Resultado da fase de validação: rejeição ou alterações a confirmar
+ResultadoPreparacao = Union[StatusOperacao, List[Alteracao]]
+
 # Interfaces de repositório
 class UsuarioRepository(ABC):
     @abstractmethod
@@ -149,6 +381,21 @@ class UsuarioRepository(ABC):
     @abstractmethod
     def listar_todos(self) -> List[Usuario]:
         pass
+    
+    def buscar(self, termo: str, campo: str = "nome", pagina: int = 1, tamanho_pagina: int = 10) -> Dict:
+        # Implementação de referência por varredura; repositórios indexados sobrescrevem
+        if pagina < 1 or tamanho_pagina < 1:
+            raise BancoException("Paginação inválida")
+        consulta = normalizar_consulta(termo, campo)
+        encontrados = []
+        for usuario in self.listar_todos():
+            texto = valor_busca(usuario, campo)
+            if corresponde(texto, consulta, campo):
+                encontrados.append((relevancia(texto, consulta), texto, usuario))
+        encontrados.sort(key=lambda item: item[:2])
+        inicio = (pagina - 1) * tamanho_pagina
+        return paginar([item[2] for item in encontrados[inicio:inicio + tamanho_pagina]],
+                       len(encontrados), pagina, tamanho_pagina)
 
 class ContaRepository(ABC):
     @abstractmethod
@@ -172,18 +419,35 @@ class ContaRepository(ABC):
         pass
     
     @abstractmethod
-    def proximo_numero(self) -> int:
+    def listar_por_agencia(self, agencia: str) -> List[Conta]:
+        pass
+    
+    @abstractmethod
+    def estatisticas_agencia(self, agencia: str) -> Dict:
+        pass
+    
+    @abstractmethod
+    def proximo_numero(self, agencia: str) -> int:
+        pass
+    
+    @abstractmethod
+    def confirmar(self, alteracoes: List[Alteracao]) -> None:
+        # Compare-and-swap: aplica todas as transações somente se nenhuma conta
+        # mudou de versão desde a leitura; caso contrário, ConflitoVersaoException
         pass
 
 # Implementações em memória
 class UsuarioRepositoryMemory(UsuarioRepository):
     def __init__(self):
         self.usuarios: Dict[str, Usuario] = {}
+        # Ordem de cadastro (somente anexação): um snapshot guarda apenas o tamanho
+        self.ordem: List[Usuario] = []
     
     def adicionar(self, usuario: Usuario) -> None:
         if usuario.cpf in self.usuarios:
             raise BancoException("Já existe usuário com este CPF")
         self.usuarios[usuario.cpf] = usuario
+        self.ordem.append(usuario)
     
     def buscar_por_cpf(self, cpf: str) -> Optional[Usuario]:
         return self.usuarios.get(cpf)
@@ -193,41 +457,201 @@ class UsuarioRepositoryMemory(UsuarioRepository):
 
 class ContaRepositoryMemory(ContaRepository):
     def __init__(self):
-        self.contas: Dict[str, Conta] = {}  # Chave: "agencia:numero"
-        self.ultimo_numero = 0
+        # Partições por agência: {agencia: {numero: Conta}}
+        self.agencias: Dict[int, Dict[int, Conta]] = {}
+        # Sequência de numeração independente por agência
+        self.ultimos_numeros: Dict[int, int] = {}
+        self.contas_por_cpf: Dict[str, List[Conta]] = {}
+        # Ordem de criação (somente anexação): um snapshot guarda apenas o tamanho
+        self.ordem: List[Conta] = []
+        # Snapshots em andamento; preservam o estado de cada conta antes da
+        # primeira alteração posterior ao ponto do snapshot (copy-on-write)
+        self.snapshots_ativos: List = []
+        # Protege apenas a comparação e a aplicação, nunca a validação
+        self._trava_confirmacao = threading.Lock()
+        # Protege a estrutura (partições, numeração, índice por CPF) contra
+        # cadastros concorrentes e iterações das threads de fundo. Quando as
+        # duas são necessárias, esta é adquirida antes da de confirmação
+        self._trava_cadastro = threading.Lock()
+    
+    @staticmethod
+    def chave_agencia(agencia: str) -> int:
+        # Somente dígitos: int() aceitaria também " 1 " e "1_000"
+        if isinstance(agencia, int) and not isinstance(agencia, bool):
+            chave = agencia
+        elif isinstance(agencia, str) and agencia.isascii() and agencia.isdigit():
+            chave = int(agencia)
+        else:
+            raise BancoException("Agência inválida")
+        if chave < 0:
+            raise BancoException("Agência inválida")
+        return chave
     
     def adicionar(self, conta: Conta) -> None:
-        chave = f"{conta.agencia}:{conta.numero}"
-        if chave in self.contas:
-            raise BancoException("Conta já existe")
-        self.contas[chave] = conta
-        if conta.numero > self.ultimo_numero:
-            self.ultimo_numero = conta.numero
+        chave = self.chave_agencia(conta.agencia)
+        with self._trava_cadastro:
+            particao = self.agencias.setdefault(chave, {})
+            if conta.numero in particao:
+                raise BancoException("Conta já existe")
+            particao[conta.numero] = conta
+            self.contas_por_cpf.setdefault(conta.usuario.cpf, []).append(conta)
+            with self._trava_confirmacao:
+                if conta.numero > self.ultimos_numeros.get(chave, 0):
+                    self.ultimos_numeros[chave] = conta.numero
+                self.ordem.append(conta)
     
     def buscar_por_numero(self, numero: int) -> Optional[Conta]:
-        for conta in self.contas.values():
-            if conta.numero == numero:
+        with self._trava_cadastro:
+            particoes = list(self.agencias.values())
+        for particao in particoes:
+            conta = particao.get(numero)
+            if conta:
                 return conta
         return None
     
     def buscar_por_agencia_numero(self, agencia: str, numero: int) -> Optional[Conta]:
-        chave = f"{agencia}:{numero}"
-        return self.contas.get(chave)
+        try:
+            chave = self.chave_agencia(agencia)
+        except BancoException:
+            # Agência ilegível não identifica conta alguma; a validação fica no cadastro
+            return None
+        particao = self.agencias.get(chave)
+        if not particao:
+            return None
+        return particao.get(numero)
     
     def listar_por_usuario(self, cpf: str) -> List[Conta]:
-        return [conta for conta in self.contas.values() if conta.usuario.cpf == cpf]
+        with self._trava_cadastro:
+            return list(self.contas_por_cpf.get(cpf, []))
     
+    # Listagens copiam sob a trava de cadastro: são chamadas também pelas
+    # threads de compactação e de snapshot enquanto contas são criadas
     def listar_todas(self) -> List[Conta]:
-        return list(self.contas.values())
+        with self._trava_cadastro:
+            return [conta for particao in self.agencias.values() for conta in particao.values()]
+    
+    def listar_por_agencia(self, agencia: str) -> List[Conta]:
+        chave = self.chave_agencia(agencia)
+        with self._trava_cadastro:
+            return list(self.agencias.get(chave, {}).values())
+    
+    def estatisticas_agencia(self, agencia: str) -> Dict:
+        contas = self.listar_por_agencia(agencia)
+        total_contas = len(contas)
+        saldo_total = sum(conta.saldo for conta in contas)
+        return {
+            "agencia": agencia,
+            "total_contas": total_contas,
+            "total_titulares": len({conta.usuario.cpf for conta in contas}),
+            "saldo_total": saldo_total,
+            "saldo_medio": saldo_total / total_contas if total_contas else 0.0
+        }
+    
+    def confirmar(self, alteracoes: List[Alteracao]) -> None:
+        with self._trava_confirmacao:
+            for conta, versao_lida, _ in alteracoes:
+                if conta.versao != versao_lida:
+                    raise ConflitoVersaoException("Conta alterada por outra operação")
+            # Históricos persistentes (ex.: historico_mmap) validam a gravação
+            # antes que qualquer conta da confirmação seja alterada
+            for conta, _, transacao in alteracoes:
+                validar = getattr(conta.transacoes, "validar", None)
+                if validar is not None:
+                    validar(transacao)
+            for snapshot in self.snapshots_ativos:
+                for conta, _, _ in alteracoes:
+                    snapshot.preservar(conta)
+            for conta, _, transacao in alteracoes:
+                conta.aplicar(transacao)
+    
+    def proximo_numero(self, agencia: str) -> int:
+        chave = self.chave_agencia(agencia)
+        # A de confirmação também: o snapshot copia a numeração sob ela
+        with self._trava_cadastro, self._trava_confirmacao:
+            numero = self.ultimos_numeros.get(chave, 0) + 1
+            self.ultimos_numeros[chave] = numero
+        return numero
+    
+    def substituir_historico(self, conta: Conta, esperado, novo, copiadas: int) -> bool:
+        # Troca o histórico da conta por `novo`, que já recebeu (fora da trava)
+        # as `copiadas` primeiras transações de `esperado`; as confirmadas
+        # depois da cópia são anexadas aqui. Retorna False, sem alterar nada,
+        # se outra rotina já trocou o histórico
+        with self._trava_confirmacao:
+            if conta.transacoes is not esperado:
+                return False
+            novo.extend(islice(esperado, copiadas, None))
+            # Snapshots em andamento seguem vendo o histórico anterior
+            for snapshot in self.snapshots_ativos:
+                snapshot.preservar(conta)
+            conta.transacoes = novo
+        return True
+    
+    def registrar_snapshot(self, snapshot) -> Tuple[int, Dict[int, int]]:
+        # Ponto do snapshot: quantidade de contas e numeração por agência. A
+        # partir daqui, cada confirmação chama snapshot.preservar antes de aplicar
+        with self._trava_confirmacao:
+            self.snapshots_ativos.append(snapshot)
+            return len(self.ordem), dict(self.ultimos_numeros)
+    
+    def remover_snapshot(self, snapshot) -> None:
+        with self._trava_confirmacao:
+            self.snapshots_ativos.remove(snapshot)
+    
+    def pausar_confirmacoes(self) -> threading.Lock:
+        # Para leituras de várias contas sem nenhuma confirmação no meio
+        return self._trava_confirmacao
+
+def repositorio_base(repositorio):
+    # Repositórios envoltos por um cache (cache_repositorio) expõem o
+    # original no atributo `repositorio`
+    return getattr(repositorio, "repositorio", repositorio)
+
+# Publicação de eventos do caminho de escrita (feed de alterações)
+class PublicadorEventos:
+    def __init__(self):
+        self.assinantes: List[Callable[[str, Dict], None]] = []
+    
+    def assinar(self, assinante: Callable[[str, Dict], None]) -> None:
+        self.assinantes.append(assinante)
+    
+    def cancelar(self, assinante: Callable[[str, Dict], None]) -> None:
+        self.assinantes.remove(assinante)
+    
+    def ativo(self) -> bool:
+        return bool(self.assinantes)
     
-    def proximo_numero(self) -> int:
-        self.ultimo_numero += 1
-        return self.ultimo_numero
+    def publicar(self, tipo: str, dados: Dict) -> None:
+        for assinante in self.assinantes:
+            assinante(tipo, dados)
+
+def lancamento(conta: Conta, transacao: Transacao, versao: int) -> Dict:
+    return {
+        "agencia": conta.agencia,
+        "numero": conta.numero,
+        "tipo": transacao.tipo,
+        "valor": transacao.valor,
+        "descricao": transacao.descricao,
+        "data": transacao.data.timestamp(),
+        "moeda": transacao.moeda,
+        "versao": versao
+    }
+
+def lancamentos(alteracoes: List[Alteracao]) -> List[Dict]:
+    # Cada lançamento leva a versão da conta após a transação: a réplica
+    # descarta o que já recebeu e reordena o que chegou fora de ordem
+    versoes: Dict[Conta, int] = {}
+    resultado = []
+    for conta, versao_lida, transacao in alteracoes:
+        versoes[conta] = versoes.get(conta, versao_lida) + 1
+        resultado.append(lancamento(conta, transacao, versoes[conta]))
+    return resultado
 
 # Serviços de aplicação
 class UsuarioService:
-    def __init__(self, usuario_repo: UsuarioRepository):
+    def __init__(self, usuario_repo: UsuarioRepository, eventos: Optional[PublicadorEventos] = None):
         self.usuario_repo = usuario_repo
+        self.eventos = eventos
     
     def cadastrar_usuario(self, nome: str, data_nascimento: str, cpf: str, endereco: str) -> Usuario:
         # Validações
@@ -240,6 +664,8 @@ class UsuarioService:
         # Criar usuário
         usuario = Usuario(nome, data_nascimento, cpf, endereco)
         self.usuario_repo.adicionar(usuario)
+        if self.eventos and self.eventos.ativo():
+            self.eventos.publicar("usuario_cadastrado", usuario.to_dict())
         return usuario
     
     def buscar_usuario(self, cpf: str) -> Optional[Usuario]:
@@ -248,6 +674,10 @@ class UsuarioService:
     def listar_usuarios(self) -> List[Usuario]:
         return self.usuario_repo.listar_todos()
     
+    def pesquisar_usuarios(self, termo: str, campo: str = "nome",
+                           pagina: int = 1, tamanho_pagina: int = 10) -> Dict:
+        return self.usuario_repo.buscar(termo, campo, pagina, tamanho_pagina)
+    
     @staticmethod
     def validar_cpf(cpf: str) -> bool:
         # Remove caracteres não numéricos
@@ -287,18 +717,26 @@ class UsuarioService:
             return False
 
 class ContaService:
-    def __init__(self, conta_repo: ContaRepository, usuario_repo: UsuarioRepository):
+    def __init__(self, conta_repo: ContaRepository, usuario_repo: UsuarioRepository,
+                 eventos: Optional[PublicadorEventos] = None):
         self.conta_repo = conta_repo
         self.usuario_repo = usuario_repo
+        self.eventos = eventos
     
     def criar_conta(self, agencia: str, cpf: str) -> Conta:
         usuario = self.usuario_repo.buscar_por_cpf(cpf)
         if not usuario:
             raise BancoException("Usuário não encontrado")
         
-        numero = self.conta_repo.proximo_numero()
+        numero = self.conta_repo.proximo_numero(agencia)
         conta = Conta(agencia, numero, usuario)
         self.conta_repo.adicionar(conta)
+        if self.eventos and self.eventos.ativo():
+            self.eventos.publicar("conta_criada", {
+                "agencia": conta.agencia,
+                "numero": conta.numero,
+                "cpf": usuario.cpf
+            })
         return conta
     
     def buscar_conta(self, agencia: str, numero: int) -> Optional[Conta]:
@@ -309,55 +747,180 @@ class ContaService:
     
     def listar_contas_por_usuario(self, cpf: str) -> List[Conta]:
         return self.conta_repo.listar_por_usuario(cpf)
+    
+    def listar_contas_por_agencia(self, agencia: str) -> List[Conta]:
+        return self.conta_repo.listar_por_agencia(agencia)
+    
+    def estatisticas_agencia(self, agencia: str) -> Dict:
+        return self.conta_repo.estatisticas_agencia(agencia)
 
 class OperacaoBancariaService:
-    def __init__(self, conta_repo: ContaRepository):
+    def __init__(self, conta_repo: ContaRepository, eventos: Optional[PublicadorEventos] = None):
         self.conta_repo = conta_repo
+        self.eventos = eventos
         self.limite_saque = 500
         self.limite_saques_diarios = 3
+        self.max_tentativas = 5
+        self.conflitos = 0
     
-    def depositar(self, agencia: str, numero: int, valor: float):
+    def _buscar(self, agencia: str, numero: int, mensagem: str = "Conta não encontrada") -> Conta:
         conta = self.conta_repo.buscar_por_agencia_numero(agencia, numero)
         if not conta:
-            raise ContaNaoEncontradaException("Conta não encontrada")
+            raise ContaNaoEncontradaException(mensagem)
+        return conta
+    
+    def _confirmar(self, preparar: Callable[[], ResultadoPreparacao]) -> ResultadoPreparacao:
+        # Controle otimista: relê e revalida a cada conflito, sem bloquear a leitura
+        for _ in range(self.max_tentativas):
+            alteracoes = preparar()
+            if isinstance(alteracoes, StatusOperacao):
+                return alteracoes
+            try:
+                self.conta_repo.confirmar(alteracoes)
+                return alteracoes
+            except ConflitoVersaoException:
+                self.conflitos += 1
+        return StatusOperacao.CONFLITO
+    
+    # API por código de resultado: rejeições retornam StatusOperacao
+    def tentar_depositar(self, agencia: str, numero: int, valor: float) -> StatusOperacao:
+        def preparar() -> ResultadoPreparacao:
+            conta = self.conta_repo.buscar_por_agencia_numero(agencia, numero)
+            if not conta:
+                return StatusOperacao.CONTA_NAO_ENCONTRADA
+            versao = conta.versao
+            status = conta.verificar_deposito(valor)
+            if status is not StatusOperacao.OK:
+                return status
+            return [(conta, versao, Transacao("Depósito", valor))]
         
-        conta.depositar(valor)
+        alteracoes = self._confirmar(preparar)
+        if isinstance(alteracoes, StatusOperacao):
+            return alteracoes
+        if self.eventos and self.eventos.ativo():
+            self.eventos.publicar("deposito", {
+                "agencia": agencia,
+                "numero": numero,
+                "valor": valor,
+                "lancamentos": lancamentos(alteracoes)
+            })
+        return StatusOperacao.OK
     
-    def sacar(self, agencia: str, numero: int, valor: float):
-        conta = self.conta_repo.buscar_por_agencia_numero(agencia, numero)
-        if not conta:
-            raise ContaNaoEncontradaException("Conta não encontrada")
+    def tentar_sacar(self, agencia: str, numero: int, valor: float,
+                     limite: Optional[float] = None, limite_saques: Optional[int] = None) -> StatusOperacao:
+        # Limites próprios da conta (ex.: ContaCorrente do modelo POO) têm precedência
+        limite = self.limite_saque if limite is None else limite
+        limite_saques = self.limite_saques_diarios if limite_saques is None else limite_saques
+        
+        def preparar() -> ResultadoPreparacao:
+            conta = self.conta_repo.buscar_por_agencia_numero(agencia, numero)
+            if not conta:
+                return StatusOperacao.CONTA_NAO_ENCONTRADA
+            versao = conta.versao
+            status = conta.verificar_saque(valor, limite, limite_saques)
+            if status is not StatusOperacao.OK:
+                return status
+            return [(conta, versao, Transacao("Saque", -valor))]
         
-        conta.sacar(valor, self.limite_saque, self.limite_saques_diarios)
+        alteracoes = self._confirmar(preparar)
+        if isinstance(alteracoes, StatusOperacao):
+            return alteracoes
+        if self.eventos and self.eventos.ativo():
+            self.eventos.publicar("saque", {
+                "agencia": agencia,
+                "numero": numero,
+                "valor": valor,
+                "lancamentos": lancamentos(alteracoes)
+            })
+        return StatusOperacao.OK
+    
+    def tentar_transferir(self, agencia_origem: str, numero_origem: int,
+                          agencia_destino: str, numero_destino: int, valor: float) -> StatusOperacao:
+        def preparar() -> ResultadoPreparacao:
+            conta_origem = self.conta_repo.buscar_por_agencia_numero(agencia_origem, numero_origem)
+            if not conta_origem:
+                return StatusOperacao.CONTA_NAO_ENCONTRADA
+            conta_destino = self.conta_repo.buscar_por_agencia_numero(agencia_destino, numero_destino)
+            if not conta_destino:
+                return StatusOperacao.CONTA_DESTINO_NAO_ENCONTRADA
+            versao_origem, versao_destino = conta_origem.versao, conta_destino.versao
+            status = conta_origem.verificar_transferencia(valor)
+            if status is not StatusOperacao.OK:
+                return status
+            return [
+                (conta_origem, versao_origem,
+                 Transacao("Transferência Enviada", -valor, f"Para: {conta_destino}")),
+                (conta_destino, versao_destino,
+                 Transacao("Transferência Recebida", valor, f"De: {conta_origem}"))
+            ]
+        
+        alteracoes = self._confirmar(preparar)
+        if isinstance(alteracoes, StatusOperacao):
+            return alteracoes
+        if self.eventos and self.eventos.ativo():
+            self.eventos.publicar("transferencia", {
+                "agencia_origem": agencia_origem,
+                "numero_origem": numero_origem,
+                "agencia_destino": agencia_destino,
+                "numero_destino": numero_destino,
+                "valor": valor,
+                "lancamentos": lancamentos(alteracoes)
+            })
+        return StatusOperacao.OK
+    
+    # API tradicional: rejeições levantam a exceção correspondente
+    def depositar(self, agencia: str, numero: int, valor: float):
+        status = self.tentar_depositar(agencia, numero, valor)
+        if status is not StatusOperacao.OK:
+            raise erro_operacao(status, "depósito")
+    
+    def sacar(self, agencia: str, numero: int, valor: float,
+              limite: Optional[float] = None, limite_saques: Optional[int] = None):
+        status = self.tentar_sacar(agencia, numero, valor, limite, limite_saques)
+        if status is not StatusOperacao.OK:
+            raise erro_operacao(status, "saque",
+                                self.limite_saque if limite is None else limite,
+                                self.limite_saques_diarios if limite_saques is None else limite_saques)
     
     def transferir(self, agencia_origem: str, numero_origem: int, 
                   agencia_destino: str, numero_destino: str, valor: float):
-        conta_origem = self.conta_repo.buscar_por_agencia_numero(agencia_origem, numero_origem)
-        if not conta_origem:
-            raise ContaNaoEncontradaException("Conta de origem não encontrada")
-        
-        conta_destino = self.conta_repo.buscar_por_agencia_numero(agencia_destino, numero_destino)
-        if not conta_destino:
-            raise ContaNaoEncontradaException("Conta de destino não encontrada")
-        
-        conta_origem.transferir(valor, conta_destino)
+        status = self.tentar_transferir(agencia_origem, numero_origem, agencia_destino, numero_destino, valor)
+        if status is not StatusOperacao.OK:
+            raise erro_operacao(status, "transferência")
     
-    def obter_extrato(self, agencia: str, numero: int) -> List[Dict]:
-        conta = self.conta_repo.buscar_por_agencia_numero(agencia, numero)
-        if not conta:
-            raise ContaNaoEncontradaException("Conta não encontrada")
+    def obter_extrato(self, agencia: str, numero: int, inicio: Optional[datetime] = None,
+                      fim: Optional[datetime] = None) -> List[Dict]:
+        return self._buscar(agencia, numero).obter_extrato(inicio, fim)
+
+# Motor bancário compartilhado por todos os pontos de entrada
+class MotorBancario:
+    def __init__(self, usuario_repo: Optional[UsuarioRepository] = None,
+                 conta_repo: Optional[ContaRepository] = None,
+                 eventos: Optional[PublicadorEventos] = None):
+        if usuario_repo is None:
+            # Importação tardia: busca_usuarios depende deste módulo
+            from busca_usuarios import UsuarioRepositoryIndexado
+            usuario_repo = UsuarioRepositoryIndexado()
+        self.usuario_repo = usuario_repo
+        self.conta_repo = conta_repo if conta_repo is not None else ContaRepositoryMemory()
+        self.eventos = eventos if eventos is not None else PublicadorEventos()
         
-        return conta.obter_extrato()
+        self.usuario_service = UsuarioService(self.usuario_repo, self.eventos)
+        self.conta_service = ContaService(self.conta_repo, self.usuario_repo, self.eventos)
+        self.operacao_service = OperacaoBancariaService(self.conta_repo, self.eventos)
 
 # Interface de usuário
 class BancoInterface:
-    def __init__(self):
-        self.usuario_repo = UsuarioRepositoryMemory()
-        self.conta_repo = ContaRepositoryMemory()
+    def __init__(self, motor: Optional[MotorBancario] = None):
+        self.motor = motor if motor is not None else MotorBancario()
         
-        self.usuario_service = UsuarioService(self.usuario_repo)
-        self.conta_service = ContaService(self.conta_repo, self.usuario_repo)
-        self.operacao_service = OperacaoBancariaService(self.conta_repo)
+        self.usuario_repo = self.motor.usuario_repo
+        self.conta_repo = self.motor.conta_repo
+        self.eventos = self.motor.eventos
+        
+        self.usuario_service = self.motor.usuario_service
+        self.conta_service = self.motor.conta_service
+        self.operacao_service = self.motor.operacao_service
         
         self.agencia = "0001"
         self.conta_atual = None
@@ -365,14 +928,18 @@ class BancoInterface:
     def menu_principal(self):
         menu_text = """\n
         ================ MENU PRINCIPAL ================
+        Agência atual: {agencia}
         [1]\tAcessar Conta
         [2]\tCadastrar Usuário
         [3]\tCriar Conta
         [4]\tListar Contas
         [5]\tListar Usuários
+        [6]\tSelecionar Agência
+        [7]\tEstatísticas da Agência
+        [8]\tPesquisar Usuários
         [q]\tSair
         => """
-        return input(textwrap.dedent(menu_text))
+        return input(textwrap.dedent(menu_text).format(agencia=self.agencia))
     
     def menu_conta(self):
         menu_text = """\n
@@ -521,6 +1088,47 @@ class BancoInterface:
             print(f"Nome: {usuario.nome} | CPF: {usuario.cpf} | Nascimento: {usuario.data_nascimento}")
         print("===========================================")
     
+    def pesquisar_usuarios(self):
+        campo = input("Pesquisar por [n]ome, [c]PF ou c[i]dade: ").strip().lower()
+        campo = {"n": "nome", "c": "cpf", "i": "cidade"}.get(campo, "nome")
+        termo = input("Informe o termo da pesquisa: ")
+        
+        try:
+            resultado = self.usuario_service.pesquisar_usuarios(termo, campo)
+        except BancoException as e:
+            print(f"\n@@@ {e} @@@")
+            return
+        
+        if not resultado["resultados"]:
+            print("\n@@@ Nenhum usuário encontrado! @@@")
+            return
+        
+        # Acima do limite de candidatos do índice, o total é um piso
+        total = f"{resultado['total']}+" if resultado.get("total_limitado") else resultado["total"]
+        print(f"\n================ RESULTADOS ({total}) ================")
+        for usuario in resultado["resultados"]:
+            print(f"Nome: {usuario.nome} | CPF: {usuario.cpf} | Cidade: {usuario.cidade}")
+        print("===========================================")
+    
+    def selecionar_agencia(self):
+        agencia = input("Informe o número da agência: ").strip()
+        try:
+            ContaRepositoryMemory.chave_agencia(agencia)
+        except BancoException as e:
+            print(f"\n@@@ {e} @@@")
+            return
+        
+        self.agencia = agencia.zfill(4)
+        print(f"\n=== Agência {self.agencia} selecionada! ===")
+    
+    def exibir_estatisticas_agencia(self):
+        estatisticas = self.conta_service.estatisticas_agencia(self.agencia)
+        
+        print(f"\n================ AGÊNCIA {self.agencia} ================")
+        print(f"Contas: {estatisticas['total_contas']} | Titulares: {estatisticas['total_titulares']}")
+        print(f"Saldo total: R$ {estatisticas['saldo_total']:.2f} | Saldo médio: R$ {estatisticas['saldo_medio']:.2f}")
+        print("================================================")
+    
     def executar(self):
         while True:
             opcao = self.menu_principal()
@@ -535,6 +1143,12 @@ class BancoInterface:
                 self.listar_contas()
             elif opcao == "5":
                 self.listar_usuarios()
+            elif opcao == "6":
+                self.selecionar_agencia()
+            elif opcao == "7":
+                self.exibir_estatisticas_agencia()
+            elif opcao == "8":
+                self.pesquisar_usuarios()
             elif opcao == "q":
                 print("\n=== Obrigado por usar nosso sistema bancário! ===")
                 break
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+from itertools import islice
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from sistema_bancario_otimizado import (
+    BancoException, Conta, ContaRepository, ContaRepositoryMemory, MotorBancario, Usuario, UsuarioRepository,
+    UsuarioRepositoryMemory, repositorio_base
+)
+
+# Estado de uma conta no ponto do snapshot: (saldo, saldos em outras moedas,
+# saques realizados, versão, lista de transações, quantidade de transações)
+EstadoConta = Tuple[float, Dict[str, int], int, int, Sequence, int]
+
+def estado_conta(conta: Conta) -> EstadoConta:
+    # O histórico é somente anexação: basta guardar a lista e o tamanho atual
+    return (conta.saldo, dict(conta.saldos_moeda), conta.saques_realizados, conta.versao,
+            conta.transacoes, len(conta.transacoes))
+
+# Snapshot consistente dos repositórios em memória sem parar as escritas.
+# O ponto do snapshot é tomado sob a trava de confirmação (uma transferência
+# aparece inteira ou não aparece) e custa O(1): guarda apenas os tamanhos das
+# listas de usuários e contas. Depois disso, cada confirmação preserva o estado
+# anterior das contas que ainda não foram lidas pelo serializador
+class Snapshot:
+    def __init__(self, usuario_repo: UsuarioRepositoryMemory, conta_repo: ContaRepositoryMemory,
+                 tamanho_lote: int = 256):
+        self.usuario_repo = usuario_repo
+        self.conta_repo = conta_repo
+        self.tamanho_lote = tamanho_lote
+        # Conta -> estado preservado; None quando a conta já foi serializada
+        self.imagens: Dict[Conta, Optional[EstadoConta]] = {}
+        self.total_contas = 0
+        self.total_usuarios = 0
+        self.ultimos_numeros: Dict[int, int] = {}
+        self.momento = 0.0
+        self.pausa = 0.0
+        self.preservadas = 0
+        self.ativo = False
+
+    def iniciar(self) -> "Snapshot":
+        if self.ativo:
+            raise BancoException("Snapshot já iniciado")
+        # Pausa das escritas: a espera pela trava de confirmação e o registro
+        inicio = time.perf_counter()
+        self.momento = time.time()
+        self.total_contas, self.ultimos_numeros = self.conta_repo.registrar_snapshot(self)
+        self.pausa = time.perf_counter() - inicio
+        self.ativo = True
+        # Contas antes dos usuários: todo titular de conta incluída também é incluído
+        self.total_usuarios = len(self.usuario_repo.ordem)
+        return self
+
+    def preservar(self, conta: Conta) -> None:
+        # Chamado pelo repositório, sob a trava, antes de aplicar uma transação
+        if conta not in self.imagens:
+            self.imagens[conta] = estado_conta(conta)
+            self.preservadas += 1
+
+    def encerrar(self) -> None:
+        if not self.ativo:
+            return
+        self.conta_repo.remover_snapshot(self)
+        self.ativo = False
+        self.imagens.clear()
+
+    def usuarios(self) -> Iterator[Usuario]:
+        # Usuários não mudam após o cadastro; o prefixo da lista é o snapshot
+        return islice(self.usuario_repo.ordem, self.total_usuarios)
+
+    def contas(self) -> Iterator[Tuple[Conta, EstadoConta]]:
+        if not self.ativo:
+            raise BancoException("Snapshot não iniciado")
+        ordem = self.conta_repo.ordem
+        for inicio in range(0, self.total_contas, self.tamanho_lote):
+            lote = ordem[inicio:min(inicio + self.tamanho_lote, self.total_contas)]
+            # Um lote por aquisição da trava: as escritas esperam no máximo
+            # a cópia de `tamanho_lote` tuplas
+            with self.conta_repo.pausar_confirmacoes():
+                estados = []
+                for conta in lote:
+                    estado = self.imagens.get(conta)
+                    estados.append(estado if estado is not None else estado_conta(conta))
+                    self.imagens[conta] = None
+            yield from zip(lote, estados)
+
+    # Serialização em JSON Lines: cabeçalho, usuários e contas (formato de to_dict)
+    def registros(self) -> Iterator[Dict]:
+        yield {
+            "snapshot": {
+                "momento": self.momento,
+                "usuarios": self.total_usuarios,
+                "contas": self.total_contas,
+                "ultimos_numeros": self.ultimos_numeros
+            }
+        }
+        for usuario in self.usuarios():
+            yield {"usuario": usuario.to_dict()}
+        for conta, (saldo, saldos_moeda, saques_realizados, versao, transacoes, quantidade) in self.contas():
+            yield {
+                "conta": {
+                    "agencia": conta.agencia,
+                    "numero": conta.numero,
+                    "cpf": conta.usuario.cpf,
+                    "saldo": saldo,
+                    "saldos_moeda": saldos_moeda,
+                    "saques_realizados": saques_realizados,
+                    "versao": versao,
+                    "transacoes": [transacao.to_dict() for transacao in islice(transacoes, quantidade)]
+                }
+            }
+
+    def salvar(self, caminho: str) -> None:
+        # Grava em arquivo temporário e renomeia: um backup nunca fica pela metade
+        temporario = caminho + ".tmp"
+        try:
+            with open(temporario, "w", encoding="utf-8") as arquivo:
+                for registro in self.registros():
+                    arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            os.replace(temporario, caminho)
+        finally:
+            self.encerrar()
+
+    def salvar_em_segundo_plano(self, caminho: str) -> threading.Thread:
+        serializador = threading.Thread(target=self.salvar, args=(caminho,), daemon=True)
+        serializador.start()
+        return serializador
+
+    def estatisticas(self) -> Dict:
+        return {
+            "usuarios": self.total_usuarios,
+            "contas": self.total_contas,
+            "pausa": self.pausa,
+            "contas_preservadas": self.preservadas,
+            "ativo": self.ativo
+        }
+
+def repositorios_memoria(motor: MotorBancario) -> Tuple[UsuarioRepositoryMemory, ContaRepositoryMemory]:
+    usuario_repo = repositorio_base(motor.usuario_repo)
+    conta_repo = repositorio_base(motor.conta_repo)
+    if not isinstance(usuario_repo, UsuarioRepositoryMemory) or not isinstance(conta_repo, ContaRepositoryMemory):
+        raise BancoException("Snapshot disponível apenas para os repositórios em memória")
+    return usuario_repo, conta_repo
+
+def tirar_snapshot(motor: MotorBancario, caminho: str, tamanho_lote: int = 256) -> Tuple[Snapshot, threading.Thread]:
+    snapshot = Snapshot(*repositorios_memoria(motor), tamanho_lote).iniciar()
+    return snapshot, snapshot.salvar_em_segundo_plano(caminho)
+
+def restaurar_registro(registro: Dict, usuario_repo: UsuarioRepository, conta_repo: ContaRepository) -> None:
+    # Um usuário ou uma conta no formato de Snapshot.registros; o cabeçalho é ignorado
+    if "usuario" in registro:
+        usuario_repo.adicionar(Usuario.from_dict(registro["usuario"]))
+    elif "conta" in registro:
+        dados = registro["conta"]
+        conta_repo.adicionar(Conta.from_dict(dados, usuario_repo.buscar_por_cpf(dados["cpf"])))
+
+def carregar_snapshot(caminho: str, motor: Optional[MotorBancario] = None) -> MotorBancario:
+    motor = motor if motor is not None else MotorBancario()
+    ultimos_numeros: Dict[int, int] = {}
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            registro = json.loads(linha)
+            if "snapshot" in registro:
+                ultimos_numeros = {int(chave): numero for chave, numero in registro["snapshot"]["ultimos_numeros"].items()}
+            else:
+                restaurar_registro(registro, motor.usuario_repo, motor.conta_repo)
+    conta_repo = repositorio_base(motor.conta_repo)
+    if isinstance(conta_repo, ContaRepositoryMemory):
+        for chave, numero in ultimos_numeros.items():
+            conta_repo.ultimos_numeros[chave] = max(numero, conta_repo.ultimos_numeros.get(chave, 0))
+    return motor
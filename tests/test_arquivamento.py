@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from arquivamento import ArquivoHistorico, CompactadorHistorico, HistoricoCompactado
+from historico_mmap import HistoricoMmap, anexar_historico_mmap
+from sistema_bancario_otimizado import FUSO_HORARIO, TIPO_RESUMO, MotorBancario, Transacao
+from snapshots import Snapshot, carregar_snapshot
+
+CPF = "52998224725"
+
+def criar_motor(quantidade_contas: int, agora: datetime, dias: int = 120) -> MotorBancario:
+    # Um depósito por dia, do mais antigo ao mais recente
+    motor = MotorBancario()
+    motor.usuario_service.cadastrar_usuario("Ana Souza", "01-01-1990", CPF, "Rua A, 1 - Centro - Recife/PE")
+    for _ in range(quantidade_contas):
+        conta = motor.conta_service.criar_conta("0001", CPF)
+        for dia in range(dias, 0, -1):
+            conta.aplicar(Transacao("Depósito", 10.0 + dia, f"dia {dia}", agora - timedelta(days=dia)))
+    return motor
+
+class TestCompactadorHistorico(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho_arquivo = os.path.join(self.diretorio.name, "arquivo")
+        self.agora = FUSO_HORARIO.localize(datetime(2024, 6, 1, 12))
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def extrato(self, motor: MotorBancario, inicio_dias: int, fim_dias: int):
+        return motor.operacao_service.obter_extrato("0001", 1, self.agora - timedelta(days=inicio_dias),
+                                                    self.agora - timedelta(days=fim_dias))
+
+    def test_compactacao_preserva_saldo_e_extratos_por_periodo(self):
+        motor = criar_motor(2, self.agora)
+        conta = motor.conta_repo.buscar_por_agencia_numero("0001", 1)
+        antes = self.extrato(motor, 110, 60)
+        snapshot = Snapshot(motor.usuario_repo, motor.conta_repo).iniciar()
+
+        compactador = CompactadorHistorico(motor.conta_repo, ArquivoHistorico(self.caminho_arquivo),
+                                           timedelta(days=90))
+        self.assertEqual(compactador.executar(self.agora), 2 * 30)
+
+        self.assertIsInstance(conta.transacoes, HistoricoCompactado)
+        self.assertEqual(len(conta.transacoes), 1 + 90)
+        self.assertEqual(conta.transacoes[0].tipo, TIPO_RESUMO)
+        self.assertAlmostEqual(sum(transacao.valor for transacao in conta.transacoes), conta.saldo)
+        # O período cruza a fronteira entre o arquivo e o histórico em memória
+        self.assertEqual(self.extrato(motor, 110, 60), antes)
+        self.assertEqual(len(self.extrato(motor, 200, 0)), 120)
+        # O snapshot iniciado antes segue vendo o histórico completo
+        estados = {conta.numero: estado for conta, estado in snapshot.contas()}
+        self.assertEqual(estados[1][5], 120)
+        snapshot.encerrar()
+
+        # Uma segunda execução arquiva apenas o que saiu da janela desde então
+        motor.operacao_service.depositar("0001", 1, 5.0)
+        self.assertEqual(compactador.executar(self.agora + timedelta(days=10)), 2 * 10)
+        self.assertEqual(conta.transacoes[0].tipo, TIPO_RESUMO)
+        self.assertEqual(conta.transacoes[-1].valor, 5.0)
+        self.assertAlmostEqual(sum(transacao.valor for transacao in conta.transacoes), conta.saldo)
+        self.assertEqual(len(motor.operacao_service.obter_extrato("0001", 1, self.agora - timedelta(days=200))), 121)
+
+    def test_extrato_arquivado_apos_reiniciar(self):
+        motor = criar_motor(1, self.agora)
+        antes = self.extrato(motor, 120, 30)
+        CompactadorHistorico(motor.conta_repo, ArquivoHistorico(self.caminho_arquivo),
+                             timedelta(days=90)).executar(self.agora)
+        caminho_snapshot = os.path.join(self.diretorio.name, "snapshot.jsonl")
+        Snapshot(motor.usuario_repo, motor.conta_repo).iniciar().salvar(caminho_snapshot)
+
+        # Novo processo: snapshot carregado e índice de blocos reconstruído do disco
+        restaurado = carregar_snapshot(caminho_snapshot)
+        compactador = CompactadorHistorico(restaurado.conta_repo, ArquivoHistorico(self.caminho_arquivo))
+        compactador.reanexar(restaurado.conta_repo.listar_todas())
+
+        conta = restaurado.conta_repo.buscar_por_agencia_numero("0001", 1)
+        self.assertIsInstance(conta.transacoes, HistoricoCompactado)
+        self.assertEqual(self.extrato(restaurado, 120, 30), antes)
+
+    def test_historico_trocado_durante_a_compactacao_nao_perde_transacoes(self):
+        motor = criar_motor(1, self.agora)
+        conta = motor.conta_repo.buscar_por_agencia_numero("0001", 1)
+        diretorio_mmap = os.path.join(self.diretorio.name, "mmap")
+        migrados = []
+
+        class ArquivoComMigracao(ArquivoHistorico):
+            def gravar_bloco(self, segmento, chave, transacoes):
+                super().gravar_bloco(segmento, chave, transacoes)
+                # Outra rotina migra a conta e recebe um depósito antes da troca
+                migrados.append(anexar_historico_mmap(conta, diretorio_mmap, motor.conta_repo))
+                motor.operacao_service.depositar("0001", 1, 7.0)
+
+        compactador = CompactadorHistorico(motor.conta_repo, ArquivoComMigracao(self.caminho_arquivo),
+                                           timedelta(days=90))
+        try:
+            self.assertEqual(compactador.executar(self.agora), 0)
+            self.assertIsInstance(conta.transacoes, HistoricoMmap)
+            self.assertEqual(len(conta.transacoes), 121)
+            self.assertEqual(conta.transacoes[-1].valor, 7.0)
+            self.assertAlmostEqual(sum(transacao.valor for transacao in conta.transacoes), conta.saldo)
+        finally:
+            for historico in migrados:
+                historico.close()
+
+    def test_substituicao_anexa_o_confirmado_depois_da_copia(self):
+        motor = criar_motor(1, self.agora, dias=3)
+        conta = motor.conta_repo.buscar_por_agencia_numero("0001", 1)
+        historico = conta.transacoes
+        novo = list(historico)
+        motor.operacao_service.depositar("0001", 1, 7.0)
+
+        self.assertTrue(motor.conta_repo.substituir_historico(conta, historico, novo, 3))
+        self.assertIs(conta.transacoes, novo)
+        self.assertEqual([transacao.valor for transacao in novo], [13.0, 12.0, 11.0, 7.0])
+        self.assertFalse(motor.conta_repo.substituir_historico(conta, historico, [], 0))
+        self.assertIs(conta.transacoes, novo)
+
+if __name__ == "__main__":
+    unittest.main()
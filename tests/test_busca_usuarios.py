@@ -0,0 +1,110 @@
+import random
+import sys
+import threading
+import unittest
+
+from busca_usuarios import UsuarioRepositoryIndexado
+from sistema_bancario_otimizado import BancoException, Usuario, UsuarioRepositoryMemory
+
+NOMES = ["Ana", "João", "José", "Maria", "Mário", "Luíza", "Luiz", "Anabela", "Joana", "Marina"]
+SOBRENOMES = ["Souza", "Silva", "Santos", "Sá", "Oliveira", "Costa", "Ramos", "Araújo"]
+CIDADES = ["Recife/PE", "São Paulo/SP", "Salvador/BA", "Santos/SP", "Olinda/PE"]
+
+def gerar_cpf(sorteio: random.Random) -> str:
+    while True:
+        digitos = [sorteio.randrange(10) for _ in range(9)]
+        for tamanho in (9, 10):
+            soma = sum(digito * (tamanho + 1 - posicao) for posicao, digito in enumerate(digitos))
+            resto = soma % 11
+            digitos.append(0 if resto < 2 else 11 - resto)
+        cpf = "".join(map(str, digitos))
+        if cpf != cpf[0] * 11:
+            return cpf
+
+def gerar_usuarios(quantidade: int, semente: int = 0):
+    sorteio = random.Random(semente)
+    cpfs = set()
+    while len(cpfs) < quantidade:
+        cpfs.add(gerar_cpf(sorteio))
+    return [Usuario(f"{sorteio.choice(NOMES)} {sorteio.choice(SOBRENOMES)}", "01-01-1990", cpf,
+                    f"Rua A, 1 - Centro - {sorteio.choice(CIDADES)}")
+            for cpf in sorted(cpfs, key=lambda _: sorteio.random())]
+
+def chaves(resultado):
+    return resultado["total"], [usuario.cpf for usuario in resultado["resultados"]]
+
+class TestUsuarioRepositoryIndexado(unittest.TestCase):
+    def setUp(self):
+        self.indexado = UsuarioRepositoryIndexado()
+        self.varredura = UsuarioRepositoryMemory()
+        for usuario in gerar_usuarios(400):
+            self.indexado.adicionar(usuario)
+            self.varredura.adicionar(usuario)
+
+    def test_indice_igual_a_varredura(self):
+        consultas = [("nome", termo) for termo in ("a", "jo", "Mar", "luiz", "SOUZA", "ana s", "sa", "zzz")]
+        consultas += [("cidade", termo) for termo in ("sao", "S", "recife", "paulo", "x")]
+        consultas += [("cpf", termo) for termo in ("1", "12", "987.6", "000", "5")]
+        for campo, termo in consultas:
+            for pagina, tamanho in ((1, 10), (2, 7), (30, 10)):
+                with self.subTest(campo=campo, termo=termo, pagina=pagina):
+                    indexado = self.indexado.buscar(termo, campo, pagina, tamanho)
+                    varredura = self.varredura.buscar(termo, campo, pagina, tamanho)
+                    if campo == "cpf":
+                        # O índice ordena por CPF, a varredura por cadastro
+                        self.assertEqual(indexado["total"], varredura["total"])
+                        self.assertTrue(all(usuario.cpf.startswith(termo.replace(".", ""))
+                                            for usuario in indexado["resultados"]))
+                    else:
+                        self.assertEqual(chaves(indexado), chaves(varredura))
+
+    def test_consultas_vazias_sao_recusadas(self):
+        for campo, termo in (("nome", ""), ("nome", "  "), ("cidade", ""), ("cpf", "abc"), ("cpf", "")):
+            for repositorio in (self.indexado, self.varredura):
+                with self.subTest(campo=campo, termo=termo, repositorio=type(repositorio).__name__):
+                    with self.assertRaises(BancoException):
+                        repositorio.buscar(termo, campo)
+
+    def test_limite_de_candidatos(self):
+        repositorio = UsuarioRepositoryIndexado(limite_candidatos=5)
+        for usuario in gerar_usuarios(50, semente=1):
+            repositorio.adicionar(usuario)
+        resultado = repositorio.buscar("a", "nome", 1, 10)
+        self.assertEqual(resultado["total"], 5)
+        self.assertTrue(resultado["total_limitado"])
+        self.assertFalse(repositorio.buscar("zzz", "nome")["total_limitado"])
+
+    def test_consultas_de_cpf_durante_cadastros(self):
+        repositorio = UsuarioRepositoryIndexado()
+        usuarios = gerar_usuarios(3000, semente=2)
+        erros = []
+        parar = threading.Event()
+
+        def consultar() -> None:
+            try:
+                while not parar.is_set():
+                    repositorio.buscar("1", "cpf", 1, 5)
+            except Exception as e:
+                erros.append(e)
+
+        intervalo = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        leitores = [threading.Thread(target=consultar) for _ in range(4)]
+        try:
+            for leitor in leitores:
+                leitor.start()
+            for usuario in usuarios:
+                repositorio.adicionar(usuario)
+        finally:
+            parar.set()
+            for leitor in leitores:
+                leitor.join()
+            sys.setswitchinterval(intervalo)
+
+        self.assertEqual(erros, [])
+        cpfs = [cpf for cpf, _ in repositorio.indice_cpf.ordenados]
+        self.assertEqual(cpfs, sorted(usuario.cpf for usuario in usuarios))
+        self.assertEqual(repositorio.buscar("1", "cpf")["total"], sum(1 for cpf in cpfs if cpf.startswith("1")))
+
+if __name__ == "__main__":
+    unittest.main()
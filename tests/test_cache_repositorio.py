@@ -0,0 +1,83 @@
+import itertools
+import random
+import sys
+import threading
+import unittest
+
+from cache_repositorio import CacheLRU, ContaRepositoryCache
+from sistema_bancario_otimizado import ContaRepositoryMemory, MotorBancario
+
+CPF = "52998224725"
+
+class TestCacheLRU(unittest.TestCase):
+    def test_despejo_do_menos_usado_e_expiracao(self):
+        agora = [0.0]
+        cache = CacheLRU(capacidade=2, ttl=10.0, relogio=lambda: agora[0])
+        cache.guardar("a", 1)
+        cache.guardar("b", 2)
+        self.assertEqual(cache.obter("a"), 1)
+        cache.guardar("c", 3)
+
+        self.assertIsNone(cache.obter("b"))
+        self.assertEqual(cache.obter("c"), 3)
+        agora[0] = 10.0
+        self.assertIsNone(cache.obter("a"))
+        estatisticas = cache.estatisticas()
+        self.assertEqual((estatisticas["despejos"], estatisticas["expiracoes"]), (1, 1))
+
+    def test_acessos_concorrentes(self):
+        # Relógio que avança a cada leitura: exercita também as expirações
+        instantes = itertools.count()
+        cache = CacheLRU(capacidade=8, ttl=0.5, relogio=lambda: next(instantes) * 0.01)
+        erros = []
+        consultas = [0] * 8
+        intervalo = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+        def usar(indice: int) -> None:
+            sorteio = random.Random(indice)
+            try:
+                for _ in range(20000):
+                    chave = sorteio.randrange(16)
+                    operacao = sorteio.random()
+                    if operacao < 0.5:
+                        cache.obter(chave)
+                        consultas[indice] += 1
+                    elif operacao < 0.9:
+                        cache.guardar(chave, chave)
+                    else:
+                        cache.invalidar(chave)
+            except Exception as e:
+                erros.append(e)
+
+        threads = [threading.Thread(target=usar, args=(indice,)) for indice in range(8)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(intervalo)
+
+        self.assertEqual(erros, [])
+        estatisticas = cache.estatisticas()
+        self.assertLessEqual(len(cache), 8)
+        self.assertEqual(estatisticas["acertos"] + estatisticas["falhas"], sum(consultas))
+        self.assertGreater(estatisticas["despejos"], 0)
+
+class TestContaRepositoryCache(unittest.TestCase):
+    def test_leitura_atraves_do_cache(self):
+        repositorio = ContaRepositoryCache(ContaRepositoryMemory())
+        motor = MotorBancario(conta_repo=repositorio)
+        motor.usuario_service.cadastrar_usuario("Ana Souza", "01-01-1990", CPF, "Rua A, 1 - Centro - Recife/PE")
+        motor.conta_service.criar_conta("0001", CPF)
+
+        motor.operacao_service.depositar("0001", 1, 50.0)
+        conta = repositorio.buscar_por_agencia_numero("0001", 1)
+        self.assertIs(repositorio.buscar_por_agencia_numero("1", 1), conta)
+        self.assertEqual(conta.saldo, 50.0)
+        self.assertGreater(repositorio.cache.acertos, 0)
+        self.assertIsNone(repositorio.buscar_por_agencia_numero("abc", 1))
+
+if __name__ == "__main__":
+    unittest.main()
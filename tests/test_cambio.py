@@ -0,0 +1,82 @@
+import tempfile
+import unittest
+from decimal import Decimal
+
+from cambio import OperacaoCambioService, TabelaCambio
+from historico_mmap import anexar_historico_mmap
+from sistema_bancario_otimizado import BancoException, MotorBancario, StatusOperacao
+
+CPF = "52998224725"
+
+def criar_motor(quantidade_contas: int, saldo_inicial: float) -> MotorBancario:
+    motor = MotorBancario()
+    motor.usuario_service.cadastrar_usuario("Ana Souza", "01-01-1990", CPF, "Rua A, 1 - Centro - Recife/PE")
+    for _ in range(quantidade_contas):
+        conta = motor.conta_service.criar_conta("0001", CPF)
+        motor.operacao_service.depositar("0001", conta.numero, saldo_inicial)
+    return motor
+
+class TestTabelaCambio(unittest.TestCase):
+    def test_conversao_com_arredondamento_bancario(self):
+        tabela = TabelaCambio({"USD": "4", "JPY": "0.04"})
+        # BRL -> USD: 0,25 centavo de dólar por centavo de real; empates vão para o par
+        self.assertEqual([tabela.converter(centavos, "BRL", "USD") for centavos in (6, 10, 14, 3)],
+                         [2, 2, 4, 1])
+        # USD -> JPY: 100 ienes por dólar, 1 iene por centavo (moeda sem casas decimais)
+        self.assertEqual(tabela.fator("USD", "JPY"), Decimal(1))
+        self.assertEqual(tabela.converter(1234, "USD", "JPY"), 1234)
+        # JPY -> BRL: 4 centavos por iene
+        self.assertEqual(tabela.converter(1000, "JPY", "BRL"), 4000)
+        self.assertEqual(tabela.cotar(10.0, "USD", "JPY"), 1000.0)
+        self.assertEqual(tabela.converter(7, "USD", "USD"), 7)
+
+    def test_atualizacao_invalida_a_cache_de_fatores(self):
+        tabela = TabelaCambio({"USD": "5", "EUR": "6"})
+        self.assertEqual(tabela.converter(600, "EUR", "USD"), 720)
+        self.assertEqual(tabela.converter(600, "EUR", "USD"), 720)
+        self.assertEqual((tabela.faltas, tabela.acertos), (1, 1))
+
+        versao = tabela.versao
+        tabela.atualizar_varias({"USD": "6", "GBP": "7.5"})
+        self.assertEqual(tabela.versao, versao + 1)
+        self.assertEqual(tabela.estatisticas()["fatores_em_cache"], 0)
+        self.assertEqual(tabela.converter(600, "EUR", "USD"), 600)
+        self.assertEqual(tabela.faltas, 2)
+
+        # Código inválido: nenhuma cotação do lote é aplicada e a cache é mantida
+        with self.assertRaises(BancoException):
+            tabela.atualizar_varias({"USD": "9", "real": "1"})
+        self.assertEqual(tabela.taxa("USD"), Decimal("6"))
+        self.assertEqual(tabela.versao, versao + 1)
+        self.assertEqual(tabela.estatisticas()["fatores_em_cache"], 1)
+
+class TestOperacaoCambioService(unittest.TestCase):
+    def test_moeda_derivada_gravada_no_historico_mapeado(self):
+        motor = criar_motor(2, 100.0)
+        origem, destino = motor.conta_repo.listar_todas()
+        with tempfile.TemporaryDirectory() as diretorio:
+            historico = anexar_historico_mmap(destino, diretorio, motor.conta_repo)
+            try:
+                # Moedas sem código fixo recebem um código derivado do ISO, sem recusa
+                servico = OperacaoCambioService(motor.conta_repo, TabelaCambio({"CHF": "6.10"}))
+                status = servico.tentar_transferir_moeda("0001", origem.numero, "0001", destino.numero,
+                                                         61.0, "BRL", "CHF")
+                self.assertIs(status, StatusOperacao.OK)
+                self.assertEqual(destino.saldos_moeda, {"CHF": 1000})
+                self.assertEqual(historico[-1].moeda, "CHF")
+            finally:
+                historico.close()
+
+    def test_descricao_usa_as_casas_decimais_de_cada_moeda(self):
+        motor = criar_motor(1, 100.0)
+        servico = OperacaoCambioService(motor.conta_repo, TabelaCambio({"JPY": "0.04", "USD": "5"}))
+        self.assertIs(servico.tentar_transferir_moeda("0001", 1, "0001", 1, 40.0, "BRL", "JPY"), StatusOperacao.OK)
+        self.assertIs(servico.tentar_transferir_moeda("0001", 1, "0001", 1, 333.0, "JPY", "USD"), StatusOperacao.OK)
+
+        conta = motor.conta_repo.buscar_por_agencia_numero("0001", 1)
+        self.assertTrue(conta.transacoes[1].descricao.endswith("(BRL 40.00 -> JPY 1000)"))
+        self.assertTrue(conta.transacoes[3].descricao.endswith("(JPY 333 -> USD 2.66)"))
+        self.assertEqual(conta.saldos_moeda, {"JPY": 667, "USD": 266})
+
+if __name__ == "__main__":
+    unittest.main()
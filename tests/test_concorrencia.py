@@ -0,0 +1,178 @@
+import random
+import sys
+import tempfile
+import threading
+import unittest
+
+from historico_mmap import anexar_historico_mmap
+from sistema_bancario_otimizado import (
+    BancoException, ConflitoVersaoException, ContaRepositoryMemory, MotorBancario, StatusOperacao, Transacao
+)
+
+CPF = "52998224725"
+
+def criar_motor(quantidade_contas: int, saldo_inicial: float, conta_repo=None) -> MotorBancario:
+    motor = MotorBancario(conta_repo=conta_repo)
+    motor.usuario_service.cadastrar_usuario("Ana Souza", "01-01-1990", CPF, "Rua A, 1 - Centro - Recife/PE")
+    for _ in range(quantidade_contas):
+        conta = motor.conta_service.criar_conta("0001", CPF)
+        motor.operacao_service.depositar("0001", conta.numero, saldo_inicial)
+    return motor
+
+# Repositório que simula uma escrita concorrente: antes das primeiras
+# confirmações, um depósito de outra operação altera a primeira conta
+class ContaRepositoryIntercalado(ContaRepositoryMemory):
+    def __init__(self, intercalacoes: int):
+        super().__init__()
+        self.intercalacoes = intercalacoes
+
+    def confirmar(self, alteracoes):
+        if self.intercalacoes > 0:
+            self.intercalacoes -= 1
+            conta = alteracoes[0][0]
+            super().confirmar([(conta, conta.versao, Transacao("Depósito", 1.0))])
+        super().confirmar(alteracoes)
+
+class TestConfirmacaoOtimista(unittest.TestCase):
+    def test_versao_defasada_nao_aplica_nenhuma_alteracao(self):
+        motor = criar_motor(2, 100.0)
+        origem, destino = motor.conta_repo.listar_todas()
+        versao_origem, versao_destino = origem.versao, destino.versao
+        motor.operacao_service.depositar("0001", destino.numero, 5.0)
+
+        with self.assertRaises(ConflitoVersaoException):
+            motor.conta_repo.confirmar([
+                (origem, versao_origem, Transacao("Transferência Enviada", -10.0)),
+                (destino, versao_destino, Transacao("Transferência Recebida", 10.0)),
+            ])
+        self.assertEqual(origem.saldo, 100.0)
+        self.assertEqual(destino.saldo, 105.0)
+        self.assertEqual(origem.versao, versao_origem)
+
+    def test_historico_que_recusa_gravacao_nao_aplica_nenhuma_alteracao(self):
+        motor = criar_motor(2, 100.0)
+        origem, destino = motor.conta_repo.listar_todas()
+        with tempfile.TemporaryDirectory() as diretorio:
+            historico = anexar_historico_mmap(destino, diretorio, motor.conta_repo)
+            try:
+                with self.assertRaises(BancoException):
+                    motor.conta_repo.confirmar([
+                        (origem, origem.versao, Transacao("Transferência Enviada", -10.0)),
+                        (destino, destino.versao, Transacao("Tipo Desconhecido", 10.0)),
+                    ])
+                self.assertEqual((origem.saldo, origem.versao, len(origem.transacoes)), (100.0, 1, 1))
+                self.assertEqual((destino.saldo, destino.versao, len(destino.transacoes)), (100.0, 1, 1))
+            finally:
+                historico.close()
+
+    def test_conflito_e_repetido_com_releitura(self):
+        repositorio = ContaRepositoryIntercalado(0)
+        motor = criar_motor(2, 100.0, repositorio)
+        repositorio.intercalacoes = 2
+
+        status = motor.operacao_service.tentar_transferir("0001", 1, "0001", 2, 30.0)
+
+        self.assertIs(status, StatusOperacao.OK)
+        self.assertEqual(motor.operacao_service.conflitos, 2)
+        origem = repositorio.buscar_por_agencia_numero("0001", 1)
+        destino = repositorio.buscar_por_agencia_numero("0001", 2)
+        # Os dois depósitos intercalados e a transferência foram aplicados uma vez cada
+        self.assertEqual(origem.saldo, 72.0)
+        self.assertEqual(destino.saldo, 130.0)
+
+    def test_tentativas_esgotadas_retorna_conflito(self):
+        repositorio = ContaRepositoryIntercalado(0)
+        motor = criar_motor(1, 100.0, repositorio)
+        motor.operacao_service.max_tentativas = 3
+        repositorio.intercalacoes = 3
+
+        status = motor.operacao_service.tentar_sacar("0001", 1, 10.0)
+
+        self.assertIs(status, StatusOperacao.CONFLITO)
+        conta = repositorio.buscar_por_agencia_numero("0001", 1)
+        self.assertEqual(conta.saldo, 103.0)
+        self.assertEqual(conta.saques_realizados, 0)
+
+class TestTransferenciasConcorrentes(unittest.TestCase):
+    def setUp(self):
+        # Trocas de thread frequentes aumentam as disputas entre leitura e confirmação
+        self.intervalo = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.intervalo)
+
+    def test_saldo_total_conservado(self):
+        quantidade_contas, saldo_inicial = 6, 1000.0
+        motor = criar_motor(quantidade_contas, saldo_inicial)
+        servico = motor.operacao_service
+        resultados = []
+
+        def transferir(semente: int) -> None:
+            sorteio = random.Random(semente)
+            for _ in range(400):
+                origem, destino = sorteio.sample(range(1, quantidade_contas + 1), 2)
+                resultados.append(servico.tentar_transferir("0001", origem, "0001", destino,
+                                                            float(sorteio.randint(1, 300))))
+
+        threads = [threading.Thread(target=transferir, args=(semente,)) for semente in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        contas = motor.conta_repo.listar_todas()
+        self.assertEqual(sum(conta.saldo for conta in contas), quantidade_contas * saldo_inicial)
+        self.assertIn(StatusOperacao.OK, resultados)
+        for conta in contas:
+            self.assertGreaterEqual(conta.saldo, 0)
+            # Cada transação confirmada aparece uma vez no histórico e na versão
+            self.assertEqual(conta.saldo, sum(transacao.valor for transacao in conta.transacoes))
+            self.assertEqual(conta.versao, len(conta.transacoes))
+        transferencias = sum(1 for status in resultados if status is StatusOperacao.OK)
+        enviadas = sum(1 for conta in contas for transacao in conta.transacoes
+                       if transacao.tipo == "Transferência Enviada")
+        self.assertEqual(enviadas, transferencias)
+
+class TestCadastroConcorrente(unittest.TestCase):
+    def test_numeros_unicos_com_listagens_em_paralelo(self):
+        motor = criar_motor(0, 0.0)
+        parar = threading.Event()
+        erros = []
+
+        def listar() -> None:
+            # Como as threads de compactação e snapshot fazem
+            try:
+                while not parar.is_set():
+                    motor.conta_repo.listar_todas()
+                    motor.conta_repo.estatisticas_agencia("0001")
+            except Exception as e:
+                erros.append(e)
+
+        def criar() -> None:
+            for _ in range(300):
+                motor.conta_service.criar_conta("0001", CPF)
+
+        leitor = threading.Thread(target=listar)
+        leitor.start()
+        threads = [threading.Thread(target=criar) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        parar.set()
+        leitor.join()
+
+        self.assertEqual(erros, [])
+        numeros = [conta.numero for conta in motor.conta_repo.listar_todas()]
+        self.assertEqual(sorted(numeros), list(range(1, 1801)))
+        self.assertEqual(len(motor.conta_repo.ordem), 1800)
+
+    def test_agencia_aceita_somente_digitos(self):
+        self.assertEqual(ContaRepositoryMemory.chave_agencia("0001"), 1)
+        for agencia in (" 1 ", "1_000", "-1", "+1", "", "١", None, True):
+            with self.assertRaises(BancoException):
+                ContaRepositoryMemory.chave_agencia(agencia)
+
+if __name__ == "__main__":
+    unittest.main()
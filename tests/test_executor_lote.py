@@ -0,0 +1,61 @@
+import io
+import json
+import unittest
+
+from executor_lote import ExecutorComandos
+
+CPF = "52998224725"
+
+def executar(linhas):
+    executor = ExecutorComandos.em_memoria()
+    saida = io.StringIO()
+    executor.executar(linhas, saida, tamanho_buffer=2)
+    return executor, [json.loads(linha) for linha in saida.getvalue().splitlines()]
+
+class TestExecutorComandos(unittest.TestCase):
+    def test_linhas_malformadas_nao_interrompem_o_lote(self):
+        executor, resultados = executar([
+            '{"comando": [1]}',
+            '{"comando": {"a": 1}}',
+            '{"agencia": "0001"}',
+            '[1, 2]',
+            '{"comando": "depositar", ',
+            '{"comando": "listar_usuarios"}',
+        ])
+
+        self.assertEqual([resultado["ok"] for resultado in resultados], [False] * 5 + [True])
+        self.assertEqual(resultados[0]["erro"], 'Campo "comando" deve ser um texto')
+        self.assertIsNone(resultados[0]["comando"])
+        self.assertTrue(resultados[4]["erro"].startswith("JSON inválido"))
+        self.assertEqual((executor.executados, executor.falhas), (6, 5))
+
+    def test_comando_desconhecido(self):
+        executor, resultados = executar(['{"comando": "apagar_tudo"}'])
+        self.assertEqual(resultados, [{"ok": False, "comando": "apagar_tudo", "erro": "Comando desconhecido"}])
+        self.assertEqual(executor.falhas, 1)
+
+    def test_falhas_parciais_seguem_com_as_demais_linhas(self):
+        executor, resultados = executar([
+            json.dumps({"comando": "cadastrar_usuario", "nome": "Ana Souza", "data_nascimento": "01-01-1990",
+                        "cpf": CPF, "endereco": "Rua A, 1 - Centro - Recife/PE"}),
+            '# comentário e linhas vazias são ignorados',
+            '',
+            json.dumps({"comando": "criar_conta", "cpf": CPF}),
+            json.dumps({"comando": "depositar", "agencia": "0001", "numero": 1, "valor": 100}),
+            json.dumps({"comando": "sacar", "agencia": "0001", "numero": 1, "valor": 1000}),
+            json.dumps({"comando": "depositar", "agencia": "0001", "numero": 1}),
+            json.dumps({"comando": "depositar", "agencia": "0001", "numero": 1, "valor": "dez"}),
+            json.dumps({"comando": "sacar", "agencia": "0001", "numero": 1, "valor": 30}),
+            json.dumps({"comando": "listar_contas"}),
+        ])
+
+        self.assertEqual([resultado["ok"] for resultado in resultados],
+                         [True, True, True, False, False, False, True, True])
+        self.assertTrue(resultados[3]["recusa"])
+        self.assertEqual(resultados[4]["erro"], "Parâmetro ausente: valor")
+        self.assertNotIn("recusa", resultados[4])
+        self.assertEqual(resultados[-1]["contas"][0]["saldo"], 70.0)
+        self.assertEqual((executor.executados, executor.falhas), (8, 3))
+
+if __name__ == "__main__":
+    unittest.main()
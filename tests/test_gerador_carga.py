@@ -0,0 +1,33 @@
+import io
+import unittest
+
+from gerador_carga import LIMITE_SAQUES_CARGA, GeradorCarga, destino_em_processo, reproduzir
+from sistema_bancario_otimizado import MotorBancario
+
+class TestReproducao(unittest.TestCase):
+    def test_linhas_invalidas_contam_como_falhas(self):
+        gerador = GeradorCarga(usuarios=3, operacoes=20)
+        script = io.StringIO()
+        gerador.gravar(script)
+        linhas = script.getvalue().splitlines()
+        linhas[8:8] = ['{"comando": "depositar", ', '[1, 2]', '{"agencia": "0001"}', '{"comando": 7}', '"texto"']
+
+        relatorio = reproduzir(linhas, destino_em_processo())
+
+        self.assertEqual(relatorio["invalidos"], 5)
+        self.assertEqual(relatorio["comandos"], len(linhas) - 5)
+        self.assertEqual(relatorio["falhas"], 5 + sum(dados["falhas"] for dados in relatorio["por_comando"].values()))
+        self.assertEqual(relatorio["divergencias"], 0)
+
+    def test_limite_de_saques_do_motor_recebido_e_mantido(self):
+        motor = MotorBancario()
+        destino_em_processo(motor)
+        self.assertEqual(motor.operacao_service.limite_saques_diarios, 3)
+        destino_em_processo(motor, limite_saques=10)
+        self.assertEqual(motor.operacao_service.limite_saques_diarios, 10)
+
+        destino = destino_em_processo()
+        self.assertEqual(destino.__self__.operacao_service.limite_saques_diarios, LIMITE_SAQUES_CARGA)
+
+if __name__ == "__main__":
+    unittest.main()
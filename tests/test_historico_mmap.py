@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+from historico_mmap import CABECALHO, HistoricoMmap, anexar_historico_mmap
+from sistema_bancario_otimizado import MotorBancario, Transacao
+
+CPF = "52998224725"
+
+def criar_motor(quantidade_contas: int, saldo_inicial: float) -> MotorBancario:
+    motor = MotorBancario()
+    motor.usuario_service.cadastrar_usuario("Ana Souza", "01-01-1990", CPF, "Rua A, 1 - Centro - Recife/PE")
+    for _ in range(quantidade_contas):
+        conta = motor.conta_service.criar_conta("0001", CPF)
+        motor.operacao_service.depositar("0001", conta.numero, saldo_inicial)
+    return motor
+
+class TestHistoricoMmap(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_valores_na_precisao_de_cada_moeda(self):
+        caminho = os.path.join(self.diretorio.name, "moedas.hist")
+        with HistoricoMmap(caminho) as historico:
+            historico.append(Transacao("Depósito", 123456.0, moeda="JPY"))
+            historico.append(Transacao("Depósito", 0.07, moeda="USD"))
+            historico.append(Transacao("Saque", -19.99))
+
+        with HistoricoMmap(caminho) as historico:
+            self.assertEqual([(transacao.valor, transacao.moeda) for transacao in historico],
+                             [(123456.0, "JPY"), (0.07, "USD"), (-19.99, "BRL")])
+
+    def test_arquivo_existente_de_outro_historico_e_reescrito(self):
+        motor = criar_motor(2, 100.0)
+        conta = motor.conta_repo.buscar_por_agencia_numero("0001", 1)
+        caminho = os.path.join(self.diretorio.name, "0001_1.hist")
+        # Resto de uma execução anterior, com movimentações que a conta não tem
+        with HistoricoMmap(caminho) as antigo:
+            antigo.append(Transacao("Depósito", 999.0, "outra execução"))
+            antigo.append(Transacao("Saque", -1.0))
+
+        historico = anexar_historico_mmap(conta, self.diretorio.name, motor.conta_repo)
+        try:
+            self.assertEqual([transacao.valor for transacao in historico], [100.0])
+            self.assertEqual(historico[0].descricao, "")
+            self.assertEqual(os.path.getsize(historico.caminho_descricoes), 0)
+        finally:
+            historico.close()
+
+    def test_arquivo_igual_ao_historico_e_aproveitado(self):
+        motor = criar_motor(1, 100.0)
+        conta = motor.conta_repo.buscar_por_agencia_numero("0001", 1)
+        transacoes = list(conta.transacoes)
+        anexar_historico_mmap(conta, self.diretorio.name, motor.conta_repo).close()
+
+        conta.transacoes = transacoes
+        historico = anexar_historico_mmap(conta, self.diretorio.name, motor.conta_repo)
+        try:
+            self.assertEqual(len(historico), 1)
+            motor.operacao_service.depositar("0001", 1, 5.0)
+            self.assertEqual([transacao.valor for transacao in historico], [100.0, 5.0])
+        finally:
+            historico.close()
+
+    def test_arquivo_de_formato_anterior_e_recriado(self):
+        motor = criar_motor(1, 100.0)
+        conta = motor.conta_repo.buscar_por_agencia_numero("0001", 1)
+        with open(os.path.join(self.diretorio.name, "0001_1.hist"), "wb") as arquivo:
+            arquivo.write(CABECALHO.pack(b"HISTBNC1", 0))
+
+        historico = anexar_historico_mmap(conta, self.diretorio.name, motor.conta_repo)
+        try:
+            self.assertEqual(conta.transacoes[0].valor, 100.0)
+            self.assertEqual(len(historico), 1)
+        finally:
+            historico.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import time
+import unittest
+
+from outbox import ConsumidorOutbox, Outbox
+from sistema_bancario_otimizado import PublicadorEventos
+
+def aguardar(condicao, prazo: float = 5.0) -> bool:
+    limite = time.monotonic() + prazo
+    while not condicao():
+        if time.monotonic() > limite:
+            return False
+        time.sleep(0.005)
+    return True
+
+class TestOutbox(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.arquivo = os.path.join(self.diretorio.name, "transbordo.jsonl")
+        self.eventos = PublicadorEventos()
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def publicar(self, quantidade: int, inicio: int = 0) -> None:
+        for indice in range(inicio, inicio + quantidade):
+            self.eventos.publicar("deposito", {"indice": indice})
+
+    def test_transbordo_entregue_em_ordem_e_compactado(self):
+        outbox = Outbox(self.eventos, capacidade=3, arquivo_transbordo=self.arquivo)
+        recebidas = []
+        consumidor = ConsumidorOutbox(outbox, "contabil", recebidas.extend, tamanho_lote=2)
+        self.publicar(20)
+        self.assertTrue(aguardar(lambda: outbox.gravadas == 17))
+
+        while consumidor.drenar():
+            pass
+        self.assertEqual([mensagem[0] for mensagem in recebidas], list(range(1, 21)))
+        self.assertEqual([mensagem[2]["indice"] for mensagem in recebidas], list(range(20)))
+        estatisticas = outbox.estatisticas()
+        self.assertEqual((estatisticas["profundidade"], estatisticas["em_transbordo"]), (0, 0))
+        # O arquivo é truncado pela gravadora depois da confirmação
+        self.assertTrue(aguardar(lambda: os.path.getsize(self.arquivo) == 0))
+
+        # Com o transbordo vazio, as novas mensagens voltam para a fila
+        self.publicar(2, 20)
+        self.assertEqual(consumidor.drenar(), 2)
+        self.assertEqual(outbox.estatisticas()["transbordadas"], 17)
+
+    def test_releitura_do_arquivo_ignora_linha_incompleta(self):
+        outbox = Outbox(self.eventos, capacidade=1, arquivo_transbordo=self.arquivo)
+        ConsumidorOutbox(outbox, "contabil", lambda mensagens: None)
+        self.publicar(5)
+        self.assertTrue(aguardar(lambda: outbox.gravadas == 4))
+        # Gravação interrompida no meio de uma linha
+        with open(self.arquivo, "ab") as arquivo:
+            arquivo.write(b'{"id": 6, "tipo": "dep')
+
+        registros = list(outbox.ler_transbordo())
+        self.assertEqual([registro["id"] for registro in registros], [2, 3, 4, 5])
+        self.assertEqual(registros[-1]["dados"], {"indice": 4})
+
+    def test_transbordo_em_memoria_limitado(self):
+        outbox = Outbox(self.eventos, capacidade=2, capacidade_transbordo=3)
+        consumidor = ConsumidorOutbox(outbox, "contabil", lambda mensagens: None, tamanho_lote=100)
+        self.publicar(10)
+
+        estatisticas = outbox.estatisticas()
+        self.assertEqual((estatisticas["registradas"], estatisticas["rejeitadas"]), (5, 5))
+        self.assertEqual(estatisticas["profundidade"], 5)
+        # Os identificadores seguem contíguos, sem lacunas das rejeitadas
+        self.assertEqual([mensagem[0] for mensagem in outbox.lote("contabil", 100)], [1, 2])
+        consumidor.drenar()
+        self.assertEqual([mensagem[0] for mensagem in outbox.lote("contabil", 100)], [3, 4, 5])
+
+    def test_sem_consumidores_nada_e_retido(self):
+        outbox = Outbox(self.eventos, capacidade=2)
+        self.publicar(10)
+        self.assertEqual(outbox.estatisticas()["profundidade"], 0)
+
+        ConsumidorOutbox(outbox, "contabil", lambda mensagens: None)
+        self.publicar(3)
+        self.assertEqual([mensagem[0] for mensagem in outbox.lote("contabil", 10)], [1, 2])
+        outbox.remover_consumidor("contabil")
+        self.assertEqual(outbox.estatisticas()["profundidade"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
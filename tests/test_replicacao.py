@@ -0,0 +1,175 @@
+import random
+import sys
+import threading
+import time
+import unittest
+from multiprocessing import Pipe
+
+from replicacao import FeedAlteracoes, ReplicaDefasadaException, ReplicaLeitura
+from sistema_bancario_otimizado import MotorBancario, StatusOperacao
+
+CPF = "52998224725"
+
+def criar_motor(quantidade_contas: int, saldo_inicial: float) -> MotorBancario:
+    motor = MotorBancario()
+    motor.usuario_service.cadastrar_usuario("Ana Souza", "01-01-1990", CPF, "Rua A, 1 - Centro - Recife/PE")
+    for _ in range(quantidade_contas):
+        conta = motor.conta_service.criar_conta("0001", CPF)
+        motor.operacao_service.depositar("0001", conta.numero, saldo_inicial)
+    return motor
+
+def conectar(feed: FeedAlteracoes, replica: ReplicaLeitura) -> threading.Thread:
+    lado_feed, lado_replica = Pipe()
+    feed.conectar(lado_feed, replica.ultima_sequencia)
+    consumidor = threading.Thread(target=replica.consumir, args=(lado_replica,), daemon=True)
+    consumidor.start()
+    return consumidor
+
+def aguardar(condicao, prazo: float = 10.0) -> bool:
+    limite = time.monotonic() + prazo
+    while not condicao():
+        if time.monotonic() > limite:
+            return False
+        time.sleep(0.005)
+    return True
+
+class TestFeedAlteracoes(unittest.TestCase):
+    def test_replica_nova_recebe_imagem_e_acompanha_as_escritas(self):
+        quantidade_contas, saldo_inicial = 10, 500.0
+        motor = criar_motor(quantidade_contas, saldo_inicial)
+        # O feed só é criado depois das primeiras escritas: elas chegam pela imagem
+        feed = FeedAlteracoes(motor.eventos, motor=motor)
+        parar = threading.Event()
+
+        def transferir(semente: int) -> None:
+            sorteio = random.Random(semente)
+            while not parar.is_set():
+                origem, destino = sorteio.sample(range(1, quantidade_contas + 1), 2)
+                motor.operacao_service.tentar_transferir("0001", origem, "0001", destino,
+                                                         float(sorteio.randint(1, 50)))
+
+        intervalo = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+        threads = [threading.Thread(target=transferir, args=(semente,)) for semente in range(4)]
+        replica = ReplicaLeitura()
+        try:
+            for thread in threads:
+                thread.start()
+            time.sleep(0.05)
+            conectar(feed, replica)
+            time.sleep(0.1)
+        finally:
+            parar.set()
+            for thread in threads:
+                thread.join()
+            sys.setswitchinterval(intervalo)
+
+        self.assertTrue(aguardar(lambda: replica.ultima_sequencia == feed.sequencia))
+        self.assertIsNone(replica.erro)
+        primarias = {conta.numero: conta for conta in motor.conta_repo.listar_todas()}
+        replicadas = {conta.numero: conta for conta in replica.listar_contas()}
+        self.assertEqual(sorted(replicadas), sorted(primarias))
+        for numero, conta in primarias.items():
+            self.assertEqual((replicadas[numero].saldo, replicadas[numero].versao), (conta.saldo, conta.versao))
+        self.assertEqual(feed.estatisticas()["cargas_iniciais"], 1)
+        feed.encerrar()
+
+    def test_replica_alem_do_backlog_e_recarregada(self):
+        motor = criar_motor(1, 100.0)
+        feed = FeedAlteracoes(motor.eventos, capacidade_backlog=2, motor=motor)
+        replica = ReplicaLeitura()
+        consumidor = conectar(feed, replica)
+        self.assertTrue(aguardar(lambda: replica.ultima_sequencia == feed.sequencia))
+        feed.encerrar()
+        consumidor.join(5)
+        self.assertIsInstance(replica.erro, ReplicaDefasadaException)
+        with self.assertRaises(ReplicaDefasadaException):
+            replica.listar_contas()
+
+        for _ in range(5):
+            motor.operacao_service.depositar("0001", 1, 10.0)
+        replica.erro = None
+        conectar(feed, replica)
+        self.assertTrue(aguardar(lambda: replica.ultima_sequencia == feed.sequencia))
+        self.assertEqual(replica.listar_contas()[0].saldo, 150.0)
+        self.assertEqual(len(replica.obter_extrato("0001", 1)), 6)
+        feed.encerrar()
+
+    def test_sem_motor_replica_defasada_e_recusada(self):
+        motor = criar_motor(1, 100.0)
+        feed = FeedAlteracoes(motor.eventos, capacidade_backlog=2)
+        for _ in range(5):
+            motor.operacao_service.depositar("0001", 1, 10.0)
+        lado_feed, _ = Pipe()
+        with self.assertRaises(ReplicaDefasadaException):
+            feed.conectar(lado_feed, 1)
+
+    def test_replica_lenta_e_desconectada(self):
+        feed = FeedAlteracoes(MotorBancario().eventos, capacidade_fila_replica=4)
+        replica = ReplicaLeitura()
+        lado_feed, lado_replica = Pipe()
+        enviador = feed.conectar(lado_feed, 0)
+        # A réplica não lê: o enviador trava no envio e a fila transborda
+        for indice in range(200):
+            feed("teste", {"carga": "x" * 10000, "indice": indice})
+        self.assertEqual(feed.estatisticas()["replicas"], 0)
+        self.assertEqual(feed.replicas_desconectadas, 1)
+
+        consumidor = threading.Thread(target=replica.consumir, args=(lado_replica,), daemon=True)
+        consumidor.start()
+        consumidor.join(10)
+        enviador.join(10)
+        self.assertFalse(consumidor.is_alive())
+        self.assertFalse(enviador.is_alive())
+        self.assertIsInstance(replica.erro, ReplicaDefasadaException)
+        self.assertLess(replica.ultima_sequencia, feed.sequencia)
+        with self.assertRaises(ReplicaDefasadaException):
+            replica.listar_usuarios()
+
+class TestReplicaLeitura(unittest.TestCase):
+    def test_lancamentos_fora_de_ordem_seguem_a_versao(self):
+        motor = criar_motor(1, 100.0)
+        feed = FeedAlteracoes(motor.eventos, motor=motor)
+        replica = ReplicaLeitura()
+        conectar(feed, replica)
+        self.assertTrue(aguardar(lambda: replica.ultima_sequencia == feed.sequencia))
+
+        eventos = []
+        motor.eventos.assinar(lambda tipo, dados: eventos.append((tipo, dados)))
+        self.assertIs(motor.operacao_service.tentar_depositar("0001", 1, 10.0), StatusOperacao.OK)
+        self.assertIs(motor.operacao_service.tentar_sacar("0001", 1, 30.0), StatusOperacao.OK)
+        feed.encerrar()
+
+        local = ReplicaLeitura()
+        local.aplicar((1, "usuario_cadastrado", motor.usuario_repo.buscar_por_cpf(CPF).to_dict()))
+        local.aplicar((2, "conta_criada", {"agencia": "0001", "numero": 1, "cpf": CPF}))
+        local.aplicar((3, "deposito", {"lancamentos": [{**eventos[0][1]["lancamentos"][0], "versao": 1,
+                                                         "valor": 100.0}]}))
+        # O saque foi sequenciado antes do depósito que o precede na conta
+        local.aplicar((4, eventos[1][0], eventos[1][1]))
+        self.assertEqual(local.listar_contas()[0].saldo, 100.0)
+        local.aplicar((5, eventos[0][0], eventos[0][1]))
+        conta = local.listar_contas()[0]
+        self.assertEqual((conta.saldo, conta.versao), (80.0, 3))
+        self.assertEqual([transacao.tipo for transacao in conta.transacoes], ["Depósito", "Depósito", "Saque"])
+
+    def test_erro_de_aplicacao_desconecta(self):
+        motor = criar_motor(0, 0.0)
+        feed = FeedAlteracoes(motor.eventos)
+        replica = ReplicaLeitura()
+        consumidor = conectar(feed, replica)
+        feed("deposito", {"lancamentos": [{"agencia": "0001", "numero": 9, "tipo": "Depósito", "valor": 1.0,
+                                           "descricao": "", "data": 0.0, "versao": 1}]})
+        consumidor.join(5)
+
+        self.assertFalse(consumidor.is_alive())
+        self.assertEqual(replica.erro.__class__.__name__, "ContaNaoEncontradaException")
+        with self.assertRaises(ReplicaDefasadaException):
+            replica.listar_contas()
+        # O feed percebe a desconexão no próximo envio
+        feed("teste", {})
+        self.assertTrue(aguardar(lambda: feed.estatisticas()["replicas"] == 0))
+        self.assertEqual(feed.replicas_desconectadas, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from sistema_bancario_otimizado import MotorBancario, StatusOperacao
+from snapshots import Snapshot, carregar_snapshot, tirar_snapshot
+
+CPF = "52998224725"
+
+def criar_motor(quantidade_contas: int, saldo_inicial: float) -> MotorBancario:
+    motor = MotorBancario()
+    motor.usuario_service.cadastrar_usuario("Ana Souza", "01-01-1990", CPF, "Rua A, 1 - Centro - Recife/PE")
+    for _ in range(quantidade_contas):
+        conta = motor.conta_service.criar_conta("0001", CPF)
+        motor.operacao_service.depositar("0001", conta.numero, saldo_inicial)
+    return motor
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.diretorio.name, "snapshot.jsonl")
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_escritas_posteriores_nao_aparecem(self):
+        motor = criar_motor(2, 100.0)
+        snapshot = Snapshot(motor.usuario_repo, motor.conta_repo, tamanho_lote=1).iniciar()
+
+        motor.operacao_service.transferir("0001", 1, "0001", 2, 40.0)
+        motor.conta_service.criar_conta("0001", CPF)
+        snapshot.salvar(self.caminho)
+
+        restaurado = carregar_snapshot(self.caminho)
+        contas = {conta.numero: conta for conta in restaurado.conta_repo.listar_todas()}
+        self.assertEqual(sorted(contas), [1, 2])
+        self.assertEqual(contas[1].saldo, 100.0)
+        self.assertEqual(contas[2].saldo, 100.0)
+        self.assertEqual(len(contas[1].transacoes), 1)
+        self.assertEqual(snapshot.preservadas, 2)
+        self.assertFalse(motor.conta_repo.snapshots_ativos)
+        # A numeração continua do ponto do snapshot, sem reaproveitar números
+        self.assertEqual(restaurado.conta_service.criar_conta("0001", CPF).numero, 3)
+
+    def test_snapshot_consistente_durante_transferencias(self):
+        quantidade_contas, saldo_inicial = 20, 500.0
+        motor = criar_motor(quantidade_contas, saldo_inicial)
+        servico = motor.operacao_service
+        parar = threading.Event()
+        resultados = []
+
+        def transferir(semente: int) -> None:
+            sorteio = random.Random(semente)
+            while not parar.is_set():
+                origem, destino = sorteio.sample(range(1, quantidade_contas + 1), 2)
+                resultados.append(servico.tentar_transferir("0001", origem, "0001", destino,
+                                                            float(sorteio.randint(1, 100))))
+
+        intervalo = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+        threads = [threading.Thread(target=transferir, args=(semente,)) for semente in range(4)]
+        try:
+            for thread in threads:
+                thread.start()
+            while len(resultados) < 200:
+                time.sleep(0.001)
+            # Lotes pequenos: o serializador intercala com as transferências
+            snapshot, serializador = tirar_snapshot(motor, self.caminho, tamanho_lote=2)
+            serializador.join()
+        finally:
+            parar.set()
+            for thread in threads:
+                thread.join()
+            sys.setswitchinterval(intervalo)
+
+        self.assertGreater(snapshot.preservadas, 0)
+        restaurado = carregar_snapshot(self.caminho)
+        contas = restaurado.conta_repo.listar_todas()
+        self.assertEqual(len(contas), quantidade_contas)
+        # Uma transferência aparece inteira ou não aparece
+        self.assertEqual(sum(conta.saldo for conta in contas), quantidade_contas * saldo_inicial)
+        enviadas = recebidas = 0
+        for conta in contas:
+            self.assertEqual(conta.saldo, sum(transacao.valor for transacao in conta.transacoes))
+            self.assertEqual(conta.versao, len(conta.transacoes))
+            enviadas += sum(1 for transacao in conta.transacoes if transacao.tipo == "Transferência Enviada")
+            recebidas += sum(1 for transacao in conta.transacoes if transacao.tipo == "Transferência Recebida")
+        self.assertEqual(enviadas, recebidas)
+
+        atuais = motor.conta_repo.listar_todas()
+        self.assertEqual(sum(conta.saldo for conta in atuais), quantidade_contas * saldo_inicial)
+        self.assertGreaterEqual(sum(1 for status in resultados if status is StatusOperacao.OK), enviadas)
+
+if __name__ == "__main__":
+    unittest.main()